@@ -10,6 +10,10 @@ from src.app.database import Base
 from src.app.models.user import User  # noqa: F401
 from src.app.models.link import Link  # noqa: F401
 from src.app.models.click import Click  # noqa: F401
+from src.app.models.dimensions import Browser, Country, Device, OperatingSystem, Referrer  # noqa: F401
+from src.app.models.user_agent import UserAgent  # noqa: F401
+from src.app.models.rollup import DailyClickCount, DailyDimensionCount  # noqa: F401
+from src.app.services.partitions import is_partition
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.database_url)
@@ -20,11 +24,19 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_name(name, type_, parent_names):
+    # Monthly click partitions are created at runtime, not by migrations
+    if type_ == "table":
+        return not is_partition(name)
+    return True
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -33,7 +45,9 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection, target_metadata=target_metadata, include_name=include_name
+    )
     with context.begin_transaction():
         context.run_migrations()
 
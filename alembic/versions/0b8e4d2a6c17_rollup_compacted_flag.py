@@ -0,0 +1,34 @@
+"""Rollup compacted flag: daily_click_counts.compacted
+
+Marks the link-days whose rollups compaction has made complete, so their
+raw clicks can be deleted over several transactions without the day ever
+being recounted from a partial set of clicks.
+
+Revision ID: 0b8e4d2a6c17
+Revises: f7a3c1d9b246
+Create Date: 2026-10-18 11:02:37.550184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e4d2a6c17'
+down_revision: Union[str, None] = 'f7a3c1d9b246'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('daily_click_counts') as batch_op:
+        batch_op.add_column(
+            sa.Column('compacted', sa.Boolean(), server_default=sa.false(), nullable=False)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('daily_click_counts') as batch_op:
+        batch_op.drop_column('compacted')
@@ -0,0 +1,44 @@
+"""Raw click horizon: raw_click_horizon
+
+Records the first day whose raw clicks are all still stored, as moved by
+compaction and partition expiry, instead of deriving it from the current
+settings. Seeded from the days compaction has already marked.
+
+Revision ID: 3d9f0c6a8e51
+Revises: 0b8e4d2a6c17
+Create Date: 2026-10-19 09:24:13.208415
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9f0c6a8e51'
+down_revision: Union[str, None] = '0b8e4d2a6c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    horizon = op.create_table('raw_click_horizon',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    conn = op.get_bind()
+    last_compacted = conn.execute(
+        sa.text('SELECT MAX(day) FROM daily_click_counts WHERE compacted')
+    ).scalar()
+    if last_compacted is not None:
+        if isinstance(last_compacted, str):
+            last_compacted = datetime.date.fromisoformat(last_compacted)
+        op.bulk_insert(horizon, [{'id': 1, 'day': last_compacted + datetime.timedelta(days=1)}])
+
+
+def downgrade() -> None:
+    op.drop_table('raw_click_horizon')
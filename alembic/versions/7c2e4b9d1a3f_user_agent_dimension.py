@@ -0,0 +1,125 @@
+"""User-agent dimension: user_agents table, clicks.user_agent_id
+
+Moves the raw user_agent string and its parsed browser/os/device off every
+click into one user_agents row per distinct UA, keyed by a hash of the string.
+Existing clicks are backfilled in batches, with temporary indexes on the
+user-agent strings.
+
+Revision ID: 7c2e4b9d1a3f
+Revises: 45e161a449ec
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4b9d1a3f'
+down_revision: Union[str, None] = '45e161a449ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _ua_hash(user_agent: str) -> str:
+    # Must match src.app.services.dimensions.value_hash
+    return hashlib.blake2b(user_agent.encode(), digest_size=16).hexdigest()
+
+
+def upgrade() -> None:
+    op.create_table('user_agents',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('ua_hash', sa.String(length=32), nullable=False),
+    sa.Column('user_agent', sa.String(length=500), nullable=False),
+    sa.Column('browser', sa.String(length=100), nullable=True),
+    sa.Column('os', sa.String(length=100), nullable=True),
+    sa.Column('device', sa.String(length=50), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_agents_ua_hash'), 'user_agents', ['ua_hash'], unique=True)
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.add_column(sa.Column('user_agent_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_clicks_user_agent_id_user_agents', 'user_agents', ['user_agent_id'], ['id']
+        )
+
+    # clicks.user_agent has no index: give the backfill temporary ones, so
+    # distinct user agents are read in index order and each click finds its
+    # user_agents row by a seek
+    op.create_index('tmp_ix_clicks_user_agent', 'clicks', ['user_agent'])
+    op.create_index('tmp_ix_user_agents_user_agent', 'user_agents', ['user_agent'])
+
+    # Insert one batch of distinct user agents at a time, walking them in order
+    conn = op.get_bind()
+    last = ''
+    while True:
+        rows = conn.execute(
+            sa.text(
+                'SELECT user_agent, MAX(browser), MAX(os), MAX(device) FROM clicks '
+                'WHERE user_agent IS NOT NULL AND user_agent > :last '
+                'GROUP BY user_agent ORDER BY user_agent LIMIT :limit'
+            ),
+            {'last': last, 'limit': BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            sa.text(
+                'INSERT INTO user_agents (ua_hash, user_agent, browser, os, device) '
+                'VALUES (:ua_hash, :user_agent, :browser, :os, :device)'
+            ),
+            [
+                {'ua_hash': _ua_hash(ua), 'user_agent': ua, 'browser': browser, 'os': os,
+                 'device': device}
+                for ua, browser, os, device in rows
+            ],
+        )
+        last = rows[-1][0]
+
+    # Then point the clicks at them, one id range at a time
+    max_id = conn.execute(sa.text('SELECT MAX(id) FROM clicks')).scalar() or 0
+    for start in range(0, max_id + 1, BATCH_SIZE):
+        conn.execute(
+            sa.text(
+                'UPDATE clicks SET user_agent_id = '
+                '(SELECT id FROM user_agents WHERE user_agents.user_agent = clicks.user_agent) '
+                'WHERE id >= :start AND id < :end AND user_agent IS NOT NULL'
+            ),
+            {'start': start, 'end': start + BATCH_SIZE},
+        )
+    op.drop_index('tmp_ix_user_agents_user_agent', table_name='user_agents')
+    op.drop_index('tmp_ix_clicks_user_agent', table_name='clicks')
+
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.drop_column('user_agent')
+        batch_op.drop_column('device')
+        batch_op.drop_column('os')
+        batch_op.drop_column('browser')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.add_column(sa.Column('browser', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('os', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('device', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('user_agent', sa.String(length=500), nullable=True))
+
+    op.execute(
+        'UPDATE clicks SET '
+        'user_agent = (SELECT user_agent FROM user_agents WHERE id = clicks.user_agent_id), '
+        'browser = (SELECT browser FROM user_agents WHERE id = clicks.user_agent_id), '
+        'os = (SELECT os FROM user_agents WHERE id = clicks.user_agent_id), '
+        'device = (SELECT device FROM user_agents WHERE id = clicks.user_agent_id) '
+        'WHERE user_agent_id IS NOT NULL'
+    )
+
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.drop_constraint('fk_clicks_user_agent_id_user_agents', type_='foreignkey')
+        batch_op.drop_column('user_agent_id')
+    op.drop_index(op.f('ix_user_agents_ua_hash'), table_name='user_agents')
+    op.drop_table('user_agents')
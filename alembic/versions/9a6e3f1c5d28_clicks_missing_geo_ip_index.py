@@ -0,0 +1,34 @@
+"""Clicks missing-geo IP index: clicks(ip_address) WHERE country_id IS NULL AND city IS NULL
+
+Geo enrichment finds the clicks to fill in by IP among those stored without
+country or city. Without an index every batch scanned the whole clicks table,
+once to count the pending rows and again for each IP's UPDATE. The index is
+partial, so it only holds clicks still waiting for geo data.
+
+Revision ID: 9a6e3f1c5d28
+Revises: 3d9f0c6a8e51
+Create Date: 2026-10-20 11:02:37.514920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a6e3f1c5d28'
+down_revision: Union[str, None] = '3d9f0c6a8e51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match the Index on Click in src/app/models/click.py
+_missing_geo = sa.text('country_id IS NULL AND city IS NULL')
+
+
+def upgrade() -> None:
+    op.create_index('ix_clicks_ip_address_missing_geo', 'clicks', ['ip_address'], unique=False, sqlite_where=_missing_geo, postgresql_where=_missing_geo)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clicks_ip_address_missing_geo', table_name='clicks')
@@ -0,0 +1,166 @@
+"""Star-schema dimensions: countries, referrers, browsers, operating_systems, devices
+
+Replaces the free-text clicks.country / clicks.referrer and
+user_agents.browser / os / device columns with integer keys into small lookup
+tables. Existing rows are backfilled in batches.
+
+Revision ID: a41f6c8e2b57
+Revises: 7c2e4b9d1a3f
+Create Date: 2026-10-17 11:03:27.540961
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c8e2b57'
+down_revision: Union[str, None] = '7c2e4b9d1a3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# (lookup table, name length, table holding the old text column, text column, new key column)
+_NAMED_DIMENSIONS = [
+    ('countries', 100, 'clicks', 'country', 'country_id'),
+    ('browsers', 100, 'user_agents', 'browser', 'browser_id'),
+    ('operating_systems', 100, 'user_agents', 'os', 'os_id'),
+    ('devices', 50, 'user_agents', 'device', 'device_id'),
+]
+
+
+def _url_hash(url: str) -> str:
+    # Must match src.app.services.dimensions.value_hash
+    return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+
+
+def _assign_keys(conn, table, source, column, key, lookup) -> None:
+    """Point ``source.key`` at the ``table`` row whose ``lookup`` matches, by id range."""
+    max_id = conn.execute(sa.text(f'SELECT MAX(id) FROM {source}')).scalar() or 0
+    for start in range(0, max_id + 1, BATCH_SIZE):
+        conn.execute(
+            sa.text(
+                f'UPDATE {source} SET {key} = '
+                f'(SELECT id FROM {table} WHERE {lookup} = {source}.{column}) '
+                f'WHERE id >= :start AND id < :end AND {column} IS NOT NULL'
+            ),
+            {'start': start, 'end': start + BATCH_SIZE},
+        )
+
+
+def _backfill_named(conn, table, source, column, key) -> None:
+    conn.execute(sa.text(
+        f'INSERT INTO {table} (name) SELECT DISTINCT {column} FROM {source} '
+        f'WHERE {column} IS NOT NULL'
+    ))
+    _assign_keys(conn, table, source, column, key, 'name')
+
+
+def _backfill_referrers(conn) -> None:
+    # Referrer URLs are keyed by a hash computed here, and neither text
+    # column is indexed: temporary indexes keep the distinct-URL walk and the
+    # per-click lookups to index seeks
+    op.create_index('tmp_ix_clicks_referrer', 'clicks', ['referrer'])
+    op.create_index('tmp_ix_referrers_url', 'referrers', ['url'])
+    last = ''
+    while True:
+        urls = conn.execute(
+            sa.text(
+                "SELECT DISTINCT referrer FROM clicks WHERE referrer > :last "
+                "ORDER BY referrer LIMIT :limit"
+            ),
+            {'last': last, 'limit': BATCH_SIZE},
+        ).scalars().all()
+        if not urls:
+            break
+        conn.execute(
+            sa.text('INSERT INTO referrers (url_hash, url) VALUES (:url_hash, :url)'),
+            [{'url_hash': _url_hash(url), 'url': url} for url in urls],
+        )
+        last = urls[-1]
+    _assign_keys(conn, 'referrers', 'clicks', 'referrer', 'referrer_id', 'url')
+    op.drop_index('tmp_ix_referrers_url', table_name='referrers')
+    op.drop_index('tmp_ix_clicks_referrer', table_name='clicks')
+
+
+def upgrade() -> None:
+    for table, length, _, _, _ in _NAMED_DIMENSIONS:
+        op.create_table(table,
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=length), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+    op.create_table('referrers',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('url_hash', sa.String(length=32), nullable=False),
+    sa.Column('url', sa.String(length=500), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('url_hash')
+    )
+
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.add_column(sa.Column('country_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('referrer_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_clicks_country_id_countries', 'countries', ['country_id'], ['id']
+        )
+        batch_op.create_foreign_key(
+            'fk_clicks_referrer_id_referrers', 'referrers', ['referrer_id'], ['id']
+        )
+    with op.batch_alter_table('user_agents') as batch_op:
+        for table, _, source, _, key in _NAMED_DIMENSIONS:
+            if source == 'user_agents':
+                batch_op.add_column(sa.Column(key, sa.Integer(), nullable=True))
+                batch_op.create_foreign_key(f'fk_user_agents_{key}_{table}', table, [key], ['id'])
+
+    conn = op.get_bind()
+    for table, _, source, column, key in _NAMED_DIMENSIONS:
+        _backfill_named(conn, table, source, column, key)
+    _backfill_referrers(conn)
+
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.drop_column('referrer')
+        batch_op.drop_column('country')
+    with op.batch_alter_table('user_agents') as batch_op:
+        batch_op.drop_column('device')
+        batch_op.drop_column('os')
+        batch_op.drop_column('browser')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.add_column(sa.Column('country', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('referrer', sa.String(length=500), nullable=True))
+    with op.batch_alter_table('user_agents') as batch_op:
+        batch_op.add_column(sa.Column('browser', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('os', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('device', sa.String(length=50), nullable=True))
+
+    for table, _, source, column, key in _NAMED_DIMENSIONS:
+        op.execute(
+            f'UPDATE {source} SET {column} = (SELECT name FROM {table} WHERE id = {source}.{key}) '
+            f'WHERE {key} IS NOT NULL'
+        )
+    op.execute(
+        'UPDATE clicks SET referrer = (SELECT url FROM referrers WHERE id = clicks.referrer_id) '
+        'WHERE referrer_id IS NOT NULL'
+    )
+
+    with op.batch_alter_table('user_agents') as batch_op:
+        for table, _, source, _, key in reversed(_NAMED_DIMENSIONS):
+            if source == 'user_agents':
+                batch_op.drop_constraint(f'fk_user_agents_{key}_{table}', type_='foreignkey')
+                batch_op.drop_column(key)
+    with op.batch_alter_table('clicks') as batch_op:
+        batch_op.drop_constraint('fk_clicks_referrer_id_referrers', type_='foreignkey')
+        batch_op.drop_constraint('fk_clicks_country_id_countries', type_='foreignkey')
+        batch_op.drop_column('referrer_id')
+        batch_op.drop_column('country_id')
+    op.drop_table('referrers')
+    for table, _, _, _, _ in reversed(_NAMED_DIMENSIONS):
+        op.drop_table(table)
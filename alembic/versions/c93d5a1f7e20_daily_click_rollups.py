@@ -0,0 +1,73 @@
+"""Daily click rollups: daily_click_counts, daily_dimension_counts
+
+Per-link daily counts, overall and per country / referrer / user agent key,
+maintained as clicks are written. Populated here from the existing clicks.
+
+Revision ID: c93d5a1f7e20
+Revises: a41f6c8e2b57
+Create Date: 2026-10-17 13:41:09.672315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c93d5a1f7e20'
+down_revision: Union[str, None] = 'a41f6c8e2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match src.app.services.rollups.ROLLUP_DIMENSIONS
+_DIMENSIONS = {
+    'country': 'country_id',
+    'referrer': 'referrer_id',
+    'user_agent': 'user_agent_id',
+}
+
+
+def _utc_day() -> str:
+    # Must match src.app.database.utc_date: PostgreSQL would take date() of a
+    # timestamptz in the session time zone
+    if op.get_bind().dialect.name == 'postgresql':
+        return "CAST((clicked_at) AT TIME ZONE 'UTC' AS DATE)"
+    return 'date(clicked_at)'
+
+
+def upgrade() -> None:
+    op.create_table('daily_click_counts',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ),
+    sa.PrimaryKeyConstraint('link_id', 'day')
+    )
+    op.create_table('daily_dimension_counts',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('value_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ),
+    sa.PrimaryKeyConstraint('link_id', 'dimension', 'value_id', 'day')
+    )
+
+    day = _utc_day()
+    op.execute(
+        'INSERT INTO daily_click_counts (link_id, day, count) '
+        f'SELECT link_id, {day}, COUNT(*) FROM clicks '
+        f'GROUP BY link_id, {day}'
+    )
+    for dimension, column in _DIMENSIONS.items():
+        op.execute(
+            'INSERT INTO daily_dimension_counts (link_id, dimension, value_id, day, count) '
+            f"SELECT link_id, '{dimension}', {column}, {day}, COUNT(*) FROM clicks "
+            f'WHERE {column} IS NOT NULL GROUP BY link_id, {column}, {day}'
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_dimension_counts')
+    op.drop_table('daily_click_counts')
@@ -0,0 +1,34 @@
+"""Analytics composite indexes: clicks(link_id, clicked_at), links(user_id, created_at)
+
+clicks(link_id, clicked_at) replaces the plain link_id index: it serves the
+same lookups and also the per-link time-ordered and time-bounded reads
+(recent clicks, export, daily series) without a sort. links(user_id,
+created_at) serves the dashboard's newest-first link list.
+
+Revision ID: e5b21d0f8c34
+Revises: c93d5a1f7e20
+Create Date: 2026-10-17 16:12:48.209417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b21d0f8c34'
+down_revision: Union[str, None] = 'c93d5a1f7e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_clicks_link_id_clicked_at', 'clicks', ['link_id', 'clicked_at'], unique=False)
+    op.drop_index(op.f('ix_clicks_link_id'), table_name='clicks')
+    op.create_index('ix_links_user_id_created_at', 'links', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_links_user_id_created_at', table_name='links')
+    op.create_index(op.f('ix_clicks_link_id'), 'clicks', ['link_id'], unique=False)
+    op.drop_index('ix_clicks_link_id_clicked_at', table_name='clicks')
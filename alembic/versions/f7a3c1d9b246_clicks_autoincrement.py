@@ -0,0 +1,54 @@
+"""Clicks ids are never reused: AUTOINCREMENT on SQLite
+
+Archived clicks keep their ids in the clicks_YYYYMM partitions. Without
+AUTOINCREMENT, SQLite reuses ids once the live clicks table empties, so a
+new click could share an id with an archived one. The table is rebuilt with
+AUTOINCREMENT and its sequence starts above every id already handed out.
+PostgreSQL sequences never reuse ids, so nothing changes there.
+
+Revision ID: f7a3c1d9b246
+Revises: e5b21d0f8c34
+Create Date: 2026-10-18 09:41:05.118730
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a3c1d9b246'
+down_revision: Union[str, None] = 'e5b21d0f8c34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table(
+        'clicks', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+    ):
+        pass
+
+    tables = ['clicks'] + [
+        name for name in sa.inspect(bind).get_table_names()
+        if re.match(r'^clicks_\d{6}$', name)
+    ]
+    top = max(bind.execute(sa.text(f'SELECT MAX(id) FROM {table}')).scalar() or 0
+              for table in tables)
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'clicks'")
+    op.execute(
+        sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('clicks', :seq)")
+        .bindparams(seq=top)
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('clicks', recreate='always'):
+        pass
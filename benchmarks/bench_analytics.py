@@ -0,0 +1,88 @@
+"""Analytics page cost under each ``ANALYTICS_STRATEGY``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_analytics --clicks 10000 100000 1000000
+
+For each size, seeds one link with that many synthetic clicks spread over 90
+days, builds its rollups, and times ``get_click_stats`` with every strategy:
+``raw`` (one aggregate query per breakdown), ``single_pass`` (one UNION ALL
+statement over the raw clicks) and ``rollup`` (the daily rollup tables), each
+with its queries run one after another and with ``ANALYTICS_CONCURRENT``.
+The database file uses ``--journal-mode`` (WAL by default).
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import typing
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.bench_star_schema import _clicks, _seed_star
+from src.app.config import Settings, settings
+from src.app.database import create_engine
+from src.app.services.clicks import get_click_stats
+from src.app.services.dimensions import clear_dimension_cache
+from src.app.services.rollups import rebuild_rollups
+
+STRATEGIES = typing.get_args(Settings.model_fields["analytics_strategy"].annotation)
+
+
+async def _time_stats(session_factory, strategy: str, concurrent: bool, repeat: int) -> float:
+    settings.analytics_strategy = strategy
+    settings.analytics_concurrent = concurrent
+    async with session_factory() as db:
+        await get_click_stats(db, 1)  # warm the page cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await get_click_stats(db, 1)
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+async def _run(clicks: int, repeat: int, seed: int) -> dict[tuple[str, bool], float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        clear_dimension_cache()
+        await _seed_star(path, _clicks(clicks, seed))
+        engine = create_engine(f"sqlite+aiosqlite:///{path}")
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        await rebuild_rollups(session_factory)
+        results = {
+            (strategy, concurrent): await _time_stats(
+                session_factory, strategy, concurrent, repeat
+            )
+            for strategy in STRATEGIES
+            for concurrent in (False, True)
+        }
+        await engine.dispose()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--journal-mode", default="wal")
+    args = parser.parse_args()
+    settings.sqlite_journal_mode = args.journal_mode
+
+    print(
+        f"get_click_stats on one link, averaged over {args.repeat} runs "
+        f"(journal_mode={args.journal_mode})"
+    )
+    print(f"{'clicks':>9} {'strategy':<12} {'sequential':>12} {'concurrent':>12} {'speedup':>8}")
+    for clicks in args.clicks:
+        results = await _run(clicks, args.repeat, args.seed)
+        for strategy in STRATEGIES:
+            sequential, concurrent = results[(strategy, False)], results[(strategy, True)]
+            print(
+                f"{clicks:>9} {strategy:<12} {sequential:>9.1f} ms {concurrent:>9.1f} ms "
+                f"{sequential / concurrent:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
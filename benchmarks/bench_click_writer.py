@@ -0,0 +1,103 @@
+"""Compare per-click ``record_click`` with the batched ``record_clicks_batch`` writer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_click_writer --clicks 5000 --batch-size 100 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.app.database import Base
+from src.app.models import Click, Link, User  # noqa: F401 — register models
+from src.app.services.clicks import ClickEvent, record_click, record_clicks_batch
+
+USER_AGENTS = [
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1"
+    ),
+    "Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0",
+]
+REFERRERS = [None, "https://twitter.com", "https://news.ycombinator.com", "https://reddit.com"]
+LINKS = 20
+
+
+async def _setup(path: str) -> async_sessionmaker:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        user = User(email="bench@example.com", hashed_password="x", display_name="Bench")
+        db.add(user)
+        await db.flush()
+        db.add_all(
+            Link(slug=f"bench-{i}", target_url="https://example.com", user_id=user.id)
+            for i in range(LINKS)
+        )
+        await db.commit()
+    return session_factory
+
+
+def _events(count: int) -> list[ClickEvent]:
+    rng = random.Random(42)
+    # Loopback IPs skip the GeoIP provider so only the write path is measured
+    return [
+        ClickEvent(
+            rng.randint(1, LINKS), "127.0.0.1", rng.choice(REFERRERS), rng.choice(USER_AGENTS)
+        )
+        for _ in range(count)
+    ]
+
+
+async def bench_per_click(events: list[ClickEvent]) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        session_factory = await _setup(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        async with session_factory() as db:
+            for event in events:
+                link = await db.get(Link, event.link_id)
+                await record_click(db, link, event.ip_address, event.referrer, event.user_agent)
+        return time.perf_counter() - start
+
+
+async def bench_batched(events: list[ClickEvent], batch_size: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        session_factory = await _setup(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        async with session_factory() as db:
+            for offset in range(0, len(events), batch_size):
+                await record_clicks_batch(db, events[offset:offset + batch_size])
+        return time.perf_counter() - start
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[50, 500])
+    args = parser.parse_args()
+
+    events = _events(args.clicks)
+    results = [("record_click (per click)", await bench_per_click(events))]
+    for batch_size in args.batch_size:
+        elapsed = await bench_batched(events, batch_size)
+        results.append((f"record_clicks_batch (n={batch_size})", elapsed))
+
+    print(f"{args.clicks} clicks across {LINKS} links, file-backed SQLite")
+    print(f"{'writer':<34} {'seconds':>9} {'clicks/s':>10}")
+    for name, elapsed in results:
+        print(f"{name:<34} {elapsed:>9.3f} {args.clicks / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Expiring a month of clicks: ``DELETE`` from one table vs. dropping a partition.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_partitions --clicks 1000000
+
+Seeds one link with ``--clicks`` synthetic clicks spread over January-March
+2026 twice. On the first copy, January is expired with a ``DELETE`` on
+``clicks``; on the second, ``archive_closed_months`` first moves every month
+into its partition (a one-off cost, timed separately) and January is expired
+with ``drop_expired_partitions``. Also times the raw 30-day daily series on
+both layouts, which reads only the partitions inside its window.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.bench_star_schema import _clicks, _seed_star
+from src.app.database import create_engine
+from src.app.models.click import Click
+from src.app.services import partitions
+from src.app.services.clicks import _daily_clicks
+from src.app.services.dimensions import clear_dimension_cache
+
+# "Today" for the run: every seeded month is closed, and retaining the three
+# months before May drops January alone
+TODAY = datetime.date(2026, 5, 1)
+FEBRUARY = datetime.datetime(2026, 2, 1, tzinfo=datetime.timezone.utc)
+WINDOW_START = datetime.datetime(2026, 3, 2, tzinfo=datetime.timezone.utc)
+
+
+async def _time_daily_series(session_factory, repeat: int) -> float:
+    async with session_factory() as db:
+        await _daily_clicks(db, 1, WINDOW_START, from_rollups=False)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await _daily_clicks(db, 1, WINDOW_START, from_rollups=False)
+        return (time.perf_counter() - start) / repeat * 1000
+
+
+async def _seeded(tmp: str, name: str, clicks: list[dict]):
+    path = os.path.join(tmp, name)
+    clear_dimension_cache()
+    await _seed_star(path, clicks)
+    engine = create_engine(f"sqlite+aiosqlite:///{path}")
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    clicks = _clicks(args.clicks, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory = await _seeded(tmp, "flat.db", clicks)
+        flat_series = await _time_daily_series(session_factory, args.repeat)
+        start = time.perf_counter()
+        async with session_factory() as db:
+            await db.execute(delete(Click).where(Click.clicked_at < FEBRUARY))
+            await db.commit()
+        delete_ms = (time.perf_counter() - start) * 1000
+        await engine.dispose()
+
+        engine, session_factory = await _seeded(tmp, "partitioned.db", clicks)
+        start = time.perf_counter()
+        await partitions.archive_closed_months(session_factory, args.batch_size, TODAY)
+        archive_ms = (time.perf_counter() - start) * 1000
+        partitioned_series = await _time_daily_series(session_factory, args.repeat)
+        start = time.perf_counter()
+        dropped = await partitions.drop_expired_partitions(session_factory, 3, TODAY)
+        drop_ms = (time.perf_counter() - start) * 1000
+        assert dropped == [datetime.date(2026, 1, 1)]
+        await engine.dispose()
+
+    print(f"{args.clicks} clicks over January-March 2026")
+    print(f"{'':<28} {'one table':>12} {'partitioned':>12}")
+    print(f"{'expire January':<28} {delete_ms:>9.1f} ms {drop_ms:>9.1f} ms")
+    print(f"{'30-day daily series':<28} {flat_series:>9.1f} ms {partitioned_series:>9.1f} ms")
+    print(f"{'one-off archive of 3 months':<28} {'':>12} {archive_ms:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+"""Redirect and analytics throughput on PostgreSQL under different pool settings.
+
+Run from the repository root against an empty, throwaway database (its
+tables are dropped and recreated):
+
+    python -m benchmarks.bench_postgres_pool \\
+        --url postgresql+asyncpg://postgres@localhost/linkdrip_bench --clicks 50000
+
+Seeds one link with ``--clicks`` clicks, then for each configuration runs the
+same mixed workload as ``bench_sqlite_profiles`` for ``--seconds``: redirect
+workers GET the short link with clicks recorded inline, analytics workers
+compute ``get_click_stats`` with ``ANALYTICS_STRATEGY=raw``. Configurations
+range from a new connection per session (no pool) to a pool large enough for
+every worker, with and without prepared statement caching.
+"""
+import argparse
+import asyncio
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from benchmarks.bench_star_schema import _clicks, _seed_star_url
+from src.app.config import settings
+from src.app.database import Base, create_engine, get_db
+from src.app.main import app
+from src.app.services.clicks import get_click_stats
+from src.app.services.dimensions import clear_dimension_cache
+from src.app.services.links import slug_cache
+
+# (label, pool size or None for no pool, max overflow, statement cache size)
+CONFIGS = [
+    ("no pool", None, 0, 100),
+    ("pool 2", 2, 0, 100),
+    ("pool 10, no stmt cache", 10, 0, 0),
+    ("pool 10", 10, 0, 100),
+    ("pool 10 + overflow 10", 10, 10, 100),
+]
+
+
+async def _workload(
+    session_factory, seconds: float, redirect_workers: int, analytics_workers: int
+) -> tuple[float, float]:
+    deadline = time.perf_counter() + seconds
+    counts = {"redirects": 0, "analytics": 0}
+    transport = ASGITransport(app=app, client=("127.0.0.1", 1234))  # loopback skips GeoIP
+
+    async def redirect(client: AsyncClient):
+        while time.perf_counter() < deadline:
+            response = await client.get("/bench")
+            assert response.status_code == 302
+            counts["redirects"] += 1
+
+    async def analytics():
+        while time.perf_counter() < deadline:
+            async with session_factory() as db:
+                await get_click_stats(db, 1)
+            counts["analytics"] += 1
+
+    start = time.perf_counter()
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(
+            *(redirect(client) for _ in range(redirect_workers)),
+            *(analytics() for _ in range(analytics_workers)),
+        )
+    elapsed = time.perf_counter() - start
+    return counts["redirects"] / elapsed, counts["analytics"] / elapsed
+
+
+async def _run(config: tuple, args: argparse.Namespace) -> tuple[float, float]:
+    _, pool_size, max_overflow, cache_size = config
+    settings.db_statement_cache_size = cache_size
+    if pool_size is None:
+        engine = create_engine(args.url, poolclass=NullPool)
+    else:
+        engine = create_engine(args.url, pool_size=pool_size, max_overflow=max_overflow)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    slug_cache.clear()
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        return await _workload(
+            session_factory, args.seconds, args.redirect_workers, args.analytics_workers
+        )
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+async def _reset(url: str) -> None:
+    engine = create_engine(url, poolclass=NullPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True, help="postgresql+asyncpg:// URL to a scratch DB")
+    parser.add_argument("--clicks", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--redirect-workers", type=int, default=16)
+    parser.add_argument("--analytics-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    settings.analytics_strategy = "raw"
+
+    await _reset(args.url)
+    clear_dimension_cache()
+    await _seed_star_url(args.url, _clicks(args.clicks, args.seed))
+    print(
+        f"{args.clicks} seeded clicks, {args.seconds:.0f}s mixed workload, "
+        f"{args.redirect_workers} redirect / {args.analytics_workers} analytics workers"
+    )
+    print(f"{'configuration':<24} {'redirects':>14} {'analytics':>14}")
+    try:
+        for config in CONFIGS:
+            redirects, analytics = await _run(config, args)
+            print(f"{config[0]:<24} {redirects:>10.0f} r/s {analytics:>10.1f} r/s")
+    finally:
+        await _reset(args.url)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
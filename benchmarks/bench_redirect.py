@@ -0,0 +1,87 @@
+"""Requests/sec for short-link redirects: FastAPI ``redirect_to_target`` vs. ``RedirectFastPath``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_redirect --requests 5000
+
+HEAD requests measure pure slug resolution; GET requests also hand each click
+to the background ingestion queue, as in production.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.app.database import Base, get_db
+from src.app.main import app
+from src.app.middleware import RedirectFastPath
+from src.app.models import Click, Link, User  # noqa: F401 — register models
+from src.app.services.ingest import click_queue
+
+
+async def _setup(path: str) -> async_sessionmaker:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        user = User(email="bench@example.com", hashed_password="x", display_name="Bench")
+        db.add(user)
+        await db.flush()
+        db.add(Link(slug="bench", target_url="https://example.com/target", user_id=user.id))
+        await db.commit()
+    return session_factory
+
+
+async def _run(asgi_app, method: str, requests: int, concurrency: int) -> float:
+    transport = ASGITransport(app=asgi_app, client=("127.0.0.1", 1234))  # loopback skips GeoIP
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker(count: int):
+            for _ in range(count):
+                response = await client.request(method, "/bench")
+                assert response.status_code == 302
+
+        per_worker = requests // concurrency
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+        return per_worker * concurrency / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session_factory = await _setup(os.path.join(tmp, "bench.db"))
+
+        async def override_get_db():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        click_queue._session_factory = session_factory
+        fast_app = RedirectFastPath(app, session_factory=session_factory)
+
+        await click_queue.start()
+        try:
+            print(f"{args.requests} requests, concurrency {args.concurrency}")
+            header = f"{'method':<6} {'redirect_to_target':>20} {'RedirectFastPath':>18}"
+            print(f"{header} {'speedup':>8}")
+            for method in ("HEAD", "GET"):
+                baseline = await _run(app, method, args.requests, args.concurrency)
+                fast = await _run(fast_app, method, args.requests, args.concurrency)
+                speedup = fast / baseline
+                print(f"{method:<6} {baseline:>16.0f} r/s {fast:>14.0f} r/s {speedup:>7.1f}x")
+        finally:
+            await click_queue.stop()
+            app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Redirect and analytics throughput under each ``SQLITE_PROFILE``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sqlite_profiles --clicks 50000 --seconds 5
+
+For each profile, seeds a fresh SQLite file with one link and ``--clicks``
+clicks, then runs a mixed workload for ``--seconds``: redirect workers GET the
+short link with clicks recorded inline (one commit per click, so journal and
+sync settings show), while analytics workers compute ``get_click_stats`` for
+the link with ``ANALYTICS_STRATEGY=raw`` on their own sessions.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import typing
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from benchmarks.bench_star_schema import _clicks, _seed_star
+from src.app.config import Settings, settings
+from src.app.database import create_engine, get_db
+from src.app.main import app
+from src.app.services.clicks import get_click_stats
+from src.app.services.dimensions import clear_dimension_cache
+from src.app.services.links import slug_cache
+
+PROFILES = typing.get_args(Settings.model_fields["sqlite_profile"].annotation)
+
+
+async def _workload(
+    session_factory, seconds: float, redirect_workers: int, analytics_workers: int
+) -> tuple[float, float]:
+    deadline = time.perf_counter() + seconds
+    counts = {"redirects": 0, "analytics": 0}
+    transport = ASGITransport(app=app, client=("127.0.0.1", 1234))  # loopback skips GeoIP
+
+    async def redirect(client: AsyncClient):
+        while time.perf_counter() < deadline:
+            response = await client.get("/bench")
+            assert response.status_code == 302
+            counts["redirects"] += 1
+
+    async def analytics():
+        while time.perf_counter() < deadline:
+            async with session_factory() as db:
+                await get_click_stats(db, 1)
+            counts["analytics"] += 1
+
+    start = time.perf_counter()
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(
+            *(redirect(client) for _ in range(redirect_workers)),
+            *(analytics() for _ in range(analytics_workers)),
+        )
+    elapsed = time.perf_counter() - start
+    return counts["redirects"] / elapsed, counts["analytics"] / elapsed
+
+
+async def _run(profile: str, args: argparse.Namespace) -> tuple[float, float]:
+    settings.sqlite_profile = profile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        clear_dimension_cache()
+        slug_cache.clear()
+        await _seed_star(path, _clicks(args.clicks, args.seed))
+        engine = create_engine(f"sqlite+aiosqlite:///{path}")
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def override_get_db():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            return await _workload(
+                session_factory, args.seconds, args.redirect_workers, args.analytics_workers
+            )
+        finally:
+            app.dependency_overrides.clear()
+            await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--redirect-workers", type=int, default=8)
+    parser.add_argument("--analytics-workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    settings.analytics_strategy = "raw"
+
+    print(
+        f"{args.clicks} seeded clicks, {args.seconds:.0f}s mixed workload, "
+        f"{args.redirect_workers} redirect / {args.analytics_workers} analytics workers"
+    )
+    print(f"{'profile':<12} {'redirects':>14} {'analytics':>14}")
+    for profile in PROFILES:
+        redirects, analytics = await _run(profile, args)
+        print(f"{profile:<12} {redirects:>10.0f} r/s {analytics:>10.1f} r/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
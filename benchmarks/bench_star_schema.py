@@ -0,0 +1,206 @@
+"""Storage size and breakdown-query time: flat text click columns vs. the star schema.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_star_schema --clicks 200000
+
+Seeds two SQLite files with the same synthetic clicks on one link: one with the
+original flat ``clicks`` table (country, referrer, browser, os, device and the
+raw user agent as text on every row) and one with the current models (integer
+keys into small dimension tables). Reports file size after VACUUM and the time
+to compute the five analytics breakdowns.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from benchmarks.bench_ua_parse import BASE_USER_AGENTS
+from src.app.database import Base
+from src.app.models import Click, Link, User
+from src.app.models.dimensions import Browser, Country, Device, OperatingSystem, Referrer
+from src.app.models.user_agent import UserAgent
+from src.app.services.clicks import _top_values, parse_user_agent, user_agent_ids
+from src.app.services.dimensions import countries, referrers
+
+COUNTRIES = [
+    "United States", "Germany", "United Kingdom", "France", "India", "Brazil", "Japan",
+    "Canada", "Australia", "Netherlands", "Spain", "Italy", "Mexico", "Poland", "Sweden",
+]
+
+FLAT_SCHEMA = """
+CREATE TABLE clicks (
+    id INTEGER NOT NULL PRIMARY KEY,
+    link_id INTEGER NOT NULL,
+    ip_address VARCHAR(45),
+    country VARCHAR(100),
+    city VARCHAR(100),
+    referrer VARCHAR(500),
+    browser VARCHAR(100),
+    os VARCHAR(100),
+    device VARCHAR(50),
+    user_agent VARCHAR(500),
+    clicked_at DATETIME NOT NULL
+)
+"""
+
+FLAT_BREAKDOWNS = [
+    "SELECT country, COUNT(id) FROM clicks WHERE link_id = 1 AND country IS NOT NULL "
+    "GROUP BY country ORDER BY COUNT(id) DESC LIMIT 10",
+    "SELECT browser, COUNT(id) FROM clicks WHERE link_id = 1 AND browser IS NOT NULL "
+    "GROUP BY browser ORDER BY COUNT(id) DESC LIMIT 10",
+    "SELECT os, COUNT(id) FROM clicks WHERE link_id = 1 AND os IS NOT NULL "
+    "GROUP BY os ORDER BY COUNT(id) DESC LIMIT 10",
+    "SELECT device, COUNT(id) FROM clicks WHERE link_id = 1 AND device IS NOT NULL "
+    "GROUP BY device ORDER BY COUNT(id) DESC",
+    "SELECT referrer, COUNT(id) FROM clicks WHERE link_id = 1 AND referrer IS NOT NULL "
+    "AND referrer != '' GROUP BY referrer ORDER BY COUNT(id) DESC LIMIT 10",
+]
+
+
+def _clicks(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    user_agents = [
+        BASE_USER_AGENTS[i % len(BASE_USER_AGENTS)].format(v=90 + i // len(BASE_USER_AGENTS))
+        for i in range(300)
+    ]
+    referrer_urls = [f"https://news.example{i}.com/post/{i * 7}" for i in range(500)]
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "ip_address": f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "country": rng.choice(COUNTRIES),
+            "city": None,
+            "referrer": rng.choice(referrer_urls) if rng.random() < 0.6 else None,
+            "user_agent": rng.choices(user_agents, weights=[1 / (r + 1) for r in range(300)])[0],
+            "clicked_at": start + datetime.timedelta(seconds=rng.randint(0, 90 * 86400)),
+        }
+        for _ in range(count)
+    ]
+
+
+async def _engine(path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def _seed_flat(path: str, clicks: list[dict]) -> None:
+    engine, _ = await _engine(path)
+    async with engine.begin() as conn:
+        await conn.execute(text(FLAT_SCHEMA))
+        await conn.execute(text("CREATE INDEX ix_clicks_link_id ON clicks (link_id)"))
+        rows = []
+        for click in clicks:
+            ua = parse_user_agent(click["user_agent"])
+            rows.append({**click, **ua, "link_id": 1})
+        await conn.execute(
+            text(
+                "INSERT INTO clicks (link_id, ip_address, country, city, referrer, browser, os, "
+                "device, user_agent, clicked_at) VALUES (:link_id, :ip_address, :country, :city, "
+                ":referrer, :browser, :os, :device, :user_agent, :clicked_at)"
+            ),
+            rows,
+        )
+    await engine.dispose()
+
+
+async def _seed_star(path: str, clicks: list[dict]) -> None:
+    await _seed_star_url(f"sqlite+aiosqlite:///{path}", clicks)
+
+
+async def _seed_star_url(url: str, clicks: list[dict]) -> None:
+    """Create the schema at ``url`` and write one link with ``clicks``."""
+    engine = create_async_engine(url)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        user = User(email="bench@example.com", hashed_password="x", display_name="Bench")
+        db.add(user)
+        await db.flush()
+        db.add(Link(slug="bench", target_url="https://example.com", user_id=user.id))
+        await db.flush()
+        country_ids = await countries.ids(db, {c["country"] for c in clicks})
+        referrer_ids = await referrers.ids(db, {c["referrer"] for c in clicks if c["referrer"]})
+        ua_ids = await user_agent_ids(db, {c["user_agent"] for c in clicks})
+        rows = [
+            {
+                "link_id": 1,
+                "ip_address": c["ip_address"],
+                "country_id": country_ids[c["country"]],
+                "city": c["city"],
+                "referrer_id": referrer_ids[c["referrer"]] if c["referrer"] else None,
+                "user_agent_id": ua_ids[c["user_agent"]],
+                "clicked_at": c["clicked_at"],
+            }
+            for c in clicks
+        ]
+        await db.execute(insert(Click).execution_options(render_nulls=True), rows)
+        await db.commit()
+    await engine.dispose()
+
+
+async def _size_after_vacuum(path: str) -> int:
+    engine, _ = await _engine(path)
+    async with engine.connect() as conn:
+        await conn.execute(text("VACUUM"))
+    await engine.dispose()
+    return os.path.getsize(path)
+
+
+async def _time_breakdowns(path: str, star: bool, repeat: int) -> float:
+    engine, session_factory = await _engine(path)
+    async with session_factory() as db:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if star:
+                await _top_values(db, 1, Country, Click.country_id, limit=10)
+                await _top_values(db, 1, Browser, UserAgent.browser_id, limit=10)
+                await _top_values(db, 1, OperatingSystem, UserAgent.os_id, limit=10)
+                await _top_values(db, 1, Device, UserAgent.device_id)
+                await _top_values(db, 1, Referrer, Click.referrer_id, limit=10)
+            else:
+                for query in FLAT_BREAKDOWNS:
+                    (await db.execute(text(query))).all()
+        elapsed = (time.perf_counter() - start) / repeat
+    await engine.dispose()
+    return elapsed * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    clicks = _clicks(args.clicks, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        flat_path = os.path.join(tmp, "flat.db")
+        star_path = os.path.join(tmp, "star.db")
+        await _seed_flat(flat_path, clicks)
+        await _seed_star(star_path, clicks)
+
+        results = {}
+        for name, path, star in (("flat", flat_path, False), ("star", star_path, True)):
+            size = await _size_after_vacuum(path)
+            ms = await _time_breakdowns(path, star, args.repeat)
+            results[name] = (size, ms)
+
+    print(f"{args.clicks} clicks on one link, breakdowns averaged over {args.repeat} runs")
+    print(f"{'schema':<8} {'db size':>12} {'breakdowns':>12}")
+    for name, (size, ms) in results.items():
+        print(f"{name:<8} {size / 1024 / 1024:>9.1f} MB {ms:>9.1f} ms")
+    flat_size, flat_ms = results["flat"]
+    star_size, star_ms = results["star"]
+    print(f"star vs flat: {star_size / flat_size:.0%} of the size, {flat_ms / star_ms:.1f}x faster")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
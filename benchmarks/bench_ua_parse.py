@@ -0,0 +1,74 @@
+"""Per-call cost of user-agent parsing: raw ``user_agents`` parser vs. the memoized one.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ua_parse --calls 50000 --distinct 300
+
+Calls are drawn from a small corpus of real browser, mobile and bot user-agent
+strings, expanded with version variants to ``--distinct`` strings and sampled
+with a Zipf-like skew so a few popular strings dominate, as in real traffic.
+"""
+import argparse
+import random
+import time
+
+from src.app.services import clicks
+from src.app.services.clicks import parse_user_agent
+
+BASE_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/{v}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/{v}.0 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{v} like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/{v}.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:{v}.0) Gecko/20100101 Firefox/{v}.0",
+    "Mozilla/5.0 (iPad; CPU OS 16_{v} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html) v{v}",
+    "facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php) v{v}",
+]
+
+
+def _corpus(distinct: int, calls: int, seed: int) -> list[str]:
+    variants = [
+        BASE_USER_AGENTS[i % len(BASE_USER_AGENTS)].format(v=90 + i // len(BASE_USER_AGENTS))
+        for i in range(distinct)
+    ]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(variants, weights=weights, k=calls)
+
+
+def _time_per_call(fn, corpus: list[str]) -> float:
+    start = time.perf_counter()
+    for ua in corpus:
+        fn(ua)
+    return (time.perf_counter() - start) / len(corpus) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50000)
+    parser.add_argument("--distinct", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = _corpus(args.distinct, args.calls, args.seed)
+    clicks._parse_user_agent_cached.cache_clear()
+
+    uncached = _time_per_call(clicks._parse_user_agent, corpus)
+    memoized = _time_per_call(parse_user_agent, corpus)
+    stats = clicks.ua_cache_stats()
+
+    print(f"{args.calls} calls over {args.distinct} distinct user agents")
+    print(f"{'parser':<10} {'us/call':>10}")
+    print(f"{'uncached':<10} {uncached:>10.2f}")
+    print(f"{'memoized':<10} {memoized:>10.2f}   ({uncached / memoized:.0f}x, "
+          f"hit ratio {stats['hit_ratio']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,7 @@ from src.app.dependencies import get_current_user
 from src.app.models.user import User
 from src.app.services.clicks import (
     get_all_clicks_for_export,
-    get_click_stats,
+    get_cached_click_stats,
     get_link_with_owner,
 )
 
@@ -41,7 +41,7 @@ async def link_analytics(
     if link is None:
         raise HTTPException(status_code=404, detail="Link not found")
 
-    stats = await get_click_stats(db, link_id)
+    stats = await get_cached_click_stats(db, link)
     short_url = f"{settings.app_url}/{link.slug}"
 
     return templates.TemplateResponse(
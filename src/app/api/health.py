@@ -1,5 +1,14 @@
 from fastapi import APIRouter
 
+from src.app.services.clicks import click_stats_cache, ua_cache_stats
+from src.app.services.dimensions import dimension_cache_stats
+from src.app.services.enrichment import geo_enricher
+from src.app.services.geoip import geoip_breaker, geoip_cache_stats, geoip_provider_stats
+from src.app.services.ingest import click_queue
+from src.app.services.links import slug_cache
+from src.app.services.slug_filter import slug_filter
+from src.app.services.slug_index import slug_index
+
 router = APIRouter(tags=["health"])
 
 
@@ -9,4 +18,23 @@ async def health_check():
         "status": "healthy",
         "service": "LinkDrip",
         "version": "0.1.0",
+        "geoip": geoip_breaker.state,
+    }
+
+
+@router.get("/health/metrics")
+async def health_metrics():
+    """In-process cache and pipeline counters for this worker."""
+    return {
+        "slug_cache": slug_cache.stats(),
+        "slug_filter": slug_filter.stats(),
+        "slug_index": slug_index.stats(),
+        "click_queue": click_queue.stats(),
+        "ua_cache": ua_cache_stats(),
+        "dimension_cache": dimension_cache_stats(),
+        "analytics_cache": click_stats_cache.stats(),
+        "geoip_cache": geoip_cache_stats(),
+        "geoip_provider": geoip_provider_stats(),
+        "geoip_breaker": geoip_breaker.stats(),
+        "geo_enrichment": geo_enricher.stats(),
     }
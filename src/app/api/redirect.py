@@ -1,15 +1,36 @@
+import datetime
+import functools
+
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.app.database import get_db
-from src.app.services.clicks import record_click
-from src.app.services.links import get_link_by_slug
+from src.app.services.clicks import ClickEvent
+from src.app.services.ingest import track_click
+from src.app.services.links import resolve_slug
 
 templates = Jinja2Templates(directory="src/app/templates")
 router = APIRouter(tags=["redirect"])
 
+# Top-level paths owned by other routes that must never resolve as slugs
+INTERNAL_PATHS = frozenset({
+    "dashboard", "login", "register", "logout",
+    "health", "static", "docs", "openapi.json", "redoc",
+    "favicon.ico", "robots.txt", "sitemap.xml",
+})
+
+
+@functools.cache
+def not_found_body() -> bytes:
+    """The slug 404 page, rendered once — it has no per-request content."""
+    return templates.get_template("pages/404.html").render().encode()
+
+
+def _not_found() -> HTMLResponse:
+    return HTMLResponse(not_found_body(), status_code=404)
+
 
 @router.api_route("/{slug}", methods=["GET", "HEAD"])
 async def redirect_to_target(
@@ -19,25 +40,12 @@ async def redirect_to_target(
 ):
     """Public redirect endpoint — resolves short link and tracks click."""
     # Exclude known internal paths so we don't catch them
-    internal_paths = {
-        "dashboard", "login", "register", "logout",
-        "health", "static", "docs", "openapi.json", "redoc",
-        "favicon.ico", "robots.txt", "sitemap.xml",
-    }
-    if slug in internal_paths:
-        return templates.TemplateResponse(
-            "pages/404.html",
-            {"request": request},
-            status_code=404,
-        )
-
-    link = await get_link_by_slug(db, slug)
+    if slug in INTERNAL_PATHS:
+        return _not_found()
+
+    link = await resolve_slug(db, slug)
     if link is None:
-        return templates.TemplateResponse(
-            "pages/404.html",
-            {"request": request},
-            status_code=404,
-        )
+        return _not_found()
 
     # Only record clicks for GET requests — HEAD requests from crawlers/preview
     # tools should not inflate click counts
@@ -45,6 +53,9 @@ async def redirect_to_target(
         ip_address = request.client.host if request.client else None
         referrer = request.headers.get("referer")
         user_agent = request.headers.get("user-agent")
-        await record_click(db, link, ip_address, referrer, user_agent)
+        await track_click(db, ClickEvent(
+            link.id, ip_address, referrer, user_agent,
+            datetime.datetime.now(datetime.timezone.utc),
+        ))
 
     return RedirectResponse(url=link.target_url, status_code=302)
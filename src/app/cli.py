@@ -0,0 +1,145 @@
+"""Operational commands.
+
+Run from the repository root, e.g.:
+
+    python -m src.app.cli build-geoip-db ranges.csv geoip.bin
+    python -m src.app.cli enrich-geo
+    python -m src.app.cli rebuild-rollups
+    python -m src.app.cli partition-clicks
+    python -m src.app.cli compact-clicks
+"""
+import argparse
+import asyncio
+import inspect
+
+from src.app import database
+from src.app.config import settings
+from src.app.services.compaction import compact_clicks
+from src.app.services.enrichment import enrich_missing_geo
+from src.app.services.geoip import build_geoip_database, close_geoip, open_geoip
+from src.app.services.partitions import archive_closed_months, drop_expired_partitions
+from src.app.services.rollups import rebuild_rollups
+
+
+def _build_geoip_db(args: argparse.Namespace) -> None:
+    with open(args.csv_path, newline="", encoding="utf-8") as f:
+        data = build_geoip_database(f)
+    with open(args.output_path, "wb") as f:
+        f.write(data)
+    print(f"Wrote {len(data)} bytes to {args.output_path}")
+
+
+async def _enrich_geo(args: argparse.Namespace) -> None:
+    await open_geoip()
+    try:
+        updated = await enrich_missing_geo(database.async_session, args.batch_size)
+    finally:
+        await close_geoip()
+        await database.engine.dispose()
+    print(f"Enriched {updated} clicks")
+
+
+async def _rebuild_rollups(args: argparse.Namespace) -> None:
+    try:
+        rebuilt = await rebuild_rollups(database.async_session, args.link_id or None)
+    finally:
+        await database.engine.dispose()
+    print(f"Rebuilt rollups for {rebuilt} links")
+
+
+async def _partition_clicks(args: argparse.Namespace) -> None:
+    retention_months = (
+        settings.click_retention_months if args.retention_months is None
+        else args.retention_months
+    )
+    try:
+        moved = await archive_closed_months(database.async_session, args.batch_size)
+        dropped = await drop_expired_partitions(database.async_session, retention_months)
+    finally:
+        await database.engine.dispose()
+    print(f"Archived {moved} clicks, dropped {len(dropped)} expired partitions")
+
+
+async def _compact_clicks(args: argparse.Namespace) -> None:
+    age_days = settings.click_compaction_age_days if args.age_days is None else args.age_days
+    try:
+        removed = await compact_clicks(database.async_session, age_days, args.batch_size)
+    finally:
+        await database.engine.dispose()
+    print(f"Compacted {removed} clicks into the rollups")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.app.cli", description="LinkDrip admin commands"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    geoip_db = commands.add_parser(
+        "build-geoip-db",
+        help="Compile a start_ip,end_ip,country,city CSV into a local GeoIP database",
+    )
+    geoip_db.add_argument("csv_path")
+    geoip_db.add_argument("output_path")
+    geoip_db.set_defaults(handler=_build_geoip_db)
+
+    enrich = commands.add_parser(
+        "enrich-geo", help="Backfill country/city on clicks stored without geo data"
+    )
+    enrich.add_argument(
+        "--batch-size", type=int, default=100, help="Distinct IPs resolved per UPDATE"
+    )
+    enrich.set_defaults(handler=_enrich_geo)
+
+    rebuild = commands.add_parser(
+        "rebuild-rollups", help="Regenerate the per-link daily analytics rollups from raw clicks"
+    )
+    rebuild.add_argument(
+        "--link-id", type=int, action="append", help="Only rebuild this link (repeatable)"
+    )
+    rebuild.set_defaults(handler=_rebuild_rollups)
+
+    partition = commands.add_parser(
+        "partition-clicks",
+        help="Move closed months of clicks into monthly partitions and drop expired ones",
+    )
+    partition.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.click_partition_batch_size,
+        help="Clicks moved per transaction",
+    )
+    partition.add_argument(
+        "--retention-months",
+        type=int,
+        help="Override CLICK_RETENTION_MONTHS (0 keeps every partition)",
+    )
+    partition.set_defaults(handler=_partition_clicks)
+
+    compact = commands.add_parser(
+        "compact-clicks",
+        help="Fold raw clicks older than the compaction age into the rollups and delete them",
+    )
+    compact.add_argument(
+        "--age-days", type=int, help="Override CLICK_COMPACTION_AGE_DAYS (0 disables)"
+    )
+    compact.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.click_compaction_batch_size,
+        help="Clicks compacted per transaction",
+    )
+    compact.set_defaults(handler=_compact_clicks)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    result = args.handler(args)
+    if inspect.iscoroutine(result):
+        asyncio.run(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -9,9 +11,128 @@ class Settings(BaseSettings):
 
     database_url: str = "sqlite+aiosqlite:///./linkdrip.db"
 
+    # Connection pool for PostgreSQL (postgresql+asyncpg:// URLs): connections
+    # kept open and allowed on top of them, seconds to wait for one and before
+    # one is replaced, a liveness check on checkout, and prepared statements
+    # cached per connection (0 disables, e.g. behind PgBouncer)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+
+    # SQLite storage profile, applied as PRAGMAs on each new connection:
+    # "default" leaves SQLite's defaults (rollback journal, synchronous=FULL),
+    # "balanced" switches to WAL with synchronous=NORMAL and a busy timeout,
+    # "throughput" also enlarges the page cache, memory-maps the file and keeps
+    # temp tables in memory. The sqlite_* settings below override single PRAGMAs.
+    sqlite_profile: Literal["default", "balanced", "throughput"] = "balanced"
+    sqlite_journal_mode: Literal["delete", "truncate", "persist", "wal"] | None = None
+    sqlite_synchronous: Literal["off", "normal", "full", "extra"] | None = None
+    sqlite_cache_size: int | None = None  # pages, or KiB when negative
+    sqlite_mmap_size: int | None = None  # bytes
+    sqlite_temp_store: Literal["default", "file", "memory"] | None = None
+    sqlite_busy_timeout_ms: int | None = None
+
     jwt_algorithm: str = "HS256"
     jwt_expiration_minutes: int = 1440  # 24 hours
 
+    # In-process slug -> target cache used by the redirect hot path
+    slug_cache_size: int = 10000
+    slug_cache_ttl_seconds: float = 300.0
+
+    # Bloom filter over existing slugs so unknown slugs 404 without a query
+    # (needs the shared slug index below)
+    slug_filter_enabled: bool = True
+    slug_filter_error_rate: float = 0.001
+    slug_filter_refresh_seconds: float = 60.0
+
+    # Shared memory-mapped slug index for multi-worker deployments
+    slug_index_enabled: bool = False
+    slug_index_path: str = "./linkdrip-slugs.idx"
+    slug_index_check_interval_seconds: float = 1.0
+    slug_index_rebuild_delay_ms: int = 250
+
+    # Serve slug redirects from a raw ASGI middleware ahead of FastAPI routing
+    redirect_fast_path: bool = False
+
+    # GeoIP provider: "http" (ip-api.com, one request per IP), "batch" (ip-api.com
+    # batch endpoint) or "local" (offline range database)
+    geoip_provider: Literal["http", "batch", "local"] = "http"
+    geoip_database_path: str = "./geoip.bin"
+    geoip_batch_window_ms: int = 10
+    geoip_batch_size: int = 100
+    geoip_batch_requests_per_minute: float = 15.0
+
+    # "inline" resolves geo before a click is written; "deferred" writes the click
+    # with NULL country/city and a background worker backfills it
+    geoip_mode: Literal["inline", "deferred"] = "inline"
+    geoip_enrichment_queue_size: int = 10000
+    geoip_enrichment_batch_size: int = 100
+    geoip_enrichment_flush_interval_ms: int = 500
+
+    # GeoIP result cache (LRU with per-entry TTL; failures cached briefly)
+    geoip_cache_size: int = 50000
+    geoip_cache_ttl_seconds: float = 86400.0
+    geoip_negative_cache_size: int = 5000
+    geoip_negative_cache_ttl_seconds: float = 60.0
+
+    # Circuit breaker around the GeoIP provider
+    geoip_breaker_failure_threshold: int = 5
+    geoip_breaker_reset_timeout_seconds: float = 30.0
+
+    # Pooled HTTP client used for GeoIP lookups
+    geoip_timeout_seconds: float = 3.0
+    geoip_connect_timeout_seconds: float = 1.0
+    geoip_max_connections: int = 20
+    geoip_max_keepalive_connections: int = 10
+    geoip_keepalive_expiry_seconds: float = 30.0
+
+    # Memoized user-agent parsing (distinct UA strings kept)
+    ua_cache_size: int = 1024
+
+    # In-memory cache of dimension surrogate keys, per dimension table
+    dimension_cache_size: int = 10000
+
+    # Where analytics come from: per-link daily rollups maintained at ingest
+    # time, one aggregate query per breakdown over the raw clicks ("raw"), or
+    # a single UNION ALL query over the raw clicks ("single_pass")
+    analytics_strategy: Literal["rollup", "raw", "single_pass"] = "rollup"
+    # Run the independent analytics queries at once, each on its own pooled
+    # connection (needs a WAL journal on file-backed SQLite, as in the default profile)
+    analytics_concurrent: bool = False
+
+    # Per-link analytics results, reused until the link's click count changes
+    # or they reach max age (size 0 disables); with stale-while-revalidate a
+    # stale result is served while it is recomputed in the background
+    analytics_cache_size: int = 1000
+    analytics_cache_max_age_seconds: float = 60.0
+    analytics_cache_stale_while_revalidate: bool = False
+
+    # Raw clicks from before the current month move to monthly clicks_YYYYMM
+    # tables on each partition-clicks run, which then drops partitions older
+    # than the current month and the CLICK_RETENTION_MONTHS before it (0 keeps
+    # them all); rollups keep counting dropped months
+    click_retention_months: int = 0
+    click_partition_batch_size: int = 5000
+    # How long each process reuses its list of partitions; partitions created
+    # or dropped by another process can go unseen for this long
+    click_partition_cache_seconds: float = 5.0
+    # Raw clicks older than this many days are folded into the daily rollups
+    # and deleted by compact-clicks (0 keeps them); analytics read the rollups
+    # for those days
+    click_compaction_age_days: int = 0
+    click_compaction_batch_size: int = 5000
+
+    # Background click ingestion (redirects enqueue, a lifespan task persists)
+    click_queue_enabled: bool = True
+    click_queue_size: int = 10000
+    click_queue_overflow: Literal["drop", "block", "spill"] = "drop"
+    click_queue_spill_path: str = "./linkdrip-clicks.spill.jsonl"
+    click_batch_size: int = 500
+    click_flush_interval_ms: int = 50
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
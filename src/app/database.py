@@ -1,13 +1,98 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import Date, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.functions import FunctionElement
 
 from src.app.config import settings
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    connect_args={"check_same_thread": False},
-)
+# PRAGMAs per SQLITE_PROFILE, applied in this order (busy_timeout first, so
+# switching the journal mode waits out other connections instead of failing)
+SQLITE_PROFILES: dict[str, dict[str, str | int]] = {
+    "default": {},
+    "balanced": {
+        "busy_timeout": 5000,
+        "journal_mode": "wal",
+        "synchronous": "normal",
+    },
+    "throughput": {
+        "busy_timeout": 5000,
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -65536,  # 64 MiB
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "memory",
+    },
+}
+
+
+def sqlite_pragmas() -> dict[str, str | int]:
+    """The PRAGMAs new SQLite connections get: the profile plus any overrides."""
+    overrides = {
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+    pragmas = dict(SQLITE_PROFILES[settings.sqlite_profile])
+    pragmas.update({name: value for name, value in overrides.items() if value is not None})
+    return pragmas
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def engine_options(url: str) -> dict:
+    """Backend-specific ``create_async_engine`` arguments for ``url``, from Settings."""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    if backend == "postgresql":
+        return {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout_seconds,
+            "pool_recycle": settings.db_pool_recycle_seconds,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+            # SQLAlchemy's cache of prepared statements and asyncpg's own
+            "connect_args": {
+                "prepared_statement_cache_size": settings.db_statement_cache_size,
+                "statement_cache_size": settings.db_statement_cache_size,
+            },
+        }
+    return {}
+
+
+def create_engine(url: str, **kwargs) -> AsyncEngine:
+    """Async engine for ``url`` with its backend's options (SQLite PRAGMAs, PostgreSQL pool).
+
+    Explicit ``kwargs`` take precedence over the configured options.
+    """
+    options = engine_options(url)
+    if "poolclass" in kwargs:
+        # Sizing only applies to the default queue pool
+        for name in ("pool_size", "max_overflow", "pool_timeout"):
+            options.pop(name, None)
+    engine = create_async_engine(url, **{**options, **kwargs})
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+engine = create_engine(settings.database_url, echo=settings.debug)
 
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -16,6 +101,36 @@ class Base(DeclarativeBase):
     pass
 
 
+def upsert(db: AsyncSession, table):
+    """An INSERT supporting ``ON CONFLICT`` clauses, for the session's backend."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+class utc_date(FunctionElement):
+    """The UTC calendar day of a timestamp, as a DATE.
+
+    SQLite stores timestamps as UTC text, which ``date()`` truncates;
+    PostgreSQL converts a ``timestamptz`` in the session time zone, so it is
+    taken to UTC first.
+    """
+
+    type = Date()
+    name = "utc_date"
+    inherit_cache = True
+
+
+@compiles(utc_date)
+def _compile_utc_date(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(utc_date, "postgresql")
+def _compile_utc_date_postgresql(element, compiler, **kw):
+    return f"CAST(({compiler.process(element.clauses, **kw)}) AT TIME ZONE 'UTC' AS DATE)"
+
+
 async def get_db():
     async with async_session() as session:
         try:
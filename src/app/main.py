@@ -1,4 +1,5 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import HTTPException
@@ -13,9 +14,16 @@ from src.app.api.health import router as health_router
 from src.app.api.pages import router as pages_router
 from src.app.api.redirect import router as redirect_router
 from src.app.config import settings
-from src.app.database import Base, engine
+from src.app.database import Base, async_session, engine
 from src.app.dependencies import AuthRedirect
+from src.app.middleware import RedirectFastPath
 from src.app.models import Click, Link, User  # noqa: F401 — register models
+from src.app.services.clicks import click_stats_cache
+from src.app.services.enrichment import geo_enricher
+from src.app.services.geoip import close_geoip, open_geoip
+from src.app.services.ingest import click_queue
+from src.app.services.slug_filter import refresh_slug_filter, slug_filter
+from src.app.services.slug_index import slug_index, slug_index_writer
 
 
 @asynccontextmanager
@@ -23,7 +31,36 @@ async def lifespan(app: FastAPI):
     # Create tables on startup (dev convenience; Alembic handles prod migrations)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await open_geoip()
+    background = []
+    if settings.slug_index_enabled:
+        await slug_index_writer.rebuild()
+        slug_index.open()
+        slug_index_writer.enabled = True
+    # Only the shared index tells a worker when others have created links
+    if settings.slug_filter_enabled and settings.slug_index_enabled:
+        async with async_session() as db:
+            await slug_filter.load(db)
+        background.append(asyncio.create_task(
+            refresh_slug_filter(async_session, settings.slug_filter_refresh_seconds)
+        ))
+    if settings.geoip_mode == "deferred":
+        await geo_enricher.start()
+    if settings.click_queue_enabled:
+        await click_queue.start()
     yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Drain pending clicks before the engine goes away
+    await click_queue.stop()
+    await geo_enricher.stop()
+    await click_stats_cache.close()
+    await close_geoip()
+    slug_index_writer.enabled = False
+    await slug_index_writer.flush()
+    slug_index.close()
     await engine.dispose()
 
 
@@ -65,3 +102,6 @@ app.include_router(dashboard_router)
 app.include_router(analytics_router)
 # Redirect router MUST be last — it has a catch-all /{slug} pattern
 app.include_router(redirect_router)
+
+if settings.redirect_fast_path:
+    app.add_middleware(RedirectFastPath)
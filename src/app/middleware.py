@@ -0,0 +1,91 @@
+import datetime
+import re
+from urllib.parse import quote
+
+from src.app import database
+from src.app.api.redirect import INTERNAL_PATHS, not_found_body
+from src.app.services.clicks import ClickEvent
+from src.app.services.ingest import track_click
+from src.app.services.links import resolve_slug
+
+# Single path segment made of slug characters (base62 or custom lowercase/hyphen slugs)
+_SLUG_PATH = re.compile(r"/([A-Za-z0-9-]{1,64})")
+
+# Same safe set Starlette's RedirectResponse uses when quoting the Location header
+_LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+class RedirectFastPath:
+    """Pure-ASGI fast path for short-link redirects.
+
+    Slug-shaped GET/HEAD requests are resolved (slug cache first, then one
+    lightweight query) and answered with a bare 302 — or the pre-rendered 404
+    page — without going through FastAPI routing, dependency injection, or
+    response classes. Anything else is passed through to the wrapped app.
+    """
+
+    def __init__(self, app, session_factory=None):
+        self.app = app
+        self._session_factory = session_factory
+
+    @property
+    def session_factory(self):
+        return self._session_factory or database.async_session
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        match = _SLUG_PATH.fullmatch(scope["path"])
+        if match is None or match.group(1) in INTERNAL_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        async with self.session_factory() as db:
+            link = await resolve_slug(db, match.group(1))
+            if link is None:
+                await _send_not_found(send)
+                return
+            # HEAD requests from crawlers/preview tools don't count as clicks
+            if scope["method"] == "GET":
+                await track_click(db, _click_event(scope, link.id))
+
+        await send({
+            "type": "http.response.start",
+            "status": 302,
+            "headers": [
+                (b"location", quote(link.target_url, safe=_LOCATION_SAFE).encode("latin-1")),
+                (b"content-length", b"0"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def _send_not_found(send) -> None:
+    body = not_found_body()
+    await send({
+        "type": "http.response.start",
+        "status": 404,
+        "headers": [
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _click_event(scope, link_id: int) -> ClickEvent:
+    referrer = user_agent = None
+    for name, value in scope["headers"]:
+        if name == b"referer":
+            referrer = value.decode("latin-1")
+        elif name == b"user-agent":
+            user_agent = value.decode("latin-1")
+    client = scope.get("client")
+    return ClickEvent(
+        link_id,
+        client[0] if client else None,
+        referrer,
+        user_agent,
+        datetime.datetime.now(datetime.timezone.utc),
+    )
@@ -1,5 +1,21 @@
 from src.app.models.click import Click
+from src.app.models.dimensions import Browser, Country, Device, OperatingSystem, Referrer
 from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount, DailyDimensionCount, RawClickHorizon
 from src.app.models.user import User
+from src.app.models.user_agent import UserAgent
 
-__all__ = ["User", "Link", "Click"]
+__all__ = [
+    "User",
+    "Link",
+    "Click",
+    "UserAgent",
+    "Country",
+    "Referrer",
+    "Browser",
+    "OperatingSystem",
+    "Device",
+    "DailyClickCount",
+    "DailyDimensionCount",
+    "RawClickHorizon",
+]
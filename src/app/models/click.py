@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.app.database import Base
@@ -8,19 +8,67 @@ from src.app.database import Base
 
 class Click(Base):
     __tablename__ = "clicks"
+    # Every analytics read filters on one link and most order or bound it by
+    # time, so (link_id, clicked_at) serves them without a sort; it also
+    # covers the plain link_id lookups. Geo enrichment looks clicks up by IP,
+    # but only those still missing geo data, so that index holds just those
+    # rows. Archived clicks keep their ids in the monthly partitions, so
+    # SQLite must never hand out an id twice
+    __table_args__ = (
+        Index("ix_clicks_link_id_clicked_at", "link_id", "clicked_at"),
+        Index(
+            "ix_clicks_ip_address_missing_geo",
+            "ip_address",
+            sqlite_where=text("country_id IS NULL AND city IS NULL"),
+            postgresql_where=text("country_id IS NULL AND city IS NULL"),
+        ),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    link_id: Mapped[int] = mapped_column(Integer, ForeignKey("links.id"), nullable=False, index=True)
+    link_id: Mapped[int] = mapped_column(Integer, ForeignKey("links.id"), nullable=False)
     ip_address: Mapped[str | None] = mapped_column(String(45), nullable=True)
-    country: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    country_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("countries.id"), nullable=True
+    )
     city: Mapped[str | None] = mapped_column(String(100), nullable=True)
-    referrer: Mapped[str | None] = mapped_column(String(500), nullable=True)
-    browser: Mapped[str | None] = mapped_column(String(100), nullable=True)
-    os: Mapped[str | None] = mapped_column(String(100), nullable=True)
-    device: Mapped[str | None] = mapped_column(String(50), nullable=True)  # mobile, tablet, pc, bot
-    user_agent: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    referrer_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("referrers.id"), nullable=True
+    )
+    user_agent_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("user_agents.id"), nullable=True
+    )
     clicked_at: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
 
     link: Mapped["Link"] = relationship("Link", back_populates="clicks")  # noqa: F821
+    # Dimension rows are tiny and always wanted alongside a click, so they're
+    # joined in whenever Click entities are loaded
+    country_dim: Mapped["Country | None"] = relationship("Country", lazy="joined")  # noqa: F821
+    referrer_dim: Mapped["Referrer | None"] = relationship("Referrer", lazy="joined")  # noqa: F821
+    agent: Mapped["UserAgent | None"] = relationship("UserAgent", lazy="joined")  # noqa: F821
+
+    @property
+    def country(self) -> str | None:
+        return self.country_dim.name if self.country_dim else None
+
+    @property
+    def referrer(self) -> str | None:
+        return self.referrer_dim.url if self.referrer_dim else None
+
+    @property
+    def user_agent(self) -> str | None:
+        return self.agent.user_agent if self.agent else None
+
+    @property
+    def browser(self) -> str | None:
+        return self.agent.browser if self.agent else None
+
+    @property
+    def os(self) -> str | None:
+        return self.agent.os if self.agent else None
+
+    @property
+    def device(self) -> str | None:
+        return self.agent.device if self.agent else None
@@ -0,0 +1,46 @@
+"""Small lookup tables for click dimensions (star schema).
+
+Clicks and user agents refer to these by integer surrogate key, so analytics
+group and join on integers instead of repeated free-text columns. Short values
+are unique on ``name``; long ones (referrer URLs) are keyed by a hash.
+"""
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.app.database import Base
+
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+
+class Referrer(Base):
+    __tablename__ = "referrers"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    url_hash: Mapped[str] = mapped_column(String(32), unique=True, nullable=False)
+    url: Mapped[str] = mapped_column(String(500), nullable=False)
+
+
+class Browser(Base):
+    __tablename__ = "browsers"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+
+class OperatingSystem(Base):
+    __tablename__ = "operating_systems"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+
+class Device(Base):
+    __tablename__ = "devices"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)  # Desktop, Mobile, ...
@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.app.database import Base
@@ -8,6 +8,8 @@ from src.app.database import Base
 
 class Link(Base):
     __tablename__ = "links"
+    # The dashboard lists a user's links newest first
+    __table_args__ = (Index("ix_links_user_id_created_at", "user_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     slug: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)
@@ -22,3 +24,9 @@ class Link(Base):
 
     owner: Mapped["User"] = relationship("User", back_populates="links")  # noqa: F821
     clicks: Mapped[list["Click"]] = relationship("Click", back_populates="link", lazy="select", cascade="all, delete-orphan")  # noqa: F821
+    daily_counts: Mapped[list["DailyClickCount"]] = relationship(  # noqa: F821
+        "DailyClickCount", lazy="select", cascade="all, delete-orphan"
+    )
+    dimension_counts: Mapped[list["DailyDimensionCount"]] = relationship(  # noqa: F821
+        "DailyDimensionCount", lazy="select", cascade="all, delete-orphan"
+    )
@@ -0,0 +1,56 @@
+"""Per-link daily click rollups, maintained as clicks are written.
+
+Analytics read these instead of scanning raw clicks, so a link's page costs
+O(days x distinct values) rather than O(clicks). ``services/rollups.py``
+keeps them in step with ``clicks`` and can rebuild them from scratch.
+"""
+import datetime
+
+from sqlalchemy import Boolean, Date, ForeignKey, Integer, String, false
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.app.database import Base
+
+
+class DailyClickCount(Base):
+    __tablename__ = "daily_click_counts"
+
+    link_id: Mapped[int] = mapped_column(Integer, ForeignKey("links.id"), primary_key=True)
+    day: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Set once compaction has made the counts complete for the day; from then
+    # on its raw clicks may be deleted and the day is never recounted
+    compacted: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=False, server_default=false()
+    )
+
+
+class DailyDimensionCount(Base):
+    """Clicks per link, dimension key and day.
+
+    ``dimension`` names the click column the key came from ("country",
+    "referrer" or "user_agent"); browser, OS and device counts are derived
+    through the user-agent rows. Clicks with no value aren't counted here.
+    """
+
+    __tablename__ = "daily_dimension_counts"
+
+    link_id: Mapped[int] = mapped_column(Integer, ForeignKey("links.id"), primary_key=True)
+    dimension: Mapped[str] = mapped_column(String(20), primary_key=True)
+    value_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class RawClickHorizon(Base):
+    """First day whose raw clicks are all still stored, as a single row.
+
+    Compaction and partition expiry move it forward before they delete any
+    clicks, and never back; analytics read the days before it from the
+    rollups, and rollup rebuilds leave those days alone.
+    """
+
+    __tablename__ = "raw_click_horizon"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[datetime.date] = mapped_column(Date, nullable=False)
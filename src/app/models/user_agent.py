@@ -0,0 +1,35 @@
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from src.app.database import Base
+
+
+class UserAgent(Base):
+    """One row per distinct (truncated) user-agent string, parsed once."""
+
+    __tablename__ = "user_agents"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    ua_hash: Mapped[str] = mapped_column(String(32), unique=True, nullable=False, index=True)
+    user_agent: Mapped[str] = mapped_column(String(500), nullable=False)
+    browser_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("browsers.id"), nullable=True)
+    os_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("operating_systems.id"), nullable=True
+    )
+    device_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("devices.id"), nullable=True)
+
+    browser_dim: Mapped["Browser | None"] = relationship("Browser", lazy="joined")  # noqa: F821
+    os_dim: Mapped["OperatingSystem | None"] = relationship("OperatingSystem", lazy="joined")  # noqa: F821
+    device_dim: Mapped["Device | None"] = relationship("Device", lazy="joined")  # noqa: F821
+
+    @property
+    def browser(self) -> str | None:
+        return self.browser_dim.name if self.browser_dim else None
+
+    @property
+    def os(self) -> str | None:
+        return self.os_dim.name if self.os_dim else None
+
+    @property
+    def device(self) -> str | None:
+        return self.device_dim.name if self.device_dim else None
@@ -0,0 +1,101 @@
+import logging
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for a while, then probes it again.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected with ``CircuitOpenError`` without touching the
+    dependency. Once ``reset_timeout`` seconds have passed a single probe call
+    is let through (half-open): success closes the circuit, failure opens it
+    for another ``reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.transitions: Counter[str] = Counter()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self._allow():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = await fn()
+        except Exception:
+            self._on_failure()
+            raise
+        except BaseException:
+            # Cancelled: says nothing about the dependency, just free the probe slot
+            self._probing = False
+            raise
+        self._on_success()
+        return result
+
+    def _allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._transition(HALF_OPEN)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def _on_success(self) -> None:
+        self._probing = False
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def _on_failure(self) -> None:
+        self._probing = False
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            if self.state != OPEN:
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        self.transitions[f"{self.state}->{state}"] += 1
+        logger.warning("%s circuit %s -> %s", self.name, self.state, state)
+        self.state = state
+
+    def reset(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._probing = False
+        self.rejected = 0
+        self.transitions.clear()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+        }
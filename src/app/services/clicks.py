@@ -1,59 +1,53 @@
+import asyncio
 import datetime
+import functools
 import logging
+from collections import Counter
+from typing import NamedTuple
 
-import httpx
-from sqlalchemy import func, select, update
+from sqlalchemy import Date, cast, func, insert, literal, null, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
 from user_agents import parse as parse_ua
 
+from src.app.config import settings
+from src.app.database import utc_date
 from src.app.models.click import Click
+from src.app.models.dimensions import Browser, Country, Device, OperatingSystem, Referrer
 from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount, DailyDimensionCount
+from src.app.models.user_agent import UserAgent
+from src.app.services import partitions, rollups
+from src.app.services.dimensions import (
+    browsers,
+    countries,
+    devices,
+    operating_systems,
+    referrers,
+    user_agents,
+)
+from src.app.services.enrichment import geo_enricher
+from src.app.services.geoip import cached_geoip, empty_geo, lookup_geoip
+from src.app.services.links import ResolvedLink
+from src.app.services.versioned_cache import VersionedCache
 
 logger = logging.getLogger(__name__)
 
-# Simple in-memory cache for GeoIP results to avoid excessive API calls
-_geoip_cache: dict[str, dict] = {}
-_GEOIP_CACHE_MAX = 5000
+# Longest user-agent stored on a click; parsing is keyed on the same prefix
+_UA_MAX_LENGTH = 500
 
+# Most keys bound into one IN list when looking up dimension rows
+_KEY_BATCH = 10000
 
-async def lookup_geoip(ip_address: str) -> dict:
-    """Look up country/city from IP address using ip-api.com (free tier)."""
-    if not ip_address or ip_address in ("127.0.0.1", "::1", "testclient"):
-        return {"country": None, "city": None}
+# Analytics page results per link, versioned by the link's click count
+click_stats_cache = VersionedCache(
+    maxsize=settings.analytics_cache_size,
+    max_age=settings.analytics_cache_max_age_seconds,
+    stale_while_revalidate=settings.analytics_cache_stale_while_revalidate,
+)
 
-    if ip_address in _geoip_cache:
-        return _geoip_cache[ip_address]
-
-    try:
-        async with httpx.AsyncClient(timeout=3.0) as client:
-            resp = await client.get(
-                f"http://ip-api.com/json/{ip_address}",
-                params={"fields": "status,country,city"},
-            )
-            data = resp.json()
-            if data.get("status") == "success":
-                result = {
-                    "country": data.get("country"),
-                    "city": data.get("city"),
-                }
-            else:
-                result = {"country": None, "city": None}
-    except Exception:
-        logger.warning("GeoIP lookup failed for %s", ip_address)
-        return {"country": None, "city": None}
-
-    # Only cache successful lookups (don't cache transient failures)
-    if len(_geoip_cache) < _GEOIP_CACHE_MAX:
-        _geoip_cache[ip_address] = result
-
-    return result
-
-
-def parse_user_agent(ua_string: str | None) -> dict:
-    """Parse user-agent string to extract browser, OS, device type."""
-    if not ua_string:
-        return {"browser": None, "os": None, "device": None}
 
+def _parse_user_agent(ua_string: str) -> tuple[str, str, str]:
     ua = parse_ua(ua_string)
 
     browser = ua.browser.family
@@ -75,51 +69,193 @@ def parse_user_agent(ua_string: str | None) -> dict:
     else:
         device = "Other"
 
+    return browser, os_name, device
+
+
+# Real traffic is dominated by a few hundred distinct UA strings, so the regex
+# parser's results are memoized (as immutable tuples) on the truncated string
+_parse_user_agent_cached = functools.lru_cache(maxsize=settings.ua_cache_size)(_parse_user_agent)
+
+
+def parse_user_agent(ua_string: str | None) -> dict:
+    """Parse user-agent string to extract browser, OS, device type."""
+    if not ua_string:
+        return {"browser": None, "os": None, "device": None}
+    browser, os_name, device = _parse_user_agent_cached(ua_string[:_UA_MAX_LENGTH])
     return {"browser": browser, "os": os_name, "device": device}
 
 
+def ua_cache_stats() -> dict:
+    info = _parse_user_agent_cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+async def _user_agent_columns(db: AsyncSession, new_user_agents: list[str]) -> dict[str, dict]:
+    """Browser/OS/device keys for user agents about to get a user_agents row."""
+    parsed = {user_agent: parse_user_agent(user_agent) for user_agent in new_user_agents}
+    browser_ids = await browsers.ids(db, {p["browser"] for p in parsed.values() if p["browser"]})
+    os_ids = await operating_systems.ids(db, {p["os"] for p in parsed.values() if p["os"]})
+    device_ids = await devices.ids(db, {p["device"] for p in parsed.values() if p["device"]})
+    return {
+        user_agent: {
+            "browser_id": browser_ids.get(p["browser"]),
+            "os_id": os_ids.get(p["os"]),
+            "device_id": device_ids.get(p["device"]),
+        }
+        for user_agent, p in parsed.items()
+    }
+
+
+async def user_agent_ids(db: AsyncSession, values) -> dict[str, int]:
+    """Map (truncated) user-agent strings to user_agents ids, parsing new ones once."""
+    return await user_agents.ids(db, values, _user_agent_columns)
+
+
+async def _click_geo(ip_address: str) -> dict | None:
+    """Geo data for a click about to be written, or None to leave it for enrichment.
+
+    With deferred enrichment running only already-cached results are used, so
+    a GeoIP miss never holds up the write.
+    """
+    if geo_enricher.running:
+        return cached_geoip(ip_address)
+    return await lookup_geoip(ip_address)
+
+
+class ClickEvent(NamedTuple):
+    """A click captured at redirect time, before enrichment and persistence."""
+
+    link_id: int
+    ip_address: str | None
+    referrer: str | None
+    user_agent: str | None
+    clicked_at: datetime.datetime | None = None
+
+
 async def record_click(
     db: AsyncSession,
-    link: Link,
+    link: Link | ResolvedLink,
     ip_address: str | None,
     referrer: str | None,
     user_agent: str | None,
 ) -> Click:
     """Record a click event and increment the link's click counter."""
-    # Parse user-agent
-    ua_info = parse_user_agent(user_agent)
+    return await record_click_event(db, ClickEvent(link.id, ip_address, referrer, user_agent))
+
 
-    # GeoIP lookup
-    geo_info = await lookup_geoip(ip_address or "")
+async def record_click_event(db: AsyncSession, event: ClickEvent) -> Click:
+    """Persist a single click event and increment the link's click counter."""
+    referrer = event.referrer
+    user_agent = event.user_agent
+
+    # GeoIP lookup (None when deferred to the enrichment worker)
+    geo = await _click_geo(event.ip_address or "")
+    geo_info = geo or empty_geo()
 
     # Truncate referrer and user_agent to fit DB column sizes
     if referrer and len(referrer) > 500:
         referrer = referrer[:500]
-    if user_agent and len(user_agent) > 500:
-        user_agent = user_agent[:500]
+    if user_agent and len(user_agent) > _UA_MAX_LENGTH:
+        user_agent = user_agent[:_UA_MAX_LENGTH]
+
+    # Dimension values are stored once and referenced by integer key
+    user_agent_id = None
+    if user_agent:
+        user_agent_id = (await user_agent_ids(db, [user_agent]))[user_agent]
 
     click = Click(
-        link_id=link.id,
-        ip_address=ip_address,
-        country=geo_info["country"],
+        link_id=event.link_id,
+        ip_address=event.ip_address,
+        country_id=await countries.id(db, geo_info["country"]),
         city=geo_info["city"],
-        referrer=referrer,
-        browser=ua_info["browser"],
-        os=ua_info["os"],
-        device=ua_info["device"],
-        user_agent=user_agent,
+        referrer_id=await referrers.id(db, referrer),
+        user_agent_id=user_agent_id,
+        clicked_at=event.clicked_at or datetime.datetime.now(datetime.timezone.utc),
     )
     db.add(click)
+    await rollups.add_clicks(db, [{
+        "link_id": click.link_id,
+        "clicked_at": click.clicked_at,
+        "country_id": click.country_id,
+        "referrer_id": click.referrer_id,
+        "user_agent_id": click.user_agent_id,
+    }])
 
     # Atomic increment of click count to avoid race conditions
     await db.execute(
-        update(Link).where(Link.id == link.id).values(click_count=Link.click_count + 1)
+        update(Link).where(Link.id == event.link_id).values(click_count=Link.click_count + 1)
     )
 
     await db.commit()
+    if geo is None:
+        geo_enricher.submit(event.ip_address)
+    await db.refresh(click, ["country_dim", "referrer_dim", "agent"])
     return click
 
 
+async def record_clicks_batch(db: AsyncSession, events: list[ClickEvent]) -> int:
+    """Persist many click events in a single transaction.
+
+    Clicks are written with one multi-row INSERT and counter increments are
+    coalesced into a single UPDATE per link, so a batch costs one commit
+    instead of one per click.
+    """
+    if not events:
+        return 0
+
+    # Looked up concurrently, so a batching provider resolves them in one request
+    ips = list({event.ip_address or "" for event in events})
+    geo_by_ip = dict(zip(ips, await asyncio.gather(*(_click_geo(ip) for ip in ips))))
+
+    # Resolve every dimension key for the batch up front (mostly from memory)
+    country_ids = await countries.ids(
+        db, {geo["country"] for geo in geo_by_ip.values() if geo and geo["country"]}
+    )
+    referrer_ids = await referrers.ids(
+        db, {event.referrer[:500] for event in events if event.referrer}
+    )
+    ua_ids = await user_agent_ids(
+        db, {event.user_agent[:_UA_MAX_LENGTH] for event in events if event.user_agent}
+    )
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = []
+    for event in events:
+        geo_info = geo_by_ip[event.ip_address or ""] or empty_geo()
+        rows.append({
+            "link_id": event.link_id,
+            "ip_address": event.ip_address,
+            "country_id": country_ids.get(geo_info["country"]),
+            "city": geo_info["city"],
+            "referrer_id": referrer_ids[event.referrer[:500]] if event.referrer else None,
+            "user_agent_id": (
+                ua_ids[event.user_agent[:_UA_MAX_LENGTH]] if event.user_agent else None
+            ),
+            "clicked_at": event.clicked_at or now,
+        })
+    # render_nulls keeps every row on the same column set so they share one INSERT
+    await db.execute(insert(Click).execution_options(render_nulls=True), rows)
+    await rollups.add_clicks(db, rows)
+
+    for link_id, count in Counter(event.link_id for event in events).items():
+        await db.execute(
+            update(Link).where(Link.id == link_id).values(click_count=Link.click_count + count)
+        )
+
+    await db.commit()
+    for ip_address, geo in geo_by_ip.items():
+        if geo is None:
+            geo_enricher.submit(ip_address)
+    return len(rows)
+
+
 async def get_link_with_owner(db: AsyncSession, link_id: int, user_id: int) -> Link | None:
     """Get a link by ID ensuring it belongs to the given user."""
     result = await db.execute(
@@ -128,102 +264,381 @@ async def get_link_with_owner(db: AsyncSession, link_id: int, user_id: int) -> L
     return result.scalar_one_or_none()
 
 
-async def get_click_stats(db: AsyncSession, link_id: int) -> dict:
-    """Compute analytics aggregates for a given link."""
-    # Total clicks
-    total_result = await db.execute(
-        select(func.count(Click.id)).where(Click.link_id == link_id)
-    )
-    total_clicks = total_result.scalar() or 0
-
-    # Clicks by country
-    country_result = await db.execute(
-        select(Click.country, func.count(Click.id).label("count"))
-        .where(Click.link_id == link_id, Click.country.isnot(None))
-        .group_by(Click.country)
-        .order_by(func.count(Click.id).desc())
-        .limit(10)
-    )
-    top_countries = [{"name": row[0], "count": row[1]} for row in country_result.all()]
-
-    # Clicks by browser
-    browser_result = await db.execute(
-        select(Click.browser, func.count(Click.id).label("count"))
-        .where(Click.link_id == link_id, Click.browser.isnot(None))
-        .group_by(Click.browser)
-        .order_by(func.count(Click.id).desc())
-        .limit(10)
-    )
-    top_browsers = [{"name": row[0], "count": row[1]} for row in browser_result.all()]
-
-    # Clicks by OS
-    os_result = await db.execute(
-        select(Click.os, func.count(Click.id).label("count"))
-        .where(Click.link_id == link_id, Click.os.isnot(None))
-        .group_by(Click.os)
-        .order_by(func.count(Click.id).desc())
-        .limit(10)
-    )
-    top_os = [{"name": row[0], "count": row[1]} for row in os_result.all()]
-
-    # Clicks by device
-    device_result = await db.execute(
-        select(Click.device, func.count(Click.id).label("count"))
-        .where(Click.link_id == link_id, Click.device.isnot(None))
-        .group_by(Click.device)
-        .order_by(func.count(Click.id).desc())
-    )
-    devices = [{"name": row[0], "count": row[1]} for row in device_result.all()]
-
-    # Clicks by referrer
-    referrer_result = await db.execute(
-        select(Click.referrer, func.count(Click.id).label("count"))
-        .where(Click.link_id == link_id, Click.referrer.isnot(None), Click.referrer != "")
-        .group_by(Click.referrer)
-        .order_by(func.count(Click.id).desc())
-        .limit(10)
+async def _raw_window(db: AsyncSession) -> tuple[datetime.date | None, datetime.datetime | None]:
+    """The raw horizon as a rollup day and as the first ``clicked_at`` read raw.
+
+    Both are ``None`` while every click is still stored raw. Before the
+    horizon, clicks were compacted or expired and only the rollups count them.
+    """
+    horizon = await partitions.raw_horizon(db)
+    return horizon, rollups.day_start(horizon) if horizon is not None else None
+
+
+def _link_criteria(clicks, link_id: int, start: datetime.datetime | None) -> list:
+    criteria = [clicks.c.link_id == link_id]
+    if start is not None:
+        criteria.append(clicks.c.clicked_at >= start)
+    return criteria
+
+
+def _click_counts(clicks, link_id: int, key: str, start: datetime.datetime | None = None):
+    """(key, count) over a link's clicks in one click table, for its ``key`` column."""
+    click_key = clicks.c[key]
+    return (
+        select(click_key.label("key"), func.count().label("count"))
+        .where(*_link_criteria(clicks, link_id, start), click_key.isnot(None))
+        .group_by(click_key)
     )
-    top_referrers = [{"name": row[0], "count": row[1]} for row in referrer_result.all()]
 
-    # Clicks over time (last 30 days, grouped by day)
-    thirty_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
-    daily_result = await db.execute(
-        select(
-            func.date(Click.clicked_at).label("day"),
-            func.count(Click.id).label("count"),
+
+async def _top_values(
+    db: AsyncSession,
+    link_id: int,
+    dimension,
+    key_column,
+    limit: int | None = None,
+    from_rollups: bool = False,
+) -> list[dict]:
+    """Click counts per value of a dimension for a link, most clicked first.
+
+    ``key_column`` is the foreign key into ``dimension``, on ``Click`` or on
+    ``UserAgent`` (browser, OS and device keys hang off the user-agent row).
+    Clicks are counted per integer key first — from the raw clicks or the
+    daily rollups — and only the per-key counts are joined to the lookup
+    tables for names. Raw counts add the rollups for days before the raw
+    horizon.
+    """
+    via_user_agent = key_column.class_ is UserAgent
+    click_key = Click.user_agent_id if via_user_agent else key_column
+    rollup_dimension = click_key.key.removesuffix("_id")
+    if from_rollups:
+        counts = rollups.dimension_counts(link_id, rollup_dimension).subquery()
+    else:
+        horizon, start = await _raw_window(db)
+        compacted = []
+        if horizon is not None:
+            compacted.append(rollups.dimension_counts(link_id, rollup_dimension, until=horizon))
+        counts = (await partitions.per_partition(
+            db,
+            lambda clicks: _click_counts(clicks, link_id, click_key.key, start),
+            start,
+            extra=compacted,
+        )).subquery()
+    name = dimension.url if dimension is Referrer else dimension.name
+    total = func.sum(counts.c.count)
+    query = select(name, total)
+    if via_user_agent:
+        query = query.select_from(counts).join(UserAgent, UserAgent.id == counts.c.key)
+        query = query.join(dimension, key_column == dimension.id)
+    else:
+        query = query.select_from(counts).join(dimension, dimension.id == counts.c.key)
+    query = query.group_by(dimension.id).order_by(total.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return [{"name": row[0], "count": row[1]} for row in result.all()]
+
+
+async def _total_clicks(db: AsyncSession, link_id: int, from_rollups: bool) -> int:
+    if from_rollups:
+        return await rollups.total_clicks(db, link_id)
+    horizon, start = await _raw_window(db)
+    compacted = []
+    if horizon is not None:
+        compacted.append(rollups.total_clicks_query(link_id, until=horizon))
+    result = await db.execute(await partitions.per_partition(
+        db,
+        lambda clicks: select(func.count(clicks.c.id)).where(
+            *_link_criteria(clicks, link_id, start)
+        ),
+        start,
+        extra=compacted,
+    ))
+    return sum(result.scalars())
+
+
+async def _daily_clicks(
+    db: AsyncSession, link_id: int, since: datetime.datetime, from_rollups: bool
+) -> list[dict]:
+    """Clicks per day since ``since``; rollups hold whole days."""
+    if from_rollups:
+        return await rollups.daily_clicks(db, link_id, since.date())
+
+    counts = Counter()
+    horizon, start = await _raw_window(db)
+    if horizon is not None and horizon > since.date():
+        for row in await rollups.daily_clicks(db, link_id, since.date(), until=horizon):
+            counts[row["date"]] += row["count"]
+        since = start
+
+    def per_day(clicks):
+        day = utc_date(clicks.c.clicked_at)
+        return (
+            select(day.label("day"), func.count(clicks.c.id).label("count"))
+            .where(clicks.c.link_id == link_id, clicks.c.clicked_at >= since)
+            .group_by(day)
         )
-        .where(Click.link_id == link_id, Click.clicked_at >= thirty_days_ago)
-        .group_by(func.date(Click.clicked_at))
-        .order_by(func.date(Click.clicked_at))
-    )
-    daily_clicks = [{"date": str(row[0]), "count": row[1]} for row in daily_result.all()]
 
-    # Recent clicks (last 20)
-    recent_result = await db.execute(
-        select(Click)
-        .where(Click.link_id == link_id)
-        .order_by(Click.clicked_at.desc())
-        .limit(20)
+    result = await db.execute(await partitions.per_partition(db, per_day, since))
+    for day, count in result.all():
+        counts[str(day)] += count
+    return [{"date": day, "count": count} for day, count in sorted(counts.items())]
+
+
+def _aggregate_queries(link_id: int, since: datetime.datetime, from_rollups: bool) -> dict:
+    """One independent query per aggregate, over raw clicks or the rollups.
+
+    Each value takes the session to run on, so the queries can share one
+    session or each get their own.
+    """
+    # Breakdowns group on integer dimension keys and join the small lookup
+    # tables only for the names
+    def top(dimension, key_column, limit=None):
+        return functools.partial(
+            _top_values,
+            link_id=link_id,
+            dimension=dimension,
+            key_column=key_column,
+            limit=limit,
+            from_rollups=from_rollups,
+        )
+
+    return {
+        "total_clicks": functools.partial(
+            _total_clicks, link_id=link_id, from_rollups=from_rollups
+        ),
+        "top_countries": top(Country, Click.country_id, limit=10),
+        "top_browsers": top(Browser, UserAgent.browser_id, limit=10),
+        "top_os": top(OperatingSystem, UserAgent.os_id, limit=10),
+        "devices": top(Device, UserAgent.device_id),
+        "top_referrers": top(Referrer, Click.referrer_id, limit=10),
+        "daily_clicks": functools.partial(
+            _daily_clicks, link_id=link_id, since=since, from_rollups=from_rollups
+        ),
+    }
+
+
+def _ranked(counts: Counter, limit: int | None = None) -> list[dict]:
+    return [{"name": name, "count": count} for name, count in counts.most_common(limit)]
+
+
+async def _named(db: AsyncSession, name_column, counts: Counter, limit: int) -> list[dict]:
+    """Top keys of ``counts`` with their names looked up from the dimension table."""
+    top = counts.most_common(limit)
+    if not top:
+        return []
+    model = name_column.class_
+    result = await db.execute(
+        select(model.id, name_column).where(model.id.in_([key for key, _ in top]))
     )
-    recent_clicks = recent_result.scalars().all()
+    names = dict(result.all())
+    return [{"name": names[key], "count": count} for key, count in top]
+
+
+# The day column of single-pass rows that aren't per day, typed so that
+# PostgreSQL can match it with the days in the UNION
+_NO_DAY = cast(null(), Date)
+
+
+def _compacted_branches(link_id: int, since: datetime.date, horizon: datetime.date) -> list:
+    """Single-pass branches counting the days before ``horizon`` from the rollups."""
+    def counts_by(kind: str):
+        return (
+            select(
+                literal(kind),
+                DailyDimensionCount.value_id,
+                _NO_DAY,
+                func.sum(DailyDimensionCount.count),
+            )
+            .where(
+                DailyDimensionCount.link_id == link_id,
+                DailyDimensionCount.dimension == kind,
+                DailyDimensionCount.day < horizon,
+            )
+            .group_by(DailyDimensionCount.value_id)
+        )
+
+    return [
+        *(counts_by(kind) for kind in rollups.ROLLUP_DIMENSIONS),
+        select(literal("day"), null(), DailyClickCount.day, DailyClickCount.count).where(
+            DailyClickCount.link_id == link_id,
+            DailyClickCount.day >= since,
+            DailyClickCount.day < horizon,
+        ),
+        select(
+            literal("total"), null(), _NO_DAY, func.coalesce(func.sum(DailyClickCount.count), 0)
+        ).where(DailyClickCount.link_id == link_id, DailyClickCount.day < horizon),
+    ]
+
+
+async def _single_pass_aggregates(
+    db: AsyncSession, link_id: int, since: datetime.datetime
+) -> dict:
+    """Analytics aggregates from one statement over a link's clicks.
+
+    A single ``UNION ALL`` query counts the clicks per country, referrer and
+    user-agent key, per day inside the window, and in total. Browser, OS and
+    device are derived from the user-agent counts instead of scanning the
+    clicks again, and names are looked up only for the keys that made the cut.
+    Days before the raw horizon come from the rollups, in the same statement.
+    """
+    horizon, start = await _raw_window(db)
+
+    # Rows are (kind, dimension key, day, count): PostgreSQL won't mix days
+    # with the integer keys in one column
+    def branches(clicks):
+        def counts_by(kind: str, key, *criteria):
+            return (
+                select(literal(kind), key, _NO_DAY, func.count())
+                .where(*_link_criteria(clicks, link_id, start), *criteria)
+                .group_by(key)
+            )
+
+        day = utc_date(clicks.c.clicked_at)
+        return [
+            counts_by("country", clicks.c.country_id, clicks.c.country_id.is_not(None)),
+            counts_by("referrer", clicks.c.referrer_id, clicks.c.referrer_id.is_not(None)),
+            counts_by("user_agent", clicks.c.user_agent_id, clicks.c.user_agent_id.is_not(None)),
+            select(literal("day"), null(), day, func.count())
+            .where(*_link_criteria(clicks, link_id, start), clicks.c.clicked_at >= since)
+            .group_by(day),
+            select(literal("total"), null(), _NO_DAY, func.count()).where(
+                *_link_criteria(clicks, link_id, start)
+            ),
+        ]
+
+    # Archived months add their own branches; partial counts are summed below
+    tables = await partitions.click_tables(db, start)
+    selects = [branch for table in tables for branch in branches(table)]
+    if horizon is not None:
+        selects += _compacted_branches(link_id, since.date(), horizon)
+    result = await db.execute(union_all(*selects))
+    counts: dict[str, Counter] = {
+        kind: Counter() for kind in ("country", "referrer", "user_agent", "day", "total")
+    }
+    for kind, key, day, count in result.all():
+        counts[kind][day if kind == "day" else key] += count
+
+    # Browser, OS and device keys hang off the user-agent rows
+    ua_counts = counts["user_agent"]
+    browser_counts, os_counts, device_counts = Counter(), Counter(), Counter()
+    ua_ids = list(ua_counts)
+    for start in range(0, len(ua_ids), _KEY_BATCH):
+        agents = await db.execute(
+            select(UserAgent).where(UserAgent.id.in_(ua_ids[start:start + _KEY_BATCH]))
+        )
+        for agent in agents.scalars():
+            count = ua_counts[agent.id]
+            if agent.browser:
+                browser_counts[agent.browser] += count
+            if agent.os:
+                os_counts[agent.os] += count
+            if agent.device:
+                device_counts[agent.device] += count
 
     return {
-        "total_clicks": total_clicks,
-        "top_countries": top_countries,
-        "top_browsers": top_browsers,
-        "top_os": top_os,
-        "devices": devices,
-        "top_referrers": top_referrers,
-        "daily_clicks": daily_clicks,
-        "recent_clicks": recent_clicks,
+        "total_clicks": counts["total"][None],
+        "top_countries": await _named(db, Country.name, counts["country"], 10),
+        "top_browsers": _ranked(browser_counts, 10),
+        "top_os": _ranked(os_counts, 10),
+        "devices": _ranked(device_counts),
+        "top_referrers": await _named(db, Referrer.url, counts["referrer"], 10),
+        "daily_clicks": [
+            {"date": str(day), "count": count} for day, count in sorted(counts["day"].items())
+        ],
     }
 
 
+async def _link_clicks(db: AsyncSession, link_id: int, limit: int | None = None) -> list[Click]:
+    """A link's clicks, newest first, reading partitions only until ``limit`` is reached."""
+    found: list[Click] = []
+    # Partitions before the raw horizon are empty or dropped
+    _, start = await _raw_window(db)
+    for table in await partitions.click_tables(db, start):
+        if table is Click.__table__:
+            clicks, options = Click, []
+        else:
+            # Joined eager loads can't follow the alias onto a partition table,
+            # so an archived click's dimensions are loaded by key instead
+            clicks = aliased(Click, table, adapt_on_names=True)
+            options = [
+                selectinload(clicks.country_dim),
+                selectinload(clicks.referrer_dim),
+                selectinload(clicks.agent),
+            ]
+        query = (
+            select(clicks)
+            .options(*options)
+            .where(clicks.link_id == link_id)
+            .order_by(clicks.clicked_at.desc())
+        )
+        if limit is not None:
+            query = query.limit(limit - len(found))
+        result = await db.execute(query)
+        found.extend(result.scalars().all())
+        if limit is not None and len(found) >= limit:
+            break
+    return found
+
+
+async def _recent_clicks(db: AsyncSession, link_id: int) -> list[Click]:
+    return await _link_clicks(db, link_id, limit=20)
+
+
+async def _on_own_session(db: AsyncSession, query):
+    """Run ``query`` on a separate session (and pooled connection) of ``db``'s engine."""
+    async with AsyncSession(db.bind, expire_on_commit=False) as session:
+        return await query(session)
+
+
+async def get_click_stats(db: AsyncSession, link_id: int) -> dict:
+    """Compute analytics aggregates for a given link.
+
+    With ``ANALYTICS_CONCURRENT`` the aggregate queries run at once on their
+    own connections, alongside the recent-clicks query on ``db``.
+    """
+    # Clicks over time cover the last 30 days
+    thirty_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+    if settings.analytics_strategy == "single_pass":
+        queries = {
+            "single_pass": functools.partial(
+                _single_pass_aggregates, link_id=link_id, since=thirty_days_ago
+            ),
+        }
+    else:
+        queries = _aggregate_queries(
+            link_id, thirty_days_ago, from_rollups=settings.analytics_strategy == "rollup"
+        )
+
+    if settings.analytics_concurrent:
+        recent_clicks, *results = await asyncio.gather(
+            _recent_clicks(db, link_id),
+            *(_on_own_session(db, query) for query in queries.values()),
+        )
+    else:
+        results = [await query(db) for query in queries.values()]
+        recent_clicks = await _recent_clicks(db, link_id)
+
+    stats = dict(zip(queries, results))
+    if "single_pass" in stats:
+        stats = stats["single_pass"]
+    # Recent clicks (last 20)
+    stats["recent_clicks"] = recent_clicks
+    return stats
+
+
+async def get_cached_click_stats(db: AsyncSession, link: Link) -> dict:
+    """``get_click_stats`` through the per-link cache, keyed on ``link.click_count``.
+
+    Stats are computed on a session of their own, since a stale-while-revalidate
+    refresh can outlive the request.
+    """
+    compute = functools.partial(
+        _on_own_session, db, functools.partial(get_click_stats, link_id=link.id)
+    )
+    return await click_stats_cache.get(link.id, link.click_count, compute)
+
+
 async def get_all_clicks_for_export(db: AsyncSession, link_id: int) -> list[Click]:
     """Get all clicks for CSV export."""
-    result = await db.execute(
-        select(Click)
-        .where(Click.link_id == link_id)
-        .order_by(Click.clicked_at.desc())
-    )
-    return list(result.scalars().all())
+    return await _link_clicks(db, link_id)
@@ -0,0 +1,155 @@
+"""Compaction of old raw clicks into the daily rollups.
+
+Past ``CLICK_COMPACTION_AGE_DAYS`` a click only matters for the counts the
+rollups already hold. ``compact_clicks`` works in two passes, each a series
+of short transactions. First it makes sure every old (link, day) is fully
+counted in the rollups and marks it ``compacted``. Then it deletes the raw
+clicks of compacted days in chunks of at most ``batch_size`` rows, so the
+writer lock is never held long however many clicks one link got in a day.
+A compacted day is never recounted, so an interrupted run can simply be
+started again. Before deleting anything it moves the raw horizon up to the
+cutoff, so analytics read the days before it from the rollups.
+"""
+import datetime
+import logging
+
+from sqlalchemy import and_, delete, exists, func, select, tuple_, update
+
+from src.app.database import utc_date
+from src.app.models.rollup import DailyClickCount
+from src.app.services import partitions, rollups
+
+logger = logging.getLogger(__name__)
+
+
+async def _pending_days(
+    session_factory, before: datetime.datetime
+) -> list[tuple[int, datetime.date, int]]:
+    """(link_id, day, clicks) for every link-day with raw clicks before ``before``."""
+
+    def per_day(clicks):
+        day = utc_date(clicks.c.clicked_at).label("day")
+        return (
+            select(clicks.c.link_id, day, func.count().label("count"))
+            .where(clicks.c.clicked_at < before)
+            .group_by(clicks.c.link_id, day)
+        )
+
+    async with session_factory() as db:
+        days = (await partitions.per_partition(db, per_day, cached=False)).subquery()
+        result = await db.execute(
+            select(days.c.link_id, days.c.day, func.sum(days.c.count))
+            .group_by(days.c.link_id, days.c.day)
+            .order_by(days.c.link_id, days.c.day)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def _fold_batch(session_factory, days: list[tuple[int, datetime.date, int]]) -> None:
+    """Make one batch of link-days complete in the rollups and mark them compacted."""
+    keys = [(link_id, day) for link_id, day, _ in days]
+    async with session_factory() as db:
+        result = await db.execute(
+            select(
+                DailyClickCount.link_id,
+                DailyClickCount.day,
+                DailyClickCount.count,
+                DailyClickCount.compacted,
+            ).where(tuple_(DailyClickCount.link_id, DailyClickCount.day).in_(keys))
+        )
+        rolled = {(link_id, day): (count, compacted) for link_id, day, count, compacted in result}
+        for link_id, day, raw_count in days:
+            count, compacted = rolled.get((link_id, day), (0, False))
+            # Rollups are kept at ingest time and may also count clicks
+            # compacted or expired before, so they're only recounted when
+            # they are missing some of these, and never once compacted
+            if not compacted and count < raw_count:
+                await rollups.recount(db, link_id, day, day + datetime.timedelta(days=1))
+        await db.execute(
+            update(DailyClickCount)
+            .where(tuple_(DailyClickCount.link_id, DailyClickCount.day).in_(keys))
+            .values(compacted=True)
+        )
+        await db.commit()
+
+
+async def _delete_compacted(session_factory, before: datetime.datetime, batch_size: int) -> int:
+    """Delete raw clicks from before ``before`` on compacted days, ``batch_size`` ids at a time."""
+    removed = 0
+    async with session_factory() as db:
+        tables = await partitions.click_tables(db, cached=False)
+    for table in tables:
+        compacted = exists().where(
+            DailyClickCount.link_id == table.c.link_id,
+            DailyClickCount.day == utc_date(table.c.clicked_at),
+            DailyClickCount.compacted,
+        )
+        deletable = and_(table.c.clicked_at < before, compacted)
+        last_id = 0
+        while True:
+            async with session_factory() as db:
+                ids = (await db.execute(
+                    select(table.c.id)
+                    .where(table.c.id > last_id, deletable)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                )).scalars().all()
+                if not ids:
+                    break
+                await db.execute(
+                    delete(table).where(table.c.id.between(ids[0], ids[-1]), deletable)
+                )
+                await db.commit()
+            removed += len(ids)
+            last_id = ids[-1]
+    return removed
+
+
+async def _drop_emptied_partitions(session_factory, cutoff: datetime.date) -> None:
+    async with session_factory() as db:
+        conn = await db.connection()
+        for month in await partitions.partition_months(db, cached=False):
+            if partitions.add_months(month, 1) > cutoff:
+                continue
+            table = partitions.partition_table(month)
+            if not (await db.execute(select(exists().select_from(table)))).scalar():
+                await conn.run_sync(table.drop)
+        await db.commit()
+    partitions.clear_partition_cache()
+
+
+async def compact_clicks(
+    session_factory, age_days: int, batch_size: int, today: datetime.date | None = None
+) -> int:
+    """Compact raw clicks from before ``today - age_days``. Returns the clicks removed.
+
+    Link-days are folded into the rollups in batches of about ``batch_size``
+    clicks, then the clicks are deleted ``batch_size`` at a time. Monthly
+    partitions left empty are dropped.
+    """
+    if age_days <= 0:
+        return 0
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    cutoff = today - datetime.timedelta(days=age_days)
+    before = rollups.day_start(cutoff)
+
+    batch: list[tuple[int, datetime.date, int]] = []
+    batch_clicks = 0
+    for link_id, day, count in await _pending_days(session_factory, before):
+        batch.append((link_id, day, count))
+        batch_clicks += count
+        if batch_clicks >= batch_size:
+            await _fold_batch(session_factory, batch)
+            batch, batch_clicks = [], 0
+    if batch:
+        await _fold_batch(session_factory, batch)
+
+    async with session_factory() as db:
+        await partitions.advance_raw_horizon(db, cutoff)
+        await db.commit()
+    partitions.clear_partition_cache()
+    removed = await _delete_compacted(session_factory, before, batch_size)
+    await _drop_emptied_partitions(session_factory, cutoff)
+    if removed:
+        logger.info("Compacted %d clicks from before %s", removed, cutoff)
+    return removed
@@ -0,0 +1,152 @@
+import hashlib
+from collections.abc import Awaitable, Callable, Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.app.config import settings
+from src.app.database import upsert
+from src.app.models.dimensions import Browser, Country, Device, OperatingSystem, Referrer
+from src.app.models.user_agent import UserAgent
+from src.app.services.cache import TTLCache
+
+
+def value_hash(value: str) -> str:
+    """Lookup key for long dimension values (referrer URLs, user-agent strings)."""
+    return hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+
+
+class Dimension:
+    """Get-or-create integer surrogate keys for one lookup table.
+
+    Keys are cached in memory — dimension rows are never deleted, so cached
+    ids never go stale — and most clicks resolve all their keys without a
+    query. Values missing from the cache are looked up in one query and any
+    still missing are inserted in one more (concurrent inserts of the same
+    value by another worker are ignored) before being read back.
+
+    Ids read inside a transaction may belong to rows it inserted, so they
+    are only shared with other sessions once it commits; a rollback drops
+    them.
+    """
+
+    def __init__(
+        self,
+        model,
+        value_column: str,
+        hash_column: str | None = None,
+        cache_size: int = 10000,
+    ):
+        self.model = model
+        self.value_column = value_column
+        self.hash_column = hash_column
+        self.key_column = hash_column or value_column
+        self._cache = TTLCache(maxsize=cache_size)
+
+    def _key(self, value: str) -> str:
+        return value_hash(value) if self.hash_column else value
+
+    async def ids(
+        self,
+        db: AsyncSession,
+        values: Iterable[str],
+        extra_columns: Callable[[AsyncSession, list[str]], Awaitable[dict[str, dict]]]
+        | None = None,
+    ) -> dict[str, int]:
+        """Map values to ids, inserting rows for new values.
+
+        ``extra_columns`` supplies any other columns a new row needs, per value.
+        """
+        ids: dict[str, int] = {}
+        missing: dict[str, str] = {}
+        staged = _staged(db).get(self, {})
+        for value in set(values):
+            key = self._key(value)
+            cached = staged.get(key) or self._cache.get(key)
+            if cached is None:
+                missing[key] = value
+            else:
+                ids[value] = cached
+        if not missing:
+            return ids
+
+        await self._load(db, missing, ids)
+        if missing:
+            extra = await extra_columns(db, list(missing.values())) if extra_columns else {}
+            rows = []
+            for key, value in missing.items():
+                row = {self.value_column: value, **extra.get(value, {})}
+                if self.hash_column:
+                    row[self.hash_column] = key
+                rows.append(row)
+            await db.execute(
+                upsert(db, self.model).on_conflict_do_nothing(index_elements=[self.key_column]),
+                rows,
+            )
+            await self._load(db, missing, ids)
+        return ids
+
+    async def id(self, db: AsyncSession, value: str | None) -> int | None:
+        if not value:
+            return None
+        return (await self.ids(db, [value]))[value]
+
+    async def _load(self, db: AsyncSession, missing: dict[str, str], ids: dict[str, int]) -> None:
+        key_attr = getattr(self.model, self.key_column)
+        result = await db.execute(select(key_attr, self.model.id).where(key_attr.in_(missing)))
+        staged = _staged(db).setdefault(self, {})
+        for key, row_id in result.all():
+            staged[key] = row_id
+            ids[missing.pop(key)] = row_id
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+def _staged(db: AsyncSession) -> dict[Dimension, dict[str, int]]:
+    """Ids read in ``db``'s current transaction, per dimension, not yet cached."""
+    return db.sync_session.info.setdefault("dimension_ids", {})
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_ids(session: Session) -> None:
+    for dimension, ids in session.info.pop("dimension_ids", {}).items():
+        for key, row_id in ids.items():
+            dimension._cache.set(key, row_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_ids(session: Session) -> None:
+    session.info.pop("dimension_ids", None)
+
+
+countries = Dimension(Country, "name", cache_size=settings.dimension_cache_size)
+referrers = Dimension(Referrer, "url", "url_hash", cache_size=settings.dimension_cache_size)
+browsers = Dimension(Browser, "name", cache_size=settings.dimension_cache_size)
+operating_systems = Dimension(OperatingSystem, "name", cache_size=settings.dimension_cache_size)
+devices = Dimension(Device, "name", cache_size=settings.dimension_cache_size)
+user_agents = Dimension(
+    UserAgent, "user_agent", "ua_hash", cache_size=settings.dimension_cache_size
+)
+
+ALL_DIMENSIONS = {
+    "countries": countries,
+    "referrers": referrers,
+    "browsers": browsers,
+    "operating_systems": operating_systems,
+    "devices": devices,
+    "user_agents": user_agents,
+}
+
+
+def clear_dimension_cache() -> None:
+    for dimension in ALL_DIMENSIONS.values():
+        dimension.clear()
+
+
+def dimension_cache_stats() -> dict:
+    return {name: dimension.stats() for name, dimension in ALL_DIMENSIONS.items()}
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+from collections import Counter
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app import database
+from src.app.config import settings
+from src.app.models.click import Click
+from src.app.services import rollups
+from src.app.services.dimensions import countries
+from src.app.services.geoip import lookup_geoip
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() to tell the worker to finish up and exit
+_STOP = object()
+
+# Fills in country/city on the not-yet-enriched clicks from one IP, up to the
+# highest click id counted into the rollups
+_backfill = (
+    update(Click.__table__)
+    .where(
+        Click.__table__.c.ip_address == bindparam("b_ip"),
+        Click.__table__.c.id <= bindparam("b_max_id"),
+        Click.__table__.c.country_id.is_(None),
+        Click.__table__.c.city.is_(None),
+    )
+    .values(country_id=bindparam("b_country_id"), city=bindparam("b_city"))
+)
+
+
+async def resolve_ips(ip_addresses: list[str]) -> dict[str, dict]:
+    """Resolve a batch of IPs concurrently through the cached GeoIP lookup."""
+    results = await asyncio.gather(*(lookup_geoip(ip) for ip in ip_addresses))
+    return dict(zip(ip_addresses, results))
+
+
+async def backfill_geo(db: AsyncSession, geo_by_ip: dict[str, dict]) -> int:
+    """Write resolved geo data onto clicks stored without it. Returns rows updated.
+
+    The country rollups gain the same clicks in the same transaction.
+    """
+    resolved = {ip: geo for ip, geo in geo_by_ip.items() if geo["country"] or geo["city"]}
+    if not resolved:
+        return 0
+    country_ids = await countries.ids(
+        db, {geo["country"] for geo in resolved.values() if geo["country"]}
+    )
+
+    # Count the clicks about to be filled in per link and day; the UPDATE is
+    # bounded by the highest id seen so it touches exactly the rows counted
+    pending = await db.execute(
+        select(
+            Click.ip_address,
+            Click.link_id,
+            rollups.click_day_column,
+            func.count(),
+            func.max(Click.id),
+        )
+        .where(
+            Click.ip_address.in_(resolved),
+            Click.country_id.is_(None),
+            Click.city.is_(None),
+        )
+        .group_by(Click.ip_address, Click.link_id, rollups.click_day_column)
+    )
+    max_ids: dict[str, int] = {}
+    country_counts: Counter = Counter()
+    updated = 0
+    for ip, link_id, day, count, max_id in pending.all():
+        updated += count
+        max_ids[ip] = max(max_ids.get(ip, 0), max_id)
+        country_id = country_ids.get(resolved[ip]["country"])
+        if country_id is not None:
+            country_counts[(link_id, country_id, day)] += count
+    if not max_ids:
+        await db.commit()
+        return 0
+
+    params = [
+        {
+            "b_ip": ip,
+            "b_max_id": max_id,
+            "b_country_id": country_ids.get(resolved[ip]["country"]),
+            "b_city": resolved[ip]["city"],
+        }
+        for ip, max_id in max_ids.items()
+    ]
+    # Counted above: executemany rowcounts aren't reported by every driver
+    await db.execute(_backfill, params)
+    await rollups.add_dimension_counts(db, "country", country_counts)
+    await db.commit()
+    return updated
+
+
+class GeoEnricher:
+    """Background worker that adds geo data to clicks written without it.
+
+    In deferred GeoIP mode clicks are persisted with NULL country/city and
+    their IPs are ``submit``ted here. The worker collects up to ``batch_size``
+    distinct IPs (or whatever arrived within ``flush_interval_ms``), resolves
+    them, and backfills the rows with one bulk UPDATE per batch. IPs that don't
+    fit in the queue are dropped; ``enrich_missing_geo`` picks those rows up later.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        batch_size: int = 100,
+        flush_interval_ms: int = 500,
+        session_factory=None,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # IPs queued but not yet resolved, so repeat clicks aren't queued twice
+        self._pending: set[str] = set()
+        self.submitted = 0
+        self.dropped = 0
+        self.resolved = 0
+        self.updated = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def session_factory(self):
+        return self._session_factory or database.async_session
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._pending.clear()
+        self._task = asyncio.create_task(self._work(), name="geo-enricher")
+
+    async def stop(self) -> None:
+        """Stop the worker after enriching everything already submitted."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def submit(self, ip_address: str | None) -> bool:
+        """Queue an IP for enrichment. Returns False if it was dropped."""
+        if not ip_address or ip_address in self._pending:
+            return True
+        try:
+            self._queue.put_nowait(ip_address)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self._pending.add(ip_address)
+        self.submitted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "resolved": self.resolved,
+            "updated": self.updated,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def _work(self) -> None:
+        stopping = False
+        while not stopping:
+            ips, stopping = await self._next_batch()
+            if ips:
+                await self._enrich(ips)
+
+    async def _next_batch(self) -> tuple[list[str], bool]:
+        loop = asyncio.get_running_loop()
+        ips: list[str] = []
+        item = await self._queue.get()
+        deadline = loop.time() + self.flush_interval
+        while item is not _STOP:
+            ips.append(item)
+            if len(ips) >= self.batch_size:
+                return ips, False
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return ips, False
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except TimeoutError:
+                return ips, False
+        return ips, True
+
+    async def _enrich(self, ips: list[str]) -> None:
+        try:
+            geo_by_ip = await resolve_ips(ips)
+            # backfill_geo only sees clicks committed before it starts, so
+            # later ones from these IPs must be queued again, not deduplicated
+            self._pending.difference_update(ips)
+            async with self.session_factory() as db:
+                self.updated += await backfill_geo(db, geo_by_ip)
+            self.resolved += len(ips)
+            self.batches += 1
+        except Exception:
+            self.failed += len(ips)
+            logger.exception("GeoIP enrichment of %d addresses failed", len(ips))
+        finally:
+            self._pending.difference_update(ips)
+
+
+async def enrich_missing_geo(session_factory, batch_size: int = 100) -> int:
+    """Backfill geo data on historical clicks stored without it. Returns rows updated.
+
+    Walks the distinct IPs of un-enriched clicks in order, so addresses that
+    still resolve to nothing are only tried once per run.
+    """
+    updated = 0
+    last_ip = ""
+    while True:
+        async with session_factory() as db:
+            result = await db.execute(
+                select(Click.ip_address)
+                .where(
+                    Click.ip_address.is_not(None),
+                    Click.ip_address > last_ip,
+                    Click.country_id.is_(None),
+                    Click.city.is_(None),
+                )
+                .group_by(Click.ip_address)
+                .order_by(Click.ip_address)
+                .limit(batch_size)
+            )
+            ips = list(result.scalars().all())
+            if not ips:
+                return updated
+            updated += await backfill_geo(db, await resolve_ips(ips))
+        last_ip = ips[-1]
+
+
+geo_enricher = GeoEnricher(
+    maxsize=settings.geoip_enrichment_queue_size,
+    batch_size=settings.geoip_enrichment_batch_size,
+    flush_interval_ms=settings.geoip_enrichment_flush_interval_ms,
+)
@@ -0,0 +1,525 @@
+import asyncio
+import bisect
+import csv
+import io
+import ipaddress
+import logging
+import mmap
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+
+import httpx
+
+from src.app.config import settings
+from src.app.services.cache import TTLCache
+from src.app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.app.services.ratelimit import TokenBucket
+from src.app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Addresses that never resolve to a location
+_UNROUTABLE = ("127.0.0.1", "::1", "testclient")
+
+# Completed lookups (including "no location known") are kept for a long TTL;
+# failed lookups are remembered only briefly so a flaky provider isn't hammered
+# for the same IP but recovers quickly.
+_geoip_cache = TTLCache(maxsize=settings.geoip_cache_size, ttl=settings.geoip_cache_ttl_seconds)
+_geoip_failure_cache = TTLCache(
+    maxsize=settings.geoip_negative_cache_size,
+    ttl=settings.geoip_negative_cache_ttl_seconds,
+)
+
+# Concurrent cache misses for the same IP (e.g. many clicks from one NAT
+# gateway) share a single provider lookup
+_geoip_flights = SingleFlight()
+
+# While the provider keeps failing or timing out, clicks get empty geo data at
+# once instead of each waiting out the HTTP timeout
+geoip_breaker = CircuitBreaker(
+    "geoip",
+    failure_threshold=settings.geoip_breaker_failure_threshold,
+    reset_timeout=settings.geoip_breaker_reset_timeout_seconds,
+)
+
+
+def empty_geo() -> dict:
+    return {"country": None, "city": None}
+
+
+class GeoIPProvider(ABC):
+    """Resolves an IP address to ``{"country": ..., "city": ...}``.
+
+    Providers return empty geo data for addresses they have no answer for and
+    raise for transient failures, so callers can tell the two apart.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def lookup(self, ip_address: str) -> dict:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+# ---- HTTP provider (ip-api.com) ----
+
+# Application-scoped HTTP client so GeoIP lookups reuse pooled keep-alive
+# connections. Opened/closed by the app lifespan; tests can swap in a client
+# with a stub transport via set_geoip_client().
+_geoip_client: httpx.AsyncClient | None = None
+
+
+def create_geoip_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    """Build a pooled HTTP client configured from Settings."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.geoip_timeout_seconds,
+            connect=settings.geoip_connect_timeout_seconds,
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.geoip_max_connections,
+            max_keepalive_connections=settings.geoip_max_keepalive_connections,
+            keepalive_expiry=settings.geoip_keepalive_expiry_seconds,
+        ),
+        transport=transport,
+    )
+
+
+def get_geoip_client() -> httpx.AsyncClient:
+    """Return the shared GeoIP client, creating one if the lifespan hasn't."""
+    global _geoip_client
+    if _geoip_client is None or _geoip_client.is_closed:
+        _geoip_client = create_geoip_client()
+    return _geoip_client
+
+
+def set_geoip_client(client: httpx.AsyncClient | None) -> None:
+    global _geoip_client
+    _geoip_client = client
+
+
+async def close_geoip_client() -> None:
+    global _geoip_client
+    if _geoip_client is not None:
+        await _geoip_client.aclose()
+        _geoip_client = None
+
+
+class HttpGeoIPProvider(GeoIPProvider):
+    """Looks addresses up against ip-api.com (free tier) over the shared client."""
+
+    name = "http"
+
+    async def lookup(self, ip_address: str) -> dict:
+        return await geoip_breaker.call(lambda: self._request(ip_address))
+
+    async def _request(self, ip_address: str) -> dict:
+        resp = await get_geoip_client().get(
+            f"http://ip-api.com/json/{ip_address}",
+            params={"fields": "status,country,city"},
+        )
+        return _geo_from_response(resp.json())
+
+
+def _geo_from_response(data: dict) -> dict:
+    if data.get("status") != "success":
+        return empty_geo()
+    return {"country": data.get("country"), "city": data.get("city")}
+
+
+class BatchHttpGeoIPProvider(GeoIPProvider):
+    """Resolves addresses through ip-api.com's batch endpoint.
+
+    Lookups arriving within ``window_ms`` of each other are collected and
+    resolved with one POST of up to ``max_batch`` addresses; each caller gets
+    its own result back. Requests are paced by a token bucket so the
+    provider's per-minute limit isn't exceeded, and each one counts once
+    towards the circuit breaker however many addresses it carries.
+    """
+
+    name = "batch"
+    url = "http://ip-api.com/batch"
+
+    def __init__(
+        self,
+        window_ms: int = 10,
+        max_batch: int = 100,
+        rate_limiter: TokenBucket | None = None,
+    ):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.rate_limiter = rate_limiter or TokenBucket(rate=15 / 60, capacity=15)
+        self._pending: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._requests: set[asyncio.Task] = set()
+        self.batches = 0
+        self.addresses = 0
+
+    async def lookup(self, ip_address: str) -> dict:
+        future = self._pending.get(ip_address)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[ip_address] = future
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._resolve(batch))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _resolve(self, batch: dict[str, asyncio.Future]) -> None:
+        ips = list(batch)
+        try:
+            results = await geoip_breaker.call(lambda: self._request(ips))
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+                    # Mark as retrieved in case every waiter was cancelled
+                    future.exception()
+            return
+        self.batches += 1
+        self.addresses += len(ips)
+        # Results come back in request order
+        for ip_address, data in zip(ips, results):
+            future = batch[ip_address]
+            if not future.done():
+                future.set_result(_geo_from_response(data))
+
+    async def _request(self, ips: list[str]) -> list[dict]:
+        await self.rate_limiter.acquire()
+        resp = await get_geoip_client().post(
+            self.url, params={"fields": "status,country,city,query"}, json=ips
+        )
+        resp.raise_for_status()
+        results = resp.json()
+        if len(results) != len(ips):
+            raise ValueError(f"Expected {len(ips)} batch results, got {len(results)}")
+        return results
+
+    async def close(self) -> None:
+        """Resolve anything still collecting, then wait for in-flight requests."""
+        self._flush()
+        if self._requests:
+            await asyncio.gather(*self._requests, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "pending": len(self._pending),
+            "in_flight": len(self._requests),
+            "batches": self.batches,
+            "addresses": self.addresses,
+            "rate_limit": self.rate_limiter.stats(),
+        }
+
+
+# ---- Local provider (offline range database) ----
+#
+# Compiled database layout (little-endian):
+#
+#   header     magic "LDGI", version u16, reserved u16,
+#              IPv4 range count u32, IPv6 range count u32, location count u32
+#   IPv4       starts u32[n], ends u32[n], location index u32[n]
+#   IPv6       starts hi u64[n], starts lo u64[n], ends hi u64[n], ends lo u64[n],
+#              location index u32[n]
+#   locations  (country string offset u32, city string offset u32)[count]
+#   strings    u16 length-prefixed UTF-8; offset 0 is the empty string (NULL)
+
+GEOIP_DB_MAGIC = b"LDGI"
+GEOIP_DB_VERSION = 1
+_DB_HEADER = struct.Struct("<4sHHIII")
+_U64_MASK = (1 << 64) - 1
+
+
+def build_geoip_database(csv_file: io.TextIOBase) -> bytes:
+    """Compile ``start_ip,end_ip,country,city`` CSV rows into the binary format.
+
+    Ranges may mix IPv4 and IPv6 and come in any order, but must not overlap.
+    A header row is skipped if its first field isn't an IP address.
+    """
+    v4: list[tuple[int, int, int]] = []
+    v6: list[tuple[int, int, int]] = []
+    locations: dict[tuple[str, str], int] = {}
+    for row in csv.reader(csv_file):
+        if not row or row[0].startswith("#"):
+            continue
+        try:
+            start = ipaddress.ip_address(row[0].strip())
+        except ValueError:
+            continue  # header row
+        end = ipaddress.ip_address(row[1].strip())
+        if start.version != end.version or int(end) < int(start):
+            raise ValueError(f"Invalid range {row[0]} - {row[1]}")
+        country = row[2].strip() if len(row) > 2 else ""
+        city = row[3].strip() if len(row) > 3 else ""
+        loc = locations.setdefault((country, city), len(locations))
+        (v4 if start.version == 4 else v6).append((int(start), int(end), loc))
+
+    v4.sort()
+    v6.sort()
+    for ranges in (v4, v6):
+        for prev, cur in zip(ranges, ranges[1:]):
+            if cur[0] <= prev[1]:
+                raise ValueError("IP ranges must not overlap")
+
+    strings = bytearray(b"\x00\x00")
+    string_offsets = {"": 0}
+
+    def _string(value: str) -> int:
+        if value not in string_offsets:
+            encoded = value.encode()
+            string_offsets[value] = len(strings)
+            strings.extend(struct.pack("<H", len(encoded)) + encoded)
+        return string_offsets[value]
+
+    location_table = array("I")
+    for country, city in locations:
+        location_table.extend((_string(country), _string(city)))
+
+    def _le(arr: array) -> bytes:
+        if sys.byteorder == "big":
+            arr.byteswap()
+        return arr.tobytes()
+
+    out = bytearray(_DB_HEADER.pack(
+        GEOIP_DB_MAGIC, GEOIP_DB_VERSION, 0, len(v4), len(v6), len(locations),
+    ))
+    out += _le(array("I", (r[0] for r in v4)))
+    out += _le(array("I", (r[1] for r in v4)))
+    out += _le(array("I", (r[2] for r in v4)))
+    out += _le(array("Q", (r[0] >> 64 for r in v6)))
+    out += _le(array("Q", (r[0] & _U64_MASK for r in v6)))
+    out += _le(array("Q", (r[1] >> 64 for r in v6)))
+    out += _le(array("Q", (r[1] & _U64_MASK for r in v6)))
+    out += _le(array("I", (r[2] for r in v6)))
+    out += _le(location_table)
+    out += strings
+    return bytes(out)
+
+
+class _U128View:
+    """Sequence of 128-bit ints stored as parallel hi/lo u64 arrays, for bisect."""
+
+    def __init__(self, hi, lo):
+        self._hi = hi
+        self._lo = lo
+
+    def __len__(self) -> int:
+        return len(self._hi)
+
+    def __getitem__(self, i: int) -> int:
+        return (self._hi[i] << 64) | self._lo[i]
+
+
+class LocalGeoIPProvider(GeoIPProvider):
+    """Offline lookups by binary search over a memory-mapped range database.
+
+    ``path`` is a database compiled with ``python -m src.app.cli build-geoip-db``;
+    a ``.csv`` path is compiled in memory at startup instead.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm: mmap.mmap | None = None
+        if path.endswith(".csv"):
+            with open(path, newline="", encoding="utf-8") as f:
+                data = build_geoip_database(f)
+        else:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._mm
+        self._load(data)
+
+    def _load(self, data) -> None:
+        magic, version, _, n4, n6, n_loc = _DB_HEADER.unpack_from(data, 0)
+        if magic != GEOIP_DB_MAGIC or version != GEOIP_DB_VERSION:
+            raise ValueError(f"{self.path} is not a LinkDrip GeoIP database")
+
+        view = memoryview(data)
+        offset = _DB_HEADER.size
+
+        def _take(fmt: str, count: int):
+            nonlocal offset
+            size = array(fmt).itemsize * count
+            section = view[offset:offset + size]
+            offset += size
+            if sys.byteorder == "big":
+                # Big-endian hosts pay for a byteswapped copy instead of zero-copy reads
+                swapped = array(fmt, section.tobytes())
+                swapped.byteswap()
+                return swapped
+            return section.cast(fmt)
+
+        self._v4_starts = _take("I", n4)
+        self._v4_ends = _take("I", n4)
+        self._v4_locs = _take("I", n4)
+        v6_start_hi, v6_start_lo = _take("Q", n6), _take("Q", n6)
+        v6_end_hi, v6_end_lo = _take("Q", n6), _take("Q", n6)
+        self._v6_starts = _U128View(v6_start_hi, v6_start_lo)
+        self._v6_ends = _U128View(v6_end_hi, v6_end_lo)
+        self._v6_locs = _take("I", n6)
+        self._locations = _take("I", n_loc * 2)
+        self._strings_offset = offset
+        self._data = data
+
+    def _string(self, offset: int) -> str | None:
+        if offset == 0:
+            return None
+        start = self._strings_offset + offset
+        (length,) = struct.unpack_from("<H", self._data, start)
+        return bytes(self._data[start + 2:start + 2 + length]).decode()
+
+    def resolve(self, ip_address: str) -> dict:
+        try:
+            ip = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return empty_geo()
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if ip.version == 4:
+            starts, ends, locs = self._v4_starts, self._v4_ends, self._v4_locs
+        else:
+            starts, ends, locs = self._v6_starts, self._v6_ends, self._v6_locs
+        value = int(ip)
+        i = bisect.bisect_right(starts, value) - 1
+        if i < 0 or value > ends[i]:
+            return empty_geo()
+        loc = locs[i]
+        return {
+            "country": self._string(self._locations[loc * 2]),
+            "city": self._string(self._locations[loc * 2 + 1]),
+        }
+
+    async def lookup(self, ip_address: str) -> dict:
+        return self.resolve(ip_address)
+
+    async def close(self) -> None:
+        # Drop every view into the map before closing it
+        self._v4_starts = self._v4_ends = self._v4_locs = self._v6_locs = None
+        self._v6_starts = self._v6_ends = self._locations = self._data = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+# ---- Provider selection ----
+
+_provider: GeoIPProvider | None = None
+
+
+def create_geoip_provider() -> GeoIPProvider:
+    """Build the provider selected by ``settings.geoip_provider``."""
+    if settings.geoip_provider == "local":
+        return LocalGeoIPProvider(settings.geoip_database_path)
+    if settings.geoip_provider == "batch":
+        return BatchHttpGeoIPProvider(
+            window_ms=settings.geoip_batch_window_ms,
+            max_batch=settings.geoip_batch_size,
+            rate_limiter=TokenBucket(
+                rate=settings.geoip_batch_requests_per_minute / 60,
+                capacity=settings.geoip_batch_requests_per_minute,
+            ),
+        )
+    return HttpGeoIPProvider()
+
+
+def get_geoip_provider() -> GeoIPProvider:
+    global _provider
+    if _provider is None:
+        _provider = create_geoip_provider()
+    return _provider
+
+
+def set_geoip_provider(provider: GeoIPProvider | None) -> None:
+    global _provider
+    _provider = provider
+
+
+async def open_geoip() -> None:
+    """Create the shared HTTP client and the configured provider (app startup)."""
+    set_geoip_client(create_geoip_client())
+    set_geoip_provider(create_geoip_provider())
+
+
+async def close_geoip() -> None:
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+    await close_geoip_client()
+
+
+async def lookup_geoip(ip_address: str) -> dict:
+    """Look up country/city for an IP address using the configured provider."""
+    if not ip_address or ip_address in _UNROUTABLE:
+        return empty_geo()
+
+    cached = _geoip_cache.get(ip_address)
+    if cached is not None:
+        return cached
+    if _geoip_failure_cache.get(ip_address) is not None:
+        return empty_geo()
+
+    return await _geoip_flights.do(ip_address, lambda: _resolve_geoip(ip_address))
+
+
+async def _resolve_geoip(ip_address: str) -> dict:
+    try:
+        # The HTTP providers go through geoip_breaker once per request they send
+        result = await get_geoip_provider().lookup(ip_address)
+    except CircuitOpenError:
+        return empty_geo()
+    except Exception:
+        logger.warning("GeoIP lookup failed for %s", ip_address)
+        _geoip_failure_cache.set(ip_address, True)
+        return empty_geo()
+
+    _geoip_cache.set(ip_address, result)
+    return result
+
+
+def cached_geoip(ip_address: str) -> dict | None:
+    """Geo data for an IP if it is known without asking the provider, else None."""
+    if not ip_address or ip_address in _UNROUTABLE:
+        return empty_geo()
+    return _geoip_cache.get(ip_address)
+
+
+def clear_geoip_cache() -> None:
+    _geoip_cache.clear()
+    _geoip_failure_cache.clear()
+
+
+def geoip_provider_stats() -> dict | None:
+    """Stats for the active provider, or None if none has been created yet."""
+    return _provider.stats() if _provider is not None else None
+
+
+def geoip_cache_stats() -> dict:
+    return {
+        "positive": _geoip_cache.stats(),
+        "negative": _geoip_failure_cache.stats(),
+        "lookups": _geoip_flights.stats(),
+    }
@@ -0,0 +1,246 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app import database
+from src.app.config import settings
+from src.app.services.clicks import ClickEvent, record_click_event, record_clicks_batch
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "block", "spill")
+
+# Queued by stop() to tell the consumer to finish up and exit
+_STOP = object()
+
+
+class ClickQueue:
+    """Bounded in-process queue that decouples redirects from click persistence.
+
+    Redirect handlers ``put`` lightweight ``ClickEvent``s and return at once; a
+    background consumer started from the app lifespan writes them to the
+    database in batches of up to ``batch_size`` events, or whatever arrived
+    within ``flush_interval_ms`` of the first one. When the queue is full the
+    ``overflow`` policy decides what happens: ``drop`` discards the event,
+    ``block`` waits for room, and ``spill`` appends it to a JSON-lines file
+    that is replayed once the consumer catches up. Spilled events are written
+    by a background task in a worker thread, so a slow disk never stalls the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        overflow: str = "drop",
+        spill_path: str | None = None,
+        batch_size: int = 500,
+        flush_interval_ms: int = 50,
+        session_factory=None,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        if overflow == "spill" and not spill_path:
+            raise ValueError("The 'spill' overflow policy requires a spill_path")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # Spilled lines not yet written, and the task writing them
+        self._spill_lines: list[str] = []
+        self._spill_task: asyncio.Task | None = None
+        self._spill_lock: asyncio.Lock | None = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.persisted = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def session_factory(self):
+        return self._session_factory or database.async_session
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._spill_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._consume(), name="click-queue-consumer")
+
+    async def stop(self) -> None:
+        """Stop the consumer after persisting everything queued or spilled."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def put(self, event: ClickEvent) -> bool:
+        """Enqueue a click. Returns False if the event was dropped."""
+        if self.overflow == "block":
+            await self._queue.put(event)
+            self.enqueued += 1
+            return True
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.overflow == "spill":
+                self._spill(event)
+                return True
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "persisted": self.persisted,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def _consume(self) -> None:
+        # Pick up anything spilled before a previous shutdown
+        await self._replay_spill()
+        stopping = False
+        while not stopping:
+            events, stopping = await self._next_batch()
+            if events:
+                await self._persist(events)
+            if stopping or self._queue.empty():
+                await self._replay_spill()
+
+    async def _next_batch(self) -> tuple[list[ClickEvent], bool]:
+        """Collect up to batch_size events, waiting at most flush_interval for more.
+
+        Returns the events and whether a stop was requested.
+        """
+        loop = asyncio.get_running_loop()
+        events: list[ClickEvent] = []
+        item = await self._queue.get()
+        deadline = loop.time() + self.flush_interval
+        while item is not _STOP:
+            events.append(item)
+            if len(events) >= self.batch_size:
+                return events, False
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return events, False
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except TimeoutError:
+                return events, False
+        return events, True
+
+    async def _persist(self, events: list[ClickEvent]) -> None:
+        async with self.session_factory() as db:
+            try:
+                self.persisted += await record_clicks_batch(db, events)
+                self.batches += 1
+                return
+            except Exception:
+                await db.rollback()
+                logger.exception(
+                    "Batch write of %d clicks failed, retrying one by one", len(events)
+                )
+            # Fall back to per-click writes so one bad event can't sink the batch
+            for event in events:
+                try:
+                    await record_click_event(db, event)
+                    self.persisted += 1
+                except Exception:
+                    await db.rollback()
+                    self.failed += 1
+                    logger.exception("Failed to persist click for link %s", event.link_id)
+
+    def _spill(self, event: ClickEvent) -> None:
+        record = event._asdict()
+        if event.clicked_at is not None:
+            record["clicked_at"] = event.clicked_at.isoformat()
+        self._spill_lines.append(json.dumps(record) + "\n")
+        self.spilled += 1
+        if self._spill_task is None or self._spill_task.done():
+            self._spill_task = asyncio.create_task(self._write_spill(), name="click-queue-spill")
+
+    async def _write_spill(self) -> None:
+        async with self._spill_lock:
+            # Lines spilled while a write is in flight go out with the next one
+            while self._spill_lines:
+                lines, self._spill_lines = self._spill_lines, []
+                try:
+                    await asyncio.to_thread(_append_spill, self.spill_path, lines)
+                except Exception:
+                    self.failed += len(lines)
+                    logger.exception("Failed to spill %d clicks", len(lines))
+
+    async def _replay_spill(self) -> None:
+        if not self.spill_path:
+            return
+        if self._spill_task is not None:
+            await self._spill_task
+        # Move the file aside first so new spills during replay are not lost
+        replay_path = f"{self.spill_path}.replay"
+        async with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            os.replace(self.spill_path, replay_path)
+        events = await asyncio.to_thread(_read_spill, replay_path)
+        for start in range(0, len(events), self.batch_size):
+            await self._persist(events[start:start + self.batch_size])
+        os.remove(replay_path)
+
+
+def _append_spill(path: str, lines: list[str]) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def _read_spill(path: str) -> list[ClickEvent]:
+    with open(path, encoding="utf-8") as f:
+        return [_event_from_record(json.loads(line)) for line in f if line.strip()]
+
+
+def _event_from_record(record: dict) -> ClickEvent:
+    clicked_at = record.get("clicked_at")
+    if clicked_at is not None:
+        record["clicked_at"] = datetime.datetime.fromisoformat(clicked_at)
+    return ClickEvent(**record)
+
+
+click_queue = ClickQueue(
+    maxsize=settings.click_queue_size,
+    overflow=settings.click_queue_overflow,
+    spill_path=settings.click_queue_spill_path,
+    batch_size=settings.click_batch_size,
+    flush_interval_ms=settings.click_flush_interval_ms,
+)
+
+
+async def track_click(db: AsyncSession, event: ClickEvent) -> None:
+    """Hand a click to the background queue, or record it inline if the queue isn't running."""
+    if click_queue.running:
+        await click_queue.put(event)
+    else:
+        await record_click_event(db, event)
@@ -1,13 +1,31 @@
 import string
+from typing import NamedTuple
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.app.config import settings
 from src.app.models.link import Link
+from src.app.services import partitions
+from src.app.services.cache import TTLCache
+from src.app.services.slug_filter import slug_filter
+from src.app.services.slug_index import slug_index, slug_index_writer
 
 BASE62_CHARS = string.digits + string.ascii_lowercase + string.ascii_uppercase
 
 
+class ResolvedLink(NamedTuple):
+    """Minimal view of a link needed to serve a redirect."""
+
+    id: int
+    target_url: str
+
+
+# Slug -> ResolvedLink cache for the redirect hot path. Entries expire after a
+# TTL so that changes made by other worker processes are eventually picked up.
+slug_cache = TTLCache(maxsize=settings.slug_cache_size, ttl=settings.slug_cache_ttl_seconds)
+
+
 def encode_base62(num: int) -> str:
     if num == 0:
         return BASE62_CHARS[0]
@@ -28,6 +46,35 @@ async def get_link_by_slug(db: AsyncSession, slug: str) -> Link | None:
     return result.scalar_one_or_none()
 
 
+async def resolve_slug(db: AsyncSession, slug: str) -> ResolvedLink | None:
+    """Resolve a slug for redirecting without touching the database where possible.
+
+    Lookups go through the in-process cache, then the shared memory-mapped
+    index, then the negative-lookup filter (slugs it rules out return None),
+    and only then the links table.
+    """
+    if slug_index.refresh():
+        # Another worker published a new snapshot; drop anything it may supersede
+        slug_cache.clear()
+    cached = slug_cache.get(slug)
+    if cached is not None:
+        return cached
+    indexed = slug_index.lookup(slug)
+    if indexed is not None:
+        return ResolvedLink(*indexed)
+    if not slug_filter.might_exist(slug):
+        return None
+
+    result = await db.execute(select(Link.id, Link.target_url).where(Link.slug == slug))
+    row = result.first()
+    if row is None:
+        return None
+
+    resolved = ResolvedLink(id=row.id, target_url=row.target_url)
+    slug_cache.set(slug, resolved)
+    return resolved
+
+
 async def slug_exists(db: AsyncSession, slug: str) -> bool:
     result = await db.execute(select(Link.id).where(Link.slug == slug))
     return result.scalar_one_or_none() is not None
@@ -63,6 +110,9 @@ async def create_link(
         link.slug = slug
         await db.commit()
         await db.refresh(link)
+        slug_cache.pop(slug)
+        slug_filter.add(slug)
+        slug_index_writer.schedule_rebuild()
         return link
 
     link = Link(
@@ -75,6 +125,9 @@ async def create_link(
     db.add(link)
     await db.commit()
     await db.refresh(link)
+    slug_cache.pop(slug)
+    slug_filter.add(slug)
+    slug_index_writer.schedule_rebuild()
     return link
 
 
@@ -110,6 +163,11 @@ async def delete_link(db: AsyncSession, link_id: int, user_id: int) -> bool:
     link = result.scalar_one_or_none()
     if link is None:
         return False
+    slug = link.slug
+    await partitions.delete_link_clicks(db, link.id)
     await db.delete(link)
     await db.commit()
+    slug_cache.pop(slug)
+    slug_filter.discard(slug)
+    slug_index_writer.schedule_rebuild()
     return True
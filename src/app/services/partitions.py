@@ -0,0 +1,264 @@
+"""Monthly partitions of the raw clicks.
+
+New clicks are written to ``clicks``. ``archive_closed_months`` moves each
+month before the current one into a ``clicks_YYYYMM`` table of its own, and
+``drop_expired_partitions`` removes whole partitions past the retention
+period, so expiring a month is a ``DROP TABLE`` rather than a huge
+``DELETE``. Readers go through ``click_tables`` / ``per_partition``, which
+include only the partitions overlapping the requested window.
+
+Partition tables aren't part of the ORM metadata: they are created on first
+use, carry no foreign keys, and are skipped by Alembic autogenerate. The list
+of partitions is cached for ``CLICK_PARTITION_CACHE_SECONDS``; archiving and
+dropping invalidate it in their own process, and maintenance reads a fresh one.
+
+``raw_horizon`` is stored in the database rather than derived from settings,
+so it always reflects what was actually deleted, whatever ages or retention
+periods maintenance ran with.
+"""
+import datetime
+import logging
+import re
+from collections import defaultdict
+from collections.abc import Callable, Sequence
+
+from sqlalchemy import (
+    Column,
+    CompoundSelect,
+    Index,
+    MetaData,
+    Select,
+    Table,
+    case,
+    delete,
+    insert,
+    inspect,
+    select,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.config import settings
+from src.app.database import upsert
+from src.app.models.click import Click
+from src.app.models.rollup import RawClickHorizon
+from src.app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_NAME = re.compile(r"^clicks_(\d{4})(\d{2})$")
+
+# Partition tables, built on first use from the clicks table's columns
+_metadata = MetaData()
+
+# Partition months per engine; listing tables is a catalog query, and most
+# analytics reads need the list
+_months_cache = TTLCache(maxsize=16)
+
+# The raw horizon per engine, read by every raw analytics query
+_horizon_cache = TTLCache(maxsize=16)
+_NOT_CACHED = object()
+
+
+def clear_partition_cache() -> None:
+    _months_cache.clear()
+    _horizon_cache.clear()
+
+
+def is_partition(table_name: str) -> bool:
+    return _PARTITION_NAME.match(table_name) is not None
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+def _as_datetime(month: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(month, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+def partition_table(month: datetime.date) -> Table:
+    """The ``clicks_YYYYMM`` table for ``month``, with the same columns as ``clicks``."""
+    name = f"clicks_{month:%Y%m}"
+    if name in _metadata.tables:
+        return _metadata.tables[name]
+    table = Table(
+        name,
+        _metadata,
+        *(
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable,
+                   autoincrement=False)
+            for c in Click.__table__.columns
+        ),
+    )
+    Index(f"ix_{name}_link_id_clicked_at", table.c.link_id, table.c.clicked_at)
+    return table
+
+
+async def partition_months(db: AsyncSession, cached: bool = True) -> list[datetime.date]:
+    """Months that have a partition table, oldest first.
+
+    With ``cached``, the list may be up to ``CLICK_PARTITION_CACHE_SECONDS``
+    behind partitions created or dropped by other processes.
+    """
+    key = db.get_bind()
+    months = _months_cache.get(key) if cached else None
+    if months is None:
+        conn = await db.connection()
+        names = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        months = []
+        for name in names:
+            match = _PARTITION_NAME.match(name)
+            if match:
+                months.append(datetime.date(int(match[1]), int(match[2]), 1))
+        months.sort()
+        _months_cache.set(key, months, ttl=settings.click_partition_cache_seconds)
+    return list(months)
+
+
+async def click_tables(
+    db: AsyncSession, since: datetime.datetime | None = None, cached: bool = True
+) -> list[Table]:
+    """``clicks`` followed by the partitions holding clicks at or after ``since``, newest first."""
+    months = await partition_months(db, cached)
+    if since is not None:
+        months = [month for month in months if add_months(month, 1) > since.date()]
+    return [Click.__table__, *(partition_table(month) for month in reversed(months))]
+
+
+async def per_partition(
+    db: AsyncSession,
+    build: Callable[[Table], Select],
+    since: datetime.datetime | None = None,
+    extra: Sequence[Select] = (),
+    cached: bool = True,
+) -> Select | CompoundSelect:
+    """``build(table)`` over ``clicks`` and each partition in the window, as one statement.
+
+    Each table's SELECT runs on its own indexes and the results are combined
+    with ``UNION ALL``, along with any ``extra`` SELECTs; aggregates come back
+    as one partial result per table for the caller to add up. Callers still
+    filter on ``clicked_at``; ``since`` only prunes whole partitions.
+    """
+    selects = [build(table) for table in await click_tables(db, since, cached)] + list(extra)
+    return selects[0] if len(selects) == 1 else union_all(*selects)
+
+
+async def raw_horizon(db: AsyncSession, cached: bool = True) -> datetime.date | None:
+    """First day whose raw clicks are all still stored; ``None`` while none are gone.
+
+    Clicks from before it were compacted or expired with their partition, so
+    only the rollups still count them. With ``cached``, it may be up to
+    ``CLICK_PARTITION_CACHE_SECONDS`` behind a move by another process.
+    """
+    key = db.get_bind()
+    horizon = _horizon_cache.get(key, _NOT_CACHED) if cached else _NOT_CACHED
+    if horizon is _NOT_CACHED:
+        horizon = (await db.execute(select(RawClickHorizon.day))).scalar()
+        _horizon_cache.set(key, horizon, ttl=settings.click_partition_cache_seconds)
+    return horizon
+
+
+async def advance_raw_horizon(db: AsyncSession, day: datetime.date) -> None:
+    """Move the raw horizon forward to ``day``, in the caller's transaction.
+
+    Call before deleting the raw clicks of days before ``day``. An earlier
+    ``day`` leaves the horizon where it is.
+    """
+    table = RawClickHorizon.__table__
+    stmt = upsert(db, table).values(id=1, day=day)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"day": case((table.c.day > stmt.excluded.day, table.c.day), else_=stmt.excluded.day)},
+    ))
+
+
+async def delete_link_clicks(db: AsyncSession, link_id: int) -> None:
+    """Delete a link's archived clicks; its live ones go with the ORM cascade."""
+    for table in (await click_tables(db, cached=False))[1:]:
+        await db.execute(delete(table).where(table.c.link_id == link_id))
+
+
+async def archive_closed_months(
+    session_factory, batch_size: int, today: datetime.date | None = None
+) -> int:
+    """Move clicks from before the current month into their monthly partitions.
+
+    One pass over ``clicks`` in id order, each batch its own short transaction
+    so ingestion carries on meanwhile. Returns the number of clicks moved.
+    """
+    current = _as_datetime(month_start(today or _today()))
+    live = Click.__table__
+    columns = [c.name for c in live.columns]
+    moved = 0
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(
+                select(live.c.id, live.c.clicked_at)
+                .where(live.c.id > last_id, live.c.clicked_at < current)
+                .order_by(live.c.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            by_month: dict[datetime.date, list[int]] = defaultdict(list)
+            for click_id, clicked_at in rows:
+                by_month[month_start(clicked_at.date())].append(click_id)
+            conn = await db.connection()
+            for month, ids in by_month.items():
+                table = partition_table(month)
+                await conn.run_sync(table.create, checkfirst=True)
+                await db.execute(
+                    insert(table).from_select(columns, select(live).where(live.c.id.in_(ids)))
+                )
+            await db.execute(delete(live).where(live.c.id.in_([row.id for row in rows])))
+            await db.commit()
+        clear_partition_cache()
+        moved += len(rows)
+        last_id = rows[-1].id
+    if moved:
+        logger.info("Archived %d clicks into monthly partitions", moved)
+    return moved
+
+
+def retention_start(
+    retention_months: int, today: datetime.date | None = None
+) -> datetime.date | None:
+    """First day still retained: the current month and ``retention_months`` before it.
+
+    ``None`` when retention is off (``retention_months`` <= 0).
+    """
+    if retention_months <= 0:
+        return None
+    return add_months(month_start(today or _today()), -retention_months)
+
+
+async def drop_expired_partitions(
+    session_factory, retention_months: int, today: datetime.date | None = None
+) -> list[datetime.date]:
+    """Drop partitions older than the retention period. Returns the months dropped."""
+    start = retention_start(retention_months, today)
+    if start is None:
+        return []
+    async with session_factory() as db:
+        expired = [month for month in await partition_months(db, cached=False) if month < start]
+        if expired:
+            await advance_raw_horizon(db, add_months(expired[-1], 1))
+        conn = await db.connection()
+        for month in expired:
+            await conn.run_sync(partition_table(month).drop)
+        await db.commit()
+    clear_partition_cache()
+    for month in expired:
+        logger.info("Dropped click partition %s", f"{month:%Y-%m}")
+    return expired
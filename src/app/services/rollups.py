@@ -0,0 +1,236 @@
+import datetime
+from collections import Counter
+from collections.abc import Iterable
+
+from sqlalchemy import delete, exists, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.database import upsert, utc_date
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount, DailyDimensionCount
+from src.app.services import partitions
+
+# Rolled-up dimension name -> the click column holding its key
+ROLLUP_DIMENSIONS = {
+    "country": Click.country_id,
+    "referrer": Click.referrer_id,
+    "user_agent": Click.user_agent_id,
+}
+
+# A stored click's rollup bucket, computed in SQL
+click_day_column = utc_date(Click.clicked_at)
+
+
+def click_day(clicked_at: datetime.datetime) -> datetime.date:
+    """Rollup bucket for a click about to be written; matches ``click_day_column``."""
+    return clicked_at.date()
+
+
+def day_start(day: datetime.date) -> datetime.datetime:
+    """The first ``clicked_at`` that falls in rollup bucket ``day``."""
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+async def _increment(db: AsyncSession, model, counts: Counter, key_columns: list[str]) -> None:
+    if not counts:
+        return
+    table = model.__table__
+    stmt = upsert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns, set_={"count": table.c["count"] + stmt.excluded["count"]}
+    )
+    await db.execute(
+        stmt, [{**dict(zip(key_columns, key)), "count": n} for key, n in counts.items()]
+    )
+
+
+async def add_clicks(db: AsyncSession, clicks: Iterable[dict]) -> None:
+    """Count newly written clicks into the rollups, in the caller's transaction.
+
+    Each click is a dict with ``link_id``, ``clicked_at`` and the
+    ``<dimension>_id`` keys. Counts are coalesced per bucket, so a batch costs
+    one upsert statement per rollup table.
+    """
+    daily: Counter = Counter()
+    dimensions: Counter = Counter()
+    for click in clicks:
+        day = click_day(click["clicked_at"])
+        daily[(click["link_id"], day)] += 1
+        for dimension in ROLLUP_DIMENSIONS:
+            value_id = click.get(f"{dimension}_id")
+            if value_id is not None:
+                dimensions[(click["link_id"], dimension, value_id, day)] += 1
+    await _increment(db, DailyClickCount, daily, ["link_id", "day"])
+    await _increment(
+        db, DailyDimensionCount, dimensions, ["link_id", "dimension", "value_id", "day"]
+    )
+
+
+async def add_dimension_counts(
+    db: AsyncSession, dimension: str, counts: dict[tuple[int, int, datetime.date], int]
+) -> None:
+    """Count existing clicks that just gained a key (e.g. geo enrichment).
+
+    ``counts`` maps (link_id, value_id, day) to the number of clicks.
+    """
+    keyed = Counter({
+        (link_id, dimension, value_id, day): n for (link_id, value_id, day), n in counts.items()
+    })
+    await _increment(db, DailyDimensionCount, keyed, ["link_id", "dimension", "value_id", "day"])
+
+
+def dimension_counts(
+    link_id: int,
+    dimension: str,
+    since: datetime.date | None = None,
+    until: datetime.date | None = None,
+):
+    """(key, count) totals for one dimension of a link, over days in [since, until)."""
+    query = (
+        select(
+            DailyDimensionCount.value_id.label("key"),
+            func.sum(DailyDimensionCount.count).label("count"),
+        )
+        .where(DailyDimensionCount.link_id == link_id, DailyDimensionCount.dimension == dimension)
+    )
+    if since is not None:
+        query = query.where(DailyDimensionCount.day >= since)
+    if until is not None:
+        query = query.where(DailyDimensionCount.day < until)
+    return query.group_by(DailyDimensionCount.value_id)
+
+
+def total_clicks_query(link_id: int, until: datetime.date | None = None):
+    """A link's click total, over days before ``until`` if given."""
+    query = select(func.coalesce(func.sum(DailyClickCount.count), 0)).where(
+        DailyClickCount.link_id == link_id
+    )
+    if until is not None:
+        query = query.where(DailyClickCount.day < until)
+    return query
+
+
+async def total_clicks(db: AsyncSession, link_id: int) -> int:
+    return (await db.execute(total_clicks_query(link_id))).scalar()
+
+
+async def daily_clicks(
+    db: AsyncSession,
+    link_id: int,
+    since: datetime.date,
+    until: datetime.date | None = None,
+) -> list[dict]:
+    query = (
+        select(DailyClickCount.day, DailyClickCount.count)
+        .where(DailyClickCount.link_id == link_id, DailyClickCount.day >= since)
+        .order_by(DailyClickCount.day)
+    )
+    if until is not None:
+        query = query.where(DailyClickCount.day < until)
+    result = await db.execute(query)
+    return [{"date": str(day), "count": count} for day, count in result.all()]
+
+
+async def recount(
+    db: AsyncSession,
+    link_id: int,
+    since: datetime.date | None = None,
+    until: datetime.date | None = None,
+) -> None:
+    """Replace a link's rollups for days in [since, until) with counts of its raw clicks.
+
+    Runs in the caller's transaction; rows outside the range are left alone,
+    and so are compacted days, whose raw clicks may already be gone.
+    """
+    compacted = select(DailyClickCount.day).where(
+        DailyClickCount.link_id == link_id, DailyClickCount.compacted
+    )
+    daily = [DailyClickCount.link_id == link_id, ~DailyClickCount.compacted]
+    dimensional = [
+        DailyDimensionCount.link_id == link_id, DailyDimensionCount.day.not_in(compacted)
+    ]
+    start = end = None
+    if since is not None:
+        daily.append(DailyClickCount.day >= since)
+        dimensional.append(DailyDimensionCount.day >= since)
+        start = day_start(since)
+    if until is not None:
+        daily.append(DailyClickCount.day < until)
+        dimensional.append(DailyDimensionCount.day < until)
+        end = day_start(until)
+    await db.execute(delete(DailyClickCount).where(*daily))
+    await db.execute(delete(DailyDimensionCount).where(*dimensional))
+
+    def grouped(clicks, *keys):
+        """Clicks per day, and per value of ``keys``, in one click table."""
+        day = utc_date(clicks.c.clicked_at).label("day")
+        selected = [clicks.c.link_id, *(clicks.c[key] for key in keys), day]
+        filters = [
+            clicks.c.link_id == link_id,
+            *(clicks.c[key].is_not(None) for key in keys),
+            ~exists().where(
+                DailyClickCount.link_id == link_id,
+                DailyClickCount.day == utc_date(clicks.c.clicked_at),
+                DailyClickCount.compacted,
+            ),
+        ]
+        if start is not None:
+            filters.append(clicks.c.clicked_at >= start)
+        if end is not None:
+            filters.append(clicks.c.clicked_at < end)
+        return select(*selected, func.count().label("count")).where(*filters).group_by(*selected)
+
+    # Counted per click table, then summed across them
+    daily_counts = (await partitions.per_partition(db, grouped, start)).subquery()
+    await db.execute(
+        insert(DailyClickCount).from_select(
+            ["link_id", "day", "count"],
+            select(daily_counts.c.link_id, daily_counts.c.day, func.sum(daily_counts.c.count))
+            .group_by(daily_counts.c.link_id, daily_counts.c.day),
+        )
+    )
+    for dimension, column in ROLLUP_DIMENSIONS.items():
+        counts = (await partitions.per_partition(
+            db, lambda clicks, key=column.key: grouped(clicks, key), start
+        )).subquery()
+        key = counts.c[column.key]
+        await db.execute(
+            insert(DailyDimensionCount).from_select(
+                ["link_id", "dimension", "value_id", "day", "count"],
+                select(
+                    counts.c.link_id, literal(dimension), key, counts.c.day,
+                    func.sum(counts.c.count),
+                )
+                .group_by(counts.c.link_id, key, counts.c.day),
+            )
+        )
+
+
+async def rebuild_link(db: AsyncSession, link_id: int, since: datetime.date | None = None) -> None:
+    """Recompute one link's rollups from its raw clicks, in one transaction.
+
+    With ``since``, only days from then on are recomputed and earlier rows
+    are kept as they are.
+    """
+    await recount(db, link_id, since)
+    await db.commit()
+
+
+async def rebuild_rollups(session_factory, link_ids: Iterable[int] | None = None) -> int:
+    """Regenerate rollups from raw clicks, one link per transaction. Returns links rebuilt.
+
+    Rebuilding link by link keeps each write lock short, so click ingestion
+    carries on while a full rebuild runs. Days before the raw horizon, and
+    compacted days, keep their rollups: their raw clicks may be gone.
+    """
+    async with session_factory() as db:
+        since = await partitions.raw_horizon(db, cached=False)
+        if link_ids is None:
+            link_ids = list((await db.execute(select(Link.id).order_by(Link.id))).scalars())
+    rebuilt = 0
+    for link_id in link_ids:
+        async with session_factory() as db:
+            await rebuild_link(db, link_id, since)
+        rebuilt += 1
+    return rebuilt
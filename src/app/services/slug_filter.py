@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.app.config import settings
+from src.app.models.link import Link
+from src.app.services.slug_index import slug_index
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of slugs a freshly built filter is sized for
+_MIN_CAPACITY = 10000
+
+# How often the refresh loop looks for a new shared slug index file
+_GENERATION_POLL_SECONDS = 1.0
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives, tunable false positives)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class SlugFilter:
+    """Negative-lookup index over every existing slug.
+
+    Until ``load`` has run every slug is reported as possibly existing, so the
+    filter only ever short-circuits lookups once it has been built from the
+    ``links`` table. Links created by other workers only reach it on its next
+    rebuild, so a miss is only trusted while the filter is as new as the
+    shared slug index file currently mapped; without a shared index it always
+    falls through to the database. Deleted slugs can't be removed from
+    a Bloom filter; they just fall through to the database until the next
+    rebuild.
+    """
+
+    def __init__(self, error_rate: float):
+        self.error_rate = error_rate
+        self._bloom: BloomFilter | None = None
+        # Slugs created while a rebuild is reading the links table
+        self._pending: set[str] | None = None
+        # Shared slug index mapping (its reload count) the filter was built against
+        self.index_reloads = 0
+        self.definite_misses = 0
+        self.stale_deletes = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    @property
+    def current(self) -> bool:
+        return slug_index.loaded and slug_index.reloads == self.index_reloads
+
+    async def load(self, db: AsyncSession) -> None:
+        # Read before the links so an index mapped meanwhile counts as newer
+        index_reloads = slug_index.reloads
+        self._pending = set()
+        try:
+            result = await db.execute(select(Link.slug))
+            slugs = result.scalars().all()
+            bloom = BloomFilter(max(_MIN_CAPACITY, len(slugs) * 2), self.error_rate)
+            for slug in slugs:
+                bloom.add(slug)
+            for slug in self._pending:
+                bloom.add(slug)
+        finally:
+            self._pending = None
+        self._bloom = bloom
+        self.index_reloads = index_reloads
+        self.stale_deletes = 0
+
+    def reset(self) -> None:
+        self._bloom = None
+        self.index_reloads = 0
+        self.definite_misses = 0
+        self.stale_deletes = 0
+
+    def add(self, slug: str) -> None:
+        if self._pending is not None:
+            self._pending.add(slug)
+        if self._bloom is not None:
+            self._bloom.add(slug)
+
+    def discard(self, slug: str) -> None:
+        if self._bloom is not None:
+            self.stale_deletes += 1
+
+    def might_exist(self, slug: str) -> bool:
+        if self._bloom is None or slug in self._bloom or not self.current:
+            return True
+        self.definite_misses += 1
+        return False
+
+    def stats(self) -> dict:
+        bloom = self._bloom
+        return {
+            "loaded": bloom is not None,
+            "current": bloom is not None and self.current,
+            "slugs": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "definite_misses": self.definite_misses,
+            "stale_deletes": self.stale_deletes,
+        }
+
+
+async def refresh_slug_filter(session_factory, interval: float) -> None:
+    """Rebuild the filter to shed deleted slugs and pick up other workers' links.
+
+    Rebuilds every ``interval`` seconds, or as soon as a new shared slug index
+    file is mapped.
+    """
+    index_reloads = slug_index.reloads
+    next_rebuild = time.monotonic() + interval
+    while True:
+        await asyncio.sleep(min(interval, _GENERATION_POLL_SECONDS))
+        slug_index.refresh()
+        if slug_index.reloads == index_reloads and time.monotonic() < next_rebuild:
+            continue
+        index_reloads = slug_index.reloads
+        next_rebuild = time.monotonic() + interval
+        try:
+            async with session_factory() as db:
+                await slug_filter.load(db)
+        except Exception:
+            logger.exception("Slug filter refresh failed")
+
+
+slug_filter = SlugFilter(error_rate=settings.slug_filter_error_rate)
@@ -0,0 +1,279 @@
+"""Shared, memory-mapped slug -> target URL index for multi-worker deployments.
+
+One worker exports every link to an on-disk open-addressing hash table and
+atomically swaps it into place; every worker maps the file read-only and
+resolves slugs from it without copying it into its own heap.
+
+File layout (little-endian):
+
+    header   magic "LDSI", version u16, reserved u16, generation u64,
+             slot count u64 (power of two), link count u64
+    slots    slot count x (slug hash u64, record offset u64); offset 0 = empty
+    records  link id u64, slug length u16, url length u32, slug, url
+"""
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker development only
+    fcntl = None
+
+from sqlalchemy import select
+
+from src.app import database
+from src.app.config import settings
+from src.app.models.link import Link
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LDSI"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQQQ")
+_SLOT = struct.Struct("<QQ")
+_RECORD = struct.Struct("<QHI")
+
+
+def _slug_hash(slug: bytes) -> int:
+    # 0 marks an empty slot, so never hand it out as a hash
+    return int.from_bytes(hashlib.blake2b(slug, digest_size=8).digest(), "little") or 1
+
+
+def read_generation(path: str) -> int:
+    """Generation of the index at ``path``, or 0 if there isn't a valid one."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return 0
+    if len(header) < _HEADER.size:
+        return 0
+    magic, version, _, generation, _, _ = _HEADER.unpack(header)
+    return generation if magic == MAGIC and version == VERSION else 0
+
+
+def write_slug_index(path: str, links: list[tuple[int, str, str]], generation: int) -> None:
+    """Write (id, slug, target_url) rows to a new index and atomically replace ``path``."""
+    num_slots = 16
+    while num_slots < len(links) * 2:
+        num_slots *= 2
+
+    slots = bytearray(num_slots * _SLOT.size)
+    records = bytearray()
+    data_start = _HEADER.size + len(slots)
+    mask = num_slots - 1
+    for link_id, slug, target_url in links:
+        slug_bytes = slug.encode()
+        url_bytes = target_url.encode()
+        h = _slug_hash(slug_bytes)
+        i = h & mask
+        while _SLOT.unpack_from(slots, i * _SLOT.size)[1]:
+            i = (i + 1) & mask
+        _SLOT.pack_into(slots, i * _SLOT.size, h, data_start + len(records))
+        records += _RECORD.pack(link_id, len(slug_bytes), len(url_bytes))
+        records += slug_bytes
+        records += url_bytes
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, generation, num_slots, len(links)))
+        f.write(slots)
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _lock_index(path: str):
+    """Take the exclusive build lock for ``path``; closing the returned file releases it."""
+    lock = open(f"{path}.lock", "ab")  # noqa: SIM115 - held until the caller closes it
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            lock.close()
+            raise
+    return lock
+
+
+async def build_slug_index(session_factory, path: str) -> int:
+    """Export every link to the index file. Returns the new generation.
+
+    Builds from all workers take turns on a lock file and read the current
+    generation and the links while holding it, so overlapping rebuilds never
+    publish the same generation and a higher one is never an older snapshot.
+    """
+    lock = await asyncio.to_thread(_lock_index, path)
+    try:
+        async with session_factory() as db:
+            result = await db.execute(select(Link.id, Link.slug, Link.target_url))
+            links = [tuple(row) for row in result.all()]
+        generation = read_generation(path) + 1
+        await asyncio.to_thread(write_slug_index, path, links, generation)
+    finally:
+        lock.close()
+    return generation
+
+
+class SlugIndex:
+    """Read side of the shared index.
+
+    The mapped file is re-checked at most every ``check_interval`` seconds; when
+    another worker has swapped in a new file the new generation is mapped.
+    Lookups only say whether a slug is in the current snapshot — callers fall
+    back to the database for links created after it was taken.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._mm: mmap.mmap | None = None
+        self._file_id: tuple[int, int, int] | None = None
+        self._opened = False
+        self._next_check = 0.0
+        self._num_slots = 0
+        self.generation = 0
+        self.count = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._mm is not None
+
+    def open(self) -> None:
+        self._opened = True
+        self._next_check = 0.0
+        self.refresh()
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        self._opened = False
+        self._mm = None
+        self._file_id = None
+        self.generation = 0
+        self.count = 0
+
+    def refresh(self) -> bool:
+        """Map a newer index file if one has been swapped in. Returns True if it did."""
+        if not self._opened:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        # Inode/mtime alone can repeat when swaps land within one timestamp tick,
+        # so the generation in the header is compared as well
+        file_id = (st.st_ino, st.st_mtime_ns, read_generation(self.path))
+        if file_id == self._file_id:
+            return False
+
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, generation, num_slots, count = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            logger.warning("Ignoring slug index %s with unknown format", self.path)
+            return False
+
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        self._file_id = file_id
+        self._num_slots = num_slots
+        self.generation = generation
+        self.count = count
+        self.reloads += 1
+        return True
+
+    def lookup(self, slug: str) -> tuple[int, str] | None:
+        """Return (link id, target url) if the slug is in the current snapshot."""
+        mm = self._mm
+        if mm is None:
+            return None
+        slug_bytes = slug.encode()
+        h = _slug_hash(slug_bytes)
+        mask = self._num_slots - 1
+        i = h & mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(mm, _HEADER.size + i * _SLOT.size)
+            if offset == 0:
+                self.misses += 1
+                return None
+            if slot_hash == h:
+                link_id, slug_len, url_len = _RECORD.unpack_from(mm, offset)
+                start = offset + _RECORD.size
+                if mm[start:start + slug_len] == slug_bytes:
+                    url_start = start + slug_len
+                    self.hits += 1
+                    return link_id, mm[url_start:url_start + url_len].decode()
+            i = (i + 1) & mask
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "generation": self.generation,
+            "links": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+
+class SlugIndexWriter:
+    """Debounced rebuilds of the index after links are created or deleted."""
+
+    def __init__(self, path: str, delay_ms: int = 250, session_factory=None):
+        self.path = path
+        self.delay = delay_ms / 1000
+        self._session_factory = session_factory
+        self._pending: asyncio.Task | None = None
+        self._dirty = False
+        self.enabled = False
+        self.rebuilds = 0
+
+    @property
+    def session_factory(self):
+        return self._session_factory or database.async_session
+
+    async def rebuild(self) -> int:
+        generation = await build_slug_index(self.session_factory, self.path)
+        self.rebuilds += 1
+        return generation
+
+    def schedule_rebuild(self) -> None:
+        if not self.enabled:
+            return
+        self._dirty = True
+        if self._pending is None or self._pending.done():
+            self._pending = asyncio.get_running_loop().create_task(self._rebuild_later())
+
+    async def flush(self) -> None:
+        """Wait for a scheduled rebuild to finish."""
+        if self._pending is not None:
+            await self._pending
+
+    async def _rebuild_later(self) -> None:
+        # Changes that land while a rebuild is reading the table trigger another pass
+        while self._dirty:
+            await asyncio.sleep(self.delay)
+            self._dirty = False
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Slug index rebuild failed")
+
+
+slug_index = SlugIndex(settings.slug_index_path, settings.slug_index_check_interval_seconds)
+slug_index_writer = SlugIndexWriter(settings.slug_index_path, settings.slug_index_rebuild_delay_ms)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from src.app.services.cache import TTLCache
+from src.app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """Cache of expensive results that carry a cheap version stamp.
+
+    Callers pass the current version (e.g. a link's click count) with each
+    lookup. An entry is fresh while its version matches and it is younger
+    than ``max_age`` seconds; otherwise it is recomputed, with concurrent
+    recomputes of one key coalesced into a single call. With
+    ``stale_while_revalidate`` a stale entry is served immediately and
+    refreshed in a background task, so a slow recompute never blocks a reader
+    once the key has been computed once.
+    """
+
+    def __init__(self, maxsize: int, max_age: float, stale_while_revalidate: bool = False):
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self._entries = TTLCache(maxsize=maxsize)
+        self._flights = SingleFlight()
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+        self.fresh = 0
+        self.stale = 0
+        self.computed = 0
+        self.refresh_errors = 0
+
+    async def get(
+        self, key: Hashable, version: Any, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """The cached value for ``key`` at ``version``, computing it if needed.
+
+        ``compute`` must not depend on the caller's request state (such as its
+        database session): it may run in the background after the caller is done.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, computed_at, value = entry
+            if entry_version == version and time.monotonic() - computed_at < self.max_age:
+                self.fresh += 1
+                return value
+            if self.stale_while_revalidate:
+                self.stale += 1
+                self._refresh(key, version, compute)
+                return value
+        return await self._flights.do(key, lambda: self._compute(key, version, compute))
+
+    async def _compute(
+        self, key: Hashable, version: Any, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        started = time.monotonic()
+        value = await compute()
+        self._entries.set(key, (version, started, value))
+        self.computed += 1
+        return value
+
+    def _refresh(self, key: Hashable, version: Any, compute: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return
+        task = asyncio.ensure_future(
+            self._flights.do(key, lambda: self._compute(key, version, compute))
+        )
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: self._refreshed(key, t))
+
+    def _refreshed(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._refreshing.get(key) is task:
+            del self._refreshing[key]
+        if not task.cancelled() and task.exception() is not None:
+            # The stale entry stays in place; the next reader retries
+            self.refresh_errors += 1
+            logger.error("Background refresh of %r failed", key, exc_info=task.exception())
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.fresh = 0
+        self.stale = 0
+        self.computed = 0
+        self.refresh_errors = 0
+
+    async def close(self) -> None:
+        """Wait for background refreshes still in flight."""
+        if self._refreshing:
+            await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            **self._entries.stats(),
+            "fresh": self.fresh,
+            "stale": self.stale,
+            "computed": self.computed,
+            "refreshing": len(self._refreshing),
+            "refresh_errors": self.refresh_errors,
+        }
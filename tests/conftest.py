@@ -1,14 +1,30 @@
+import json
+import os
+
+import httpx
 import pytest
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
-from src.app.database import Base, get_db
+from src.app.database import Base, create_engine, get_db
 from src.app.main import app
 from src.app.models import Click, Link, User  # noqa: F401 — ensure models are registered
+from src.app.services import geoip as geoip_service
+from src.app.services import partitions
+from src.app.services.clicks import click_stats_cache
+from src.app.services.dimensions import clear_dimension_cache
+from src.app.services.links import slug_cache
+from src.app.services.slug_filter import slug_filter
 
-TEST_DATABASE_URL = "sqlite+aiosqlite://"
+# In-memory SQLite unless set, e.g. to postgresql+asyncpg://user@localhost/linkdrip_test
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL", "sqlite+aiosqlite://")
 
-engine = create_async_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
+if TEST_DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(TEST_DATABASE_URL)
+else:
+    # Each test runs on its own event loop, so connections can't be pooled across tests
+    engine = create_engine(TEST_DATABASE_URL, poolclass=NullPool)
 TestingSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -25,6 +41,11 @@ app.dependency_overrides[get_db] = override_get_db
 
 @pytest.fixture(autouse=True)
 async def setup_db():
+    slug_cache.clear()
+    slug_filter.reset()
+    clear_dimension_cache()
+    click_stats_cache.clear()
+    partitions.clear_partition_cache()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
@@ -37,3 +58,36 @@ async def client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+
+class GeoIPStub:
+    """Local stand-in for ip-api.com: answers from ``responses``, else a failed lookup."""
+
+    def __init__(self):
+        self.responses: dict[str, dict] = {}
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.method == "POST" and request.url.path == "/batch":
+            ips = json.loads(request.content)
+            return httpx.Response(200, json=[self._answer(ip) for ip in ips])
+        ip_address = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json=self._answer(ip_address))
+
+    def _answer(self, ip_address: str) -> dict:
+        return {**self.responses.get(ip_address, {"status": "fail"}), "query": ip_address}
+
+
+@pytest.fixture(autouse=True)
+async def geoip_stub():
+    """Keep GeoIP lookups off the network for every test."""
+    stub = GeoIPStub()
+    geoip_service.clear_geoip_cache()
+    geoip_service.geoip_breaker.reset()
+    geoip_service.set_geoip_provider(geoip_service.HttpGeoIPProvider())
+    geoip_service.set_geoip_client(
+        geoip_service.create_geoip_client(transport=httpx.MockTransport(stub.handler))
+    )
+    yield stub
+    await geoip_service.close_geoip()
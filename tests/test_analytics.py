@@ -1,18 +1,26 @@
 import datetime
 
 import pytest
-from sqlalchemy import select
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from src.app.api.analytics import _sanitize_csv_field
+from src.app.config import settings
+from src.app.database import Base, create_engine
 from src.app.models.click import Click
 from src.app.models.link import Link
+from src.app.models.user_agent import UserAgent
 from src.app.services.clicks import (
+    ClickEvent,
+    click_stats_cache,
     get_all_clicks_for_export,
     get_click_stats,
     parse_user_agent,
     record_click,
+    record_clicks_batch,
+    ua_cache_stats,
 )
-from tests.conftest import TestingSessionLocal
+from tests.conftest import TestingSessionLocal, engine
 
 
 class TestUserAgentParsing:
@@ -55,6 +63,26 @@ class TestUserAgentParsing:
         assert result["os"] is None
         assert result["device"] is None
 
+    def test_repeated_user_agents_are_memoized(self):
+        ua = "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0 memo-test"
+        before = ua_cache_stats()
+        first = parse_user_agent(ua)
+        second = parse_user_agent(ua)
+        after = ua_cache_stats()
+        assert first == second
+        assert first is not second  # callers get their own dict
+        assert after["misses"] == before["misses"] + 1
+        assert after["hits"] == before["hits"] + 1
+
+    def test_memoized_on_truncated_string(self):
+        base = "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0 "
+        ua = base + "x" * 600
+        parse_user_agent(ua)
+        before = ua_cache_stats()
+        # Differs only past the stored 500 characters, so it's the same cache entry
+        parse_user_agent(ua + "tail")
+        assert ua_cache_stats()["hits"] == before["hits"] + 1
+
 
 class TestRecordClick:
     @pytest.mark.asyncio
@@ -134,6 +162,111 @@ class TestRecordClick:
             assert link.click_count == 3
 
 
+class TestRecordClicksBatch:
+    async def _create_links(self, db, count):
+        from src.app.models.user import User
+
+        user = User(
+            email="batch@example.com",
+            hashed_password="not-a-real-hash",
+            display_name="Batch Writer",
+        )
+        db.add(user)
+        await db.flush()
+        links = [
+            Link(slug=f"batch-{i}", target_url="https://example.com/batch", user_id=user.id)
+            for i in range(count)
+        ]
+        db.add_all(links)
+        await db.commit()
+        return links
+
+    @pytest.mark.asyncio
+    async def test_batch_writes_clicks_and_coalesces_counts(self):
+        async with TestingSessionLocal() as db:
+            first, second = await self._create_links(db, 2)
+            events = [
+                ClickEvent(first.id, "127.0.0.1", "https://twitter.com", "Mozilla/5.0 Chrome/120.0"),
+                ClickEvent(first.id, "127.0.0.1", None, None),
+                ClickEvent(first.id, "127.0.0.1", "x" * 600, "y" * 600),
+                ClickEvent(second.id, "127.0.0.1", None, None),
+            ]
+
+            statements = []
+
+            def _capture(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+            try:
+                written = await record_clicks_batch(db, events)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+            assert written == 4
+            assert len([s for s in statements if s.startswith("INSERT INTO clicks")]) == 1
+            assert len([s for s in statements if s.startswith("UPDATE links")]) == 2
+
+            await db.refresh(first)
+            await db.refresh(second)
+            assert first.click_count == 3
+            assert second.click_count == 1
+
+            clicks = await get_all_clicks_for_export(db, first.id)
+            assert len(clicks) == 3
+            assert max(len(c.referrer or "") for c in clicks) == 500
+            assert max(len(c.user_agent or "") for c in clicks) == 500
+
+    @pytest.mark.asyncio
+    async def test_empty_batch(self):
+        async with TestingSessionLocal() as db:
+            assert await record_clicks_batch(db, []) == 0
+
+
+class TestUserAgentDimension:
+    @pytest.mark.asyncio
+    async def test_distinct_user_agents_stored_once(self):
+        chrome = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        firefox = "Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0"
+        async with TestingSessionLocal() as db:
+            link_id = (await TestRecordClicksBatch()._create_links(db, 1))[0].id
+            events = [ClickEvent(link_id, "127.0.0.1", None, ua) for ua in (chrome, firefox, chrome)]
+            await record_clicks_batch(db, events)
+            await record_click(db, await db.get(Link, link_id), "127.0.0.1", None, chrome)
+
+            agents = (await db.execute(select(UserAgent))).scalars().all()
+            assert sorted(a.device for a in agents) == ["Desktop", "Desktop"]
+            clicks = (await db.execute(select(Click.user_agent_id))).scalars().all()
+            assert len(clicks) == 4
+            assert len(set(clicks)) == 2
+
+            stats = await get_click_stats(db, link_id)
+            browsers = {b["name"].split()[0]: b["count"] for b in stats["top_browsers"]}
+            assert browsers == {"Chrome": 3, "Firefox": 1}
+            assert stats["devices"] == [{"name": "Desktop", "count": 4}]
+            assert stats["recent_clicks"][0].user_agent in (chrome, firefox)
+
+    @pytest.mark.asyncio
+    async def test_known_user_agents_need_no_query(self):
+        ua = "Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0"
+        async with TestingSessionLocal() as db:
+            link_id = (await TestRecordClicksBatch()._create_links(db, 1))[0].id
+            await record_clicks_batch(db, [ClickEvent(link_id, "127.0.0.1", None, ua)])
+
+            statements = []
+
+            def _capture(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+            try:
+                await record_clicks_batch(db, [ClickEvent(link_id, "127.0.0.1", None, ua)])
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+            assert not [s for s in statements if "user_agents" in s]
+
+
 class TestClickStats:
     @pytest.mark.asyncio
     async def test_empty_stats(self):
@@ -210,6 +343,79 @@ class TestClickStats:
             assert len(stats["top_browsers"]) > 0
             assert len(stats["devices"]) > 0
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("strategy", ["rollup", "single_pass"])
+    async def test_strategies_match_raw_aggregates(self, strategy, geoip_stub, monkeypatch):
+        """Every analytics strategy should produce the same aggregates."""
+        geoip_stub.responses.update({
+            "5.5.5.5": {"status": "success", "country": "France", "city": "Paris"},
+            "6.6.6.6": {"status": "success", "country": "Japan", "city": "Tokyo"},
+        })
+        chrome = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+        iphone = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Mobile Safari/604.1"
+        now = datetime.datetime.now(datetime.timezone.utc)
+        old = now - datetime.timedelta(days=45)
+        async with TestingSessionLocal() as db:
+            link_id = (await TestRecordClicksBatch()._create_links(db, 1))[0].id
+            await record_clicks_batch(db, [
+                ClickEvent(link_id, "5.5.5.5", "https://twitter.com", chrome, now),
+                ClickEvent(link_id, "5.5.5.5", "https://twitter.com", chrome, now),
+                ClickEvent(link_id, "5.5.5.5", "https://news.ycombinator.com", iphone, old),
+                ClickEvent(link_id, "6.6.6.6", "https://twitter.com", chrome, old),
+                ClickEvent(link_id, "6.6.6.6", None, iphone, now - datetime.timedelta(days=1)),
+                ClickEvent(link_id, "7.7.7.7", None, None, now),
+            ])
+
+        results = []
+        for name in ("raw", strategy):
+            monkeypatch.setattr(settings, "analytics_strategy", name)
+            async with TestingSessionLocal() as db:
+                stats = await get_click_stats(db, link_id)
+            assert len(stats.pop("recent_clicks")) == 6
+            results.append(stats)
+
+        expected, actual = results
+        assert actual == expected
+        assert expected["total_clicks"] == 6
+        assert expected["top_countries"] == [
+            {"name": "France", "count": 3}, {"name": "Japan", "count": 2},
+        ]
+        assert [d["count"] for d in expected["daily_clicks"]] == [1, 3]
+
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("strategy", ["raw", "rollup", "single_pass"])
+    async def test_concurrent_queries_on_wal_database(self, strategy, tmp_path, monkeypatch):
+        """Concurrent analytics run on separate connections to a WAL-mode file."""
+        monkeypatch.setattr(settings, "sqlite_journal_mode", "wal")
+        monkeypatch.setattr(settings, "analytics_strategy", strategy)
+        file_engine = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+        sessions = async_sessionmaker(file_engine, class_=AsyncSession, expire_on_commit=False)
+        async with file_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+        try:
+            async with sessions() as db:
+                link_id = (await TestRecordClicksBatch()._create_links(db, 1))[0].id
+                await record_clicks_batch(db, [
+                    ClickEvent(link_id, "127.0.0.1", f"https://ref{i % 3}.example.com",
+                               f"Mozilla/5.0 Firefox/{100 + i % 4}.0")
+                    for i in range(12)
+                ])
+
+            results = []
+            for concurrent in (False, True):
+                monkeypatch.setattr(settings, "analytics_concurrent", concurrent)
+                async with sessions() as db:
+                    stats = await get_click_stats(db, link_id)
+                assert len(stats.pop("recent_clicks")) == 12
+                results.append(stats)
+            assert results[0] == results[1]
+            assert results[0]["total_clicks"] == 12
+            assert [r["count"] for r in results[0]["top_referrers"]] == [4, 4, 4]
+        finally:
+            await file_engine.dispose()
+
 
 class TestAnalyticsPage:
     async def _register_and_get_token(self, client, email="analytics@example.com"):
@@ -609,3 +815,28 @@ class TestAnalyticsPageWithClicks:
         assert "Chrome" in response.text
         assert "Desktop" in response.text
         assert "reddit.com" in response.text
+
+
+    @pytest.mark.asyncio
+    async def test_analytics_page_cached_until_new_clicks(self, client):
+        token = await self._register_and_get_token(client, "anacache@example.com")
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": "https://example.com/ana-cache", "custom_slug": "ana-cache"},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        await client.get("/ana-cache", follow_redirects=False)
+
+        for _ in range(3):
+            response = await client.get(
+                "/dashboard/links/1/analytics", cookies={"access_token": token}
+            )
+            assert response.status_code == 200
+        assert click_stats_cache.stats()["computed"] == 1
+        assert click_stats_cache.stats()["fresh"] == 2
+
+        # A new click bumps the link's click count, so the next view recomputes
+        await client.get("/ana-cache", follow_redirects=False)
+        await client.get("/dashboard/links/1/analytics", cookies={"access_token": token})
+        assert click_stats_cache.stats()["computed"] == 2
@@ -0,0 +1,57 @@
+import time
+
+from src.app.services.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_and_set(self):
+        cache = TTLCache(maxsize=10)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("missing") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 3)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+        assert cache.evictions == 1
+
+    def test_entries_expire(self, monkeypatch):
+        now = time.monotonic()
+        monkeypatch.setattr("src.app.services.cache.time.monotonic", lambda: now)
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=60)
+
+        monkeypatch.setattr("src.app.services.cache.time.monotonic", lambda: now + 10)
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert len(cache) == 1
+
+    def test_pop_and_clear(self):
+        cache = TTLCache(maxsize=10)
+        cache.set("a", 1)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.set("b", 2)
+        cache.get("b")
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.stats()["hits"] == 0
+
+    def test_stats(self):
+        cache = TTLCache(maxsize=10)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        stats = cache.stats()
+        assert stats["size"] == 1
+        assert stats["maxsize"] == 10
+        assert stats["hit_ratio"] == 0.5
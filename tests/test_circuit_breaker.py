@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from src.app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise TimeoutError("slow")
+
+
+class TestCircuitBreaker:
+    @pytest.mark.asyncio
+    async def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+        for _ in range(3):
+            with pytest.raises(TimeoutError):
+                await breaker.call(_fail)
+        assert breaker.state == "open"
+
+        calls = 0
+
+        async def _counted():
+            nonlocal calls
+            calls += 1
+
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_counted)
+        assert calls == 0
+        assert breaker.rejected == 1
+        assert breaker.stats()["transitions"] == {"closed->open": 1}
+
+    @pytest.mark.asyncio
+    async def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+        assert await breaker.call(_ok) == "ok"
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+        assert breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_closes_on_success(self, monkeypatch):
+        now = time.monotonic()
+        monkeypatch.setattr("src.app.services.circuit_breaker.time.monotonic", lambda: now)
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+
+        later = now + 11
+        monkeypatch.setattr("src.app.services.circuit_breaker.time.monotonic", lambda: later)
+        assert await breaker.call(_ok) == "ok"
+        assert breaker.state == "closed"
+        assert breaker.stats()["transitions"] == {
+            "closed->open": 1, "open->half_open": 1, "half_open->closed": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_half_open_probe_reopens_on_failure(self, monkeypatch):
+        now = time.monotonic()
+        monkeypatch.setattr("src.app.services.circuit_breaker.time.monotonic", lambda: now)
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+
+        later = now + 11
+        monkeypatch.setattr("src.app.services.circuit_breaker.time.monotonic", lambda: later)
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+        assert breaker.state == "open"
+        # The open period starts over from the failed probe
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_ok)
+
+    @pytest.mark.asyncio
+    async def test_only_one_probe_while_half_open(self, monkeypatch):
+        now = time.monotonic()
+        monkeypatch.setattr("src.app.services.circuit_breaker.time.monotonic", lambda: now)
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        with pytest.raises(TimeoutError):
+            await breaker.call(_fail)
+
+        async def _probe():
+            with pytest.raises(CircuitOpenError):
+                await breaker.call(_ok)
+            return "probe"
+
+        assert await breaker.call(_probe) == "probe"
+        assert breaker.state == "closed"
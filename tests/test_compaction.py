@@ -0,0 +1,257 @@
+import contextlib
+import datetime
+
+import pytest
+from sqlalchemy import event, func, select, update
+
+from src.app.config import settings
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount
+from src.app.models.user import User
+from src.app.services import partitions
+from src.app.services.clicks import ClickEvent, get_click_stats, record_clicks_batch
+from src.app.services.compaction import compact_clicks
+from src.app.services.rollups import rebuild_link, rebuild_rollups
+from tests.conftest import TestingSessionLocal, engine
+
+CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Mobile Safari/604.1"
+
+STAT_KEYS = ["total_clicks", "top_countries", "top_browsers", "top_os", "devices",
+             "top_referrers", "daily_clicks"]
+
+AGE_DAYS = 10
+
+
+@pytest.fixture(autouse=True)
+async def drop_partitions():
+    yield
+    async with TestingSessionLocal() as db:
+        conn = await db.connection()
+        for month in await partitions.partition_months(db, cached=False):
+            await conn.run_sync(partitions.partition_table(month).drop)
+        await db.commit()
+    partitions.clear_partition_cache()
+
+
+async def _create_link_with_clicks() -> int:
+    """A link with clicks today, 2 days ago, and on three days 20-25 days ago."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    days = datetime.timedelta
+    async with TestingSessionLocal() as db:
+        user = User(email="compact@example.com", hashed_password="x", display_name="Compact")
+        db.add(user)
+        await db.flush()
+        link = Link(slug="compact", target_url="https://example.com", user_id=user.id)
+        db.add(link)
+        await db.flush()
+        await record_clicks_batch(db, [
+            ClickEvent(link.id, "5.5.5.5", "https://twitter.com", CHROME, now),
+            ClickEvent(link.id, "6.6.6.6", None, IPHONE, now - days(days=2)),
+            ClickEvent(link.id, "7.7.7.7", "https://twitter.com", CHROME, now - days(days=20)),
+            ClickEvent(link.id, "8.8.8.8", None, CHROME, now - days(days=20)),
+            ClickEvent(link.id, "9.9.9.9", None, IPHONE, now - days(days=21)),
+            ClickEvent(link.id, "1.1.1.1", "https://github.com", CHROME, now - days(days=25)),
+        ])
+        await db.commit()
+        return link.id
+
+
+async def _stats(link_id: int, strategy: str, monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "analytics_strategy", strategy)
+    async with TestingSessionLocal() as db:
+        stats = await get_click_stats(db, link_id)
+    return {key: stats[key] for key in STAT_KEYS}
+
+
+async def _raw_clicks() -> int:
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(func.count(Click.id)))).scalar()
+
+
+@contextlib.contextmanager
+def _click_deletes(fail_after: int | None = None):
+    """Rows removed by each DELETE on clicks; the ``fail_after``+1-th DELETE raises."""
+    removed = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM clicks") and len(removed) == fail_after:
+            raise RuntimeError("interrupted")
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE FROM clicks"):
+            removed.append(cursor.rowcount)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before)
+    event.listen(engine.sync_engine, "after_cursor_execute", after)
+    try:
+        yield removed
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before)
+        event.remove(engine.sync_engine, "after_cursor_execute", after)
+
+
+async def _rolled_up(link_id: int) -> int:
+    async with TestingSessionLocal() as db:
+        return (await db.execute(
+            select(func.sum(DailyClickCount.count)).where(DailyClickCount.link_id == link_id)
+        )).scalar()
+
+
+class TestCompaction:
+    @pytest.mark.asyncio
+    async def test_old_clicks_are_removed(self):
+        await _create_link_with_clicks()
+        removed = await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        assert removed == 4
+        assert await _raw_clicks() == 2
+        # Nothing left to compact on a second run
+        assert await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100) == 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        await _create_link_with_clicks()
+        assert await compact_clicks(TestingSessionLocal, 0, batch_size=100) == 0
+        assert await _raw_clicks() == 6
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("strategy", ["raw", "single_pass", "rollup"])
+    @pytest.mark.parametrize("batch_size", [1, 100])
+    async def test_stats_unchanged_by_compaction(self, strategy, batch_size, monkeypatch):
+        link_id = await _create_link_with_clicks()
+        before = await _stats(link_id, strategy, monkeypatch)
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=batch_size)
+        assert await _stats(link_id, strategy, monkeypatch) == before
+        assert before["total_clicks"] == 6
+
+    @pytest.mark.asyncio
+    async def test_rollups_missing_clicks_are_recounted_first(self):
+        link_id = await _create_link_with_clicks()
+        async with TestingSessionLocal() as db:
+            await db.execute(update(DailyClickCount).values(count=0))
+            await db.commit()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        # The compacted days were recounted; the recent ones are left to rebuild_rollups
+        assert await _rolled_up(link_id) == 4
+
+    @pytest.mark.asyncio
+    async def test_rollups_counting_more_are_kept(self):
+        """A compacted day's rollup also counts clicks deleted before; a late
+        click on that day must add to it, not replace it."""
+        link_id = await _create_link_with_clicks()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        late = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=20)
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, [ClickEvent(link_id, "2.2.2.2", None, CHROME, late)])
+            await db.commit()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        assert await _rolled_up(link_id) == 7
+
+    @pytest.mark.asyncio
+    async def test_rebuild_keeps_compacted_days(self):
+        link_id = await _create_link_with_clicks()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        await rebuild_rollups(TestingSessionLocal, [link_id])
+        assert await _rolled_up(link_id) == 6
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("configured_age", [0, 5, 30])
+    async def test_horizon_follows_the_run_not_the_settings(self, configured_age, monkeypatch):
+        """E.g. ``compact-clicks --age-days``, or the age changed after a run."""
+        monkeypatch.setattr(settings, "click_compaction_age_days", configured_age)
+        link_id = await _create_link_with_clicks()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        for strategy in ("raw", "single_pass", "rollup"):
+            assert (await _stats(link_id, strategy, monkeypatch))["total_clicks"] == 6
+
+        await rebuild_rollups(TestingSessionLocal, [link_id])
+        assert await _rolled_up(link_id) == 6
+        # Even a rebuild from the first day leaves the compacted days alone
+        async with TestingSessionLocal() as db:
+            await rebuild_link(db, link_id)
+        assert await _rolled_up(link_id) == 6
+        assert (await _stats(link_id, "raw", monkeypatch))["daily_clicks"] == (
+            await _stats(link_id, "rollup", monkeypatch)
+        )["daily_clicks"]
+
+    @pytest.mark.asyncio
+    async def test_horizon_never_moves_back(self):
+        await _create_link_with_clicks()
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        await compact_clicks(TestingSessionLocal, AGE_DAYS * 3, batch_size=100)
+        async with TestingSessionLocal() as db:
+            horizon = await partitions.raw_horizon(db, cached=False)
+        assert horizon == today - datetime.timedelta(days=AGE_DAYS)
+
+    @pytest.mark.asyncio
+    async def test_emptied_partitions_are_dropped(self):
+        await _create_link_with_clicks()
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        # Archive as of next month so every click lands in a partition
+        await partitions.archive_closed_months(
+            TestingSessionLocal, batch_size=100, today=partitions.add_months(today, 1)
+        )
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        async with TestingSessionLocal() as db:
+            months = await partitions.partition_months(db)
+            remaining = 0
+            for table in await partitions.click_tables(db):
+                remaining += (await db.execute(select(func.count()).select_from(table))).scalar()
+        assert remaining == 2
+        # Only partitions still holding recent clicks survive
+        assert months == sorted({
+            partitions.month_start(today - datetime.timedelta(days=n)) for n in (0, 2)
+        })
+
+    @pytest.mark.asyncio
+    async def test_hot_link_day_is_deleted_in_bounded_chunks(self, monkeypatch):
+        link_id = await _create_link_with_clicks()
+        hot = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=28)
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, [
+                ClickEvent(link_id, "2.2.2.2", None, CHROME, hot) for _ in range(25)
+            ])
+            await db.commit()
+        before = await _stats(link_id, "raw", monkeypatch)
+
+        with _click_deletes() as removed:
+            assert await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=10) == 29
+        assert removed == [10, 10, 9]
+        assert await _raw_clicks() == 2
+        assert await _stats(link_id, "raw", monkeypatch) == before
+
+    @pytest.mark.asyncio
+    async def test_interrupted_run_resumes_without_recounting(self, monkeypatch):
+        link_id = await _create_link_with_clicks()
+        before = await _stats(link_id, "raw", monkeypatch)
+        with _click_deletes(fail_after=1), pytest.raises(RuntimeError):
+            await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=1)
+        # The days were marked compacted before any click went
+        assert 2 < await _raw_clicks() < 6
+        async with TestingSessionLocal() as db:
+            compacted = (await db.execute(
+                select(func.count()).where(DailyClickCount.compacted)
+            )).scalar()
+        assert compacted == 3
+
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=1)
+        assert await _raw_clicks() == 2
+        assert await _rolled_up(link_id) == 6
+        assert await _stats(link_id, "raw", monkeypatch) == before
+
+    @pytest.mark.asyncio
+    async def test_compacted_days_are_never_recounted(self):
+        link_id = await _create_link_with_clicks()
+        await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100)
+        # Raw clicks showing up for a compacted day, e.g. restored from a
+        # backup, are deleted without replacing the day's rollup
+        old = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=25)
+        async with TestingSessionLocal() as db:
+            await db.execute(Click.__table__.insert(), [
+                {"link_id": link_id, "clicked_at": old} for _ in range(3)
+            ])
+            await db.commit()
+        assert await compact_clicks(TestingSessionLocal, AGE_DAYS, batch_size=100) == 3
+        assert await _rolled_up(link_id) == 6
@@ -0,0 +1,136 @@
+import datetime
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.app.config import settings
+from src.app.database import create_engine, engine_options, sqlite_pragmas, upsert, utc_date
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services.clicks import ClickEvent, record_clicks_batch
+from tests.conftest import TestingSessionLocal
+
+POSTGRES_URL = "postgresql+asyncpg://linkdrip@localhost/linkdrip"
+
+
+async def _pragmas(path, *names) -> dict:
+    engine = create_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with engine.connect() as conn:
+            return {
+                name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar() for name in names
+            }
+    finally:
+        await engine.dispose()
+
+
+class TestSQLiteProfile:
+    @pytest.mark.asyncio
+    async def test_default_profile_keeps_sqlite_defaults(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "sqlite_profile", "default")
+        pragmas = await _pragmas(tmp_path / "t.db", "journal_mode", "synchronous")
+        assert pragmas == {"journal_mode": "delete", "synchronous": 2}  # FULL
+
+    @pytest.mark.asyncio
+    async def test_balanced_profile_uses_wal(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "sqlite_profile", "balanced")
+        pragmas = await _pragmas(
+            tmp_path / "t.db", "journal_mode", "synchronous", "busy_timeout"
+        )
+        assert pragmas == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000}
+
+    @pytest.mark.asyncio
+    async def test_throughput_profile(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "sqlite_profile", "throughput")
+        pragmas = await _pragmas(
+            tmp_path / "t.db", "journal_mode", "cache_size", "mmap_size", "temp_store"
+        )
+        assert pragmas == {
+            "journal_mode": "wal",
+            "cache_size": -65536,
+            "mmap_size": 268435456,
+            "temp_store": 2,  # MEMORY
+        }
+
+    @pytest.mark.asyncio
+    async def test_settings_override_profile(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "sqlite_profile", "balanced")
+        monkeypatch.setattr(settings, "sqlite_synchronous", "full")
+        monkeypatch.setattr(settings, "sqlite_cache_size", -4096)
+        assert sqlite_pragmas()["synchronous"] == "full"
+        pragmas = await _pragmas(tmp_path / "t.db", "journal_mode", "synchronous", "cache_size")
+        assert pragmas == {"journal_mode": "wal", "synchronous": 2, "cache_size": -4096}
+
+
+class TestEngineOptions:
+    def test_sqlite_allows_cross_thread_connections(self):
+        assert engine_options("sqlite+aiosqlite:///./t.db") == {
+            "connect_args": {"check_same_thread": False}
+        }
+
+    def test_postgres_pool_from_settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "db_pool_size", 4)
+        monkeypatch.setattr(settings, "db_max_overflow", 2)
+        monkeypatch.setattr(settings, "db_pool_pre_ping", False)
+        monkeypatch.setattr(settings, "db_statement_cache_size", 0)
+        options = engine_options(POSTGRES_URL)
+        assert options["pool_size"] == 4
+        assert options["max_overflow"] == 2
+        assert options["pool_pre_ping"] is False
+        assert options["connect_args"] == {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_postgres_engine_gets_sized_pool(self, monkeypatch):
+        pytest.importorskip("asyncpg")
+        monkeypatch.setattr(settings, "db_pool_size", 3)
+        engine = create_engine(POSTGRES_URL)
+        try:
+            assert engine.pool.size() == 3
+            assert engine.pool._pre_ping is True
+        finally:
+            await engine.dispose()
+
+
+class TestDialectHelpers:
+    def test_utc_date_per_dialect(self):
+        query = select(utc_date(Click.clicked_at))
+        assert "date(clicks.clicked_at)" in str(query.compile(dialect=sqlite.dialect()))
+        assert "CAST((clicks.clicked_at) AT TIME ZONE 'UTC' AS DATE)" in str(
+            query.compile(dialect=postgresql.dialect())
+        )
+
+    @pytest.mark.asyncio
+    async def test_utc_date_buckets_by_utc_day(self):
+        # Late evening in UTC-5 is already the next day in UTC
+        clicked_at = datetime.datetime(
+            2026, 3, 1, 22, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=-5))
+        )
+        async with TestingSessionLocal() as db:
+            user = User(email="days@example.com", hashed_password="x", display_name="Days")
+            db.add(user)
+            await db.flush()
+            link = Link(slug="days", target_url="https://example.com", user_id=user.id)
+            db.add(link)
+            await db.flush()
+            await record_clicks_batch(db, [
+                ClickEvent(link.id, "5.5.5.5", None, "", clicked_at.astimezone(datetime.timezone.utc))
+            ])
+            await db.commit()
+            if db.get_bind().dialect.name == "postgresql":
+                # Not the session time zone's day
+                await db.execute(text("SET TIME ZONE 'America/New_York'"))
+            day = (await db.execute(select(utc_date(Click.clicked_at)))).scalar()
+        assert day == datetime.date(2026, 3, 2)
+
+    @pytest.mark.asyncio
+    async def test_upsert_matches_session_backend(self):
+        async with TestingSessionLocal() as db:
+            stmt = upsert(db, Click.__table__)
+            dialect = db.get_bind().dialect.name
+        expected = postgresql.Insert if dialect == "postgresql" else sqlite.Insert
+        assert isinstance(stmt, expected)
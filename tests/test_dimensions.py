@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import event, func, select
+
+from src.app.models.dimensions import Country, Referrer
+from src.app.services.dimensions import Dimension, countries, referrers, value_hash
+from tests.conftest import TestingSessionLocal, engine
+
+
+class _StatementLog:
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._capture)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._capture)
+
+    def _capture(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+
+class TestDimension:
+    @pytest.mark.asyncio
+    async def test_get_or_create_assigns_stable_ids(self):
+        async with TestingSessionLocal() as db:
+            first = await countries.ids(db, ["France", "Japan"])
+            await db.commit()
+            second = await countries.ids(db, ["Japan", "France", "Chile"])
+            await db.commit()
+
+            assert first["France"] == second["France"]
+            assert first["Japan"] == second["Japan"]
+            assert len(set(second.values())) == 3
+            count = await db.execute(select(func.count(Country.id)))
+            assert count.scalar() == 3
+
+    @pytest.mark.asyncio
+    async def test_cached_keys_need_no_query(self):
+        async with TestingSessionLocal() as db:
+            await countries.ids(db, ["France"])
+            with _StatementLog() as statements:
+                assert await countries.id(db, "France") is not None
+            assert statements == []
+
+    @pytest.mark.asyncio
+    async def test_existing_rows_found_after_cache_is_cleared(self):
+        async with TestingSessionLocal() as db:
+            france = await countries.id(db, "France")
+            await db.commit()
+            fresh = Dimension(Country, "name")
+            with _StatementLog() as statements:
+                assert await fresh.id(db, "France") == france
+            # Found by the lookup query, nothing inserted
+            assert len(statements) == 1
+            assert statements[0].startswith("SELECT")
+
+    @pytest.mark.asyncio
+    async def test_long_values_keyed_by_hash(self):
+        url = "https://example.com/" + "a" * 400
+        async with TestingSessionLocal() as db:
+            referrer_id = await referrers.id(db, url)
+            row = await db.get(Referrer, referrer_id)
+            assert row.url == url
+            assert row.url_hash == value_hash(url)
+
+    @pytest.mark.asyncio
+    async def test_empty_values_have_no_key(self):
+        async with TestingSessionLocal() as db:
+            assert await referrers.id(db, "") is None
+            assert await referrers.id(db, None) is None
+
+    @pytest.mark.asyncio
+    async def test_rolled_back_ids_are_not_cached(self):
+        async with TestingSessionLocal() as db:
+            await referrers.id(db, "https://rolled-back.example.com")
+            await db.rollback()
+            assert (await db.execute(select(func.count(Referrer.id)))).scalar() == 0
+
+            # SQLite hands the same id to the next new row: it must not be
+            # credited to the rolled-back value
+            kept = await referrers.id(db, "https://kept.example.com")
+            again = await referrers.id(db, "https://rolled-back.example.com")
+            await db.commit()
+            assert kept != again
+            assert (await db.get(Referrer, again)).url == "https://rolled-back.example.com"
+
+    @pytest.mark.asyncio
+    async def test_ids_are_shared_once_committed(self):
+        async with TestingSessionLocal() as db:
+            await countries.id(db, "France")
+        # Closed without committing: the next session looks it up again
+        async with TestingSessionLocal() as db:
+            with _StatementLog() as statements:
+                france = await countries.id(db, "France")
+            assert any(statement.startswith("INSERT") for statement in statements)
+            await db.commit()
+        async with TestingSessionLocal() as db:
+            with _StatementLog() as statements:
+                assert await countries.id(db, "France") == france
+            assert statements == []
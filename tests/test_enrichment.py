@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services import enrichment
+from src.app.services.clicks import ClickEvent, record_click_event, record_clicks_batch
+from src.app.services.dimensions import countries
+from src.app.services.enrichment import GeoEnricher, enrich_missing_geo
+from src.app.services.geoip import lookup_geoip
+from tests.conftest import TestingSessionLocal
+
+PARIS = {"status": "success", "country": "France", "city": "Paris"}
+TOKYO = {"status": "success", "country": "Japan", "city": "Tokyo"}
+
+
+async def _create_link(slug="enrich") -> int:
+    async with TestingSessionLocal() as db:
+        user = User(email=f"{slug}@example.com", hashed_password="x", display_name="Geo")
+        db.add(user)
+        await db.flush()
+        link = Link(slug=slug, target_url="https://example.com", user_id=user.id)
+        db.add(link)
+        await db.commit()
+        return link.id
+
+
+async def _geo_rows(link_id: int) -> list[tuple]:
+    async with TestingSessionLocal() as db:
+        result = await db.execute(
+            select(Click).where(Click.link_id == link_id).order_by(Click.id)
+        )
+        return [(c.ip_address, c.country, c.city) for c in result.scalars().all()]
+
+
+def _event(link_id: int, ip: str) -> ClickEvent:
+    return ClickEvent(link_id, ip, None, None, datetime.datetime.now(datetime.timezone.utc))
+
+
+@pytest.fixture
+async def deferred_geo(monkeypatch):
+    enricher = GeoEnricher(maxsize=100, session_factory=TestingSessionLocal)
+    monkeypatch.setattr("src.app.services.clicks.geo_enricher", enricher)
+    await enricher.start()
+    yield enricher
+    await enricher.stop()
+
+
+class TestDeferredEnrichment:
+    @pytest.mark.asyncio
+    async def test_click_written_without_waiting_for_geo(self, geoip_stub, deferred_geo):
+        geoip_stub.responses["5.5.5.5"] = PARIS
+        link_id = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_click_event(db, _event(link_id, "5.5.5.5"))
+
+        assert geoip_stub.requests == []
+        assert await _geo_rows(link_id) == [("5.5.5.5", None, None)]
+
+        await deferred_geo.stop()
+        assert await _geo_rows(link_id) == [("5.5.5.5", "France", "Paris")]
+        assert deferred_geo.updated == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_enriched_with_one_lookup_per_ip(self, geoip_stub, deferred_geo):
+        geoip_stub.responses.update({"5.5.5.5": PARIS, "6.6.6.6": TOKYO})
+        link_id = await _create_link()
+        events = [_event(link_id, ip) for ip in ("5.5.5.5", "6.6.6.6", "5.5.5.5")]
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, events)
+        await deferred_geo.stop()
+
+        assert len(geoip_stub.requests) == 2
+        assert deferred_geo.batches == 1
+        assert await _geo_rows(link_id) == [
+            ("5.5.5.5", "France", "Paris"),
+            ("6.6.6.6", "Japan", "Tokyo"),
+            ("5.5.5.5", "France", "Paris"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_click_landing_during_backfill_is_enriched(
+        self, geoip_stub, deferred_geo, monkeypatch
+    ):
+        geoip_stub.responses["5.5.5.5"] = PARIS
+        link_id = await _create_link()
+        backfill_geo = enrichment.backfill_geo
+        late = []
+
+        async def backfill_then_click(db, geo_by_ip):
+            updated = await backfill_geo(db, geo_by_ip)
+            if not late:
+                # A click looked up before the batch resolved, committed after its snapshot
+                async with TestingSessionLocal() as other:
+                    other.add(Click(link_id=link_id, ip_address="5.5.5.5"))
+                    await other.commit()
+                late.append(deferred_geo.submit("5.5.5.5"))
+            return updated
+
+        monkeypatch.setattr(enrichment, "backfill_geo", backfill_then_click)
+        async with TestingSessionLocal() as db:
+            await record_click_event(db, _event(link_id, "5.5.5.5"))
+        for _ in range(100):
+            if deferred_geo.batches == 2:
+                break
+            await asyncio.sleep(0.05)
+        await deferred_geo.stop()
+
+        assert late == [True]
+        assert deferred_geo.submitted == 2
+        assert await _geo_rows(link_id) == [("5.5.5.5", "France", "Paris")] * 2
+
+    @pytest.mark.asyncio
+    async def test_cached_geo_used_directly(self, geoip_stub, deferred_geo):
+        geoip_stub.responses["5.5.5.5"] = PARIS
+        await lookup_geoip("5.5.5.5")
+        link_id = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_click_event(db, _event(link_id, "5.5.5.5"))
+
+        assert await _geo_rows(link_id) == [("5.5.5.5", "France", "Paris")]
+        assert deferred_geo.submitted == 0
+
+
+class TestEnrichMissingGeo:
+    @pytest.mark.asyncio
+    async def test_backfills_historical_rows(self, geoip_stub):
+        geoip_stub.responses.update({"5.5.5.5": PARIS, "6.6.6.6": TOKYO})
+        link_id = await _create_link()
+        async with TestingSessionLocal() as db:
+            for ip in ("5.5.5.5", "6.6.6.6", "7.7.7.7", "5.5.5.5"):
+                db.add(Click(link_id=link_id, ip_address=ip))
+            country_id = await countries.id(db, "US")
+            db.add(Click(link_id=link_id, ip_address="8.8.8.8", country_id=country_id, city="Mountain View"))
+            await db.commit()
+
+        updated = await enrich_missing_geo(TestingSessionLocal, batch_size=2)
+
+        assert updated == 3
+        assert await _geo_rows(link_id) == [
+            ("5.5.5.5", "France", "Paris"),
+            ("6.6.6.6", "Japan", "Tokyo"),
+            ("7.7.7.7", None, None),
+            ("5.5.5.5", "France", "Paris"),
+            ("8.8.8.8", "US", "Mountain View"),
+        ]
+        # 8.8.8.8 already had geo data, so only three addresses were looked up
+        assert len(geoip_stub.requests) == 3
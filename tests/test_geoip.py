@@ -0,0 +1,326 @@
+import asyncio
+import io
+import json
+import time
+
+import httpx
+import pytest
+
+from src.app.cli import main as cli_main
+from src.app.config import settings
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services.clicks import ClickEvent, get_click_stats, record_clicks_batch
+from src.app.services.geoip import (
+    GEOIP_DB_MAGIC,
+    BatchHttpGeoIPProvider,
+    LocalGeoIPProvider,
+    build_geoip_database,
+    close_geoip_client,
+    create_geoip_client,
+    geoip_breaker,
+    geoip_cache_stats,
+    get_geoip_client,
+    lookup_geoip,
+    set_geoip_client,
+    set_geoip_provider,
+)
+from src.app.services.ratelimit import TokenBucket
+from tests.conftest import TestingSessionLocal
+
+RANGES_CSV = """start_ip,end_ip,country,city
+1.0.0.0,1.0.0.255,Australia,Sydney
+8.8.8.0,8.8.8.255,United States,Mountain View
+81.2.69.0,81.2.69.127,United Kingdom,London
+81.2.69.128,81.2.69.255,United Kingdom,
+2001:4860::,2001:4860:ffff:ffff:ffff:ffff:ffff:ffff,United States,Mountain View
+2a02:ff00::,2a02:ffff:ffff:ffff:ffff:ffff:ffff:ffff,Italy,Rome
+"""
+
+
+@pytest.fixture
+def geoip_db(tmp_path):
+    path = tmp_path / "geoip.bin"
+    path.write_bytes(build_geoip_database(io.StringIO(RANGES_CSV)))
+    return str(path)
+
+
+class TestGeoIPClient:
+    @pytest.mark.asyncio
+    async def test_lookup_uses_shared_client(self, geoip_stub):
+        geoip_stub.responses["8.8.8.8"] = {
+            "status": "success", "country": "United States", "city": "Mountain View",
+        }
+        result = await lookup_geoip("8.8.8.8")
+        assert result == {"country": "United States", "city": "Mountain View"}
+        assert geoip_stub.requests[0].url.path == "/json/8.8.8.8"
+
+        # Served from the cache the second time
+        await lookup_geoip("8.8.8.8")
+        assert len(geoip_stub.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_lookup_failure_returns_empty_geo(self):
+        def _boom(request):
+            raise httpx.ConnectTimeout("timed out", request=request)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_boom)))
+        assert await lookup_geoip("9.9.9.9") == {"country": None, "city": None}
+
+    @pytest.mark.asyncio
+    async def test_client_is_pooled_and_configured(self):
+        await close_geoip_client()
+        client = get_geoip_client()
+        assert client is get_geoip_client()
+        assert client.timeout.connect == settings.geoip_connect_timeout_seconds
+        assert client.timeout.read == settings.geoip_timeout_seconds
+        await close_geoip_client()
+        assert get_geoip_client() is not client
+
+
+class TestLocalGeoIPProvider:
+    @pytest.mark.parametrize("ip_address, expected", [
+        ("1.0.0.0", ("Australia", "Sydney")),
+        ("1.0.0.255", ("Australia", "Sydney")),
+        ("8.8.8.8", ("United States", "Mountain View")),
+        ("81.2.69.127", ("United Kingdom", "London")),
+        ("81.2.69.128", ("United Kingdom", None)),
+        ("2001:4860:4860::8888", ("United States", "Mountain View")),
+        ("2a02:ff10::1", ("Italy", "Rome")),
+        ("::ffff:8.8.8.8", ("United States", "Mountain View")),
+        ("1.0.1.0", (None, None)),
+        ("0.0.0.1", (None, None)),
+        ("2001:db8::1", (None, None)),
+        ("not-an-ip", (None, None)),
+    ])
+    def test_resolve(self, geoip_db, ip_address, expected):
+        provider = LocalGeoIPProvider(geoip_db)
+        result = provider.resolve(ip_address)
+        assert (result["country"], result["city"]) == expected
+
+    @pytest.mark.asyncio
+    async def test_csv_is_compiled_in_memory(self, tmp_path):
+        path = tmp_path / "ranges.csv"
+        path.write_text(RANGES_CSV)
+        provider = LocalGeoIPProvider(str(path))
+        assert (await provider.lookup("1.0.0.7"))["city"] == "Sydney"
+        await provider.close()
+
+    @pytest.mark.asyncio
+    async def test_lookup_geoip_uses_local_provider(self, geoip_db, geoip_stub):
+        set_geoip_provider(LocalGeoIPProvider(geoip_db))
+        assert await lookup_geoip("8.8.4.4") == {"country": None, "city": None}
+        assert await lookup_geoip("8.8.8.4") == {
+            "country": "United States", "city": "Mountain View",
+        }
+        assert geoip_stub.requests == []
+
+    def test_rejects_overlapping_ranges(self):
+        with pytest.raises(ValueError):
+            build_geoip_database(io.StringIO("1.0.0.0,1.0.0.10,A,\n1.0.0.5,1.0.0.20,B,\n"))
+
+    def test_rejects_unknown_file(self, tmp_path):
+        path = tmp_path / "bogus.bin"
+        path.write_bytes(b"\x00" * 64)
+        with pytest.raises(ValueError):
+            LocalGeoIPProvider(str(path))
+
+    def test_cli_builds_database(self, tmp_path, capsys):
+        csv_path = tmp_path / "ranges.csv"
+        csv_path.write_text(RANGES_CSV)
+        out_path = tmp_path / "geoip.bin"
+        cli_main(["build-geoip-db", str(csv_path), str(out_path)])
+
+        assert out_path.read_bytes()[:4] == GEOIP_DB_MAGIC
+        assert "Wrote" in capsys.readouterr().out
+
+
+class TestGeoIPCache:
+    @pytest.mark.asyncio
+    async def test_failures_are_negatively_cached(self, geoip_stub):
+        calls = []
+
+        def _flaky(request):
+            calls.append(request)
+            raise httpx.ReadTimeout("slow", request=request)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_flaky)))
+        assert await lookup_geoip("5.5.5.5") == {"country": None, "city": None}
+        assert await lookup_geoip("5.5.5.5") == {"country": None, "city": None}
+        assert len(calls) == 1
+        assert geoip_cache_stats()["negative"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_expire_quickly(self, geoip_stub, monkeypatch):
+        now = time.monotonic()
+        monkeypatch.setattr("src.app.services.cache.time.monotonic", lambda: now)
+
+        def _down(request):
+            raise httpx.ConnectError("down", request=request)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_down)))
+        await lookup_geoip("6.6.6.6")
+
+        geoip_stub.responses["6.6.6.6"] = {"status": "success", "country": "France", "city": "Paris"}
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(geoip_stub.handler)))
+        later = now + settings.geoip_negative_cache_ttl_seconds + 1
+        monkeypatch.setattr("src.app.services.cache.time.monotonic", lambda: later)
+        assert await lookup_geoip("6.6.6.6") == {"country": "France", "city": "Paris"}
+
+    @pytest.mark.asyncio
+    async def test_stats_exposed_in_metrics(self, client, geoip_stub):
+        await lookup_geoip("7.7.7.7")
+        await lookup_geoip("7.7.7.7")
+        response = await client.get("/health/metrics")
+        stats = response.json()["geoip_cache"]["positive"]
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_request(self, geoip_stub):
+        requests = []
+
+        async def _slow(request):
+            requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"status": "success", "country": "Japan", "city": "Osaka"})
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_slow)))
+        coalesced = geoip_cache_stats()["lookups"]["coalesced"]
+        results = await asyncio.gather(*(lookup_geoip("8.8.4.4") for _ in range(20)))
+        assert len(requests) == 1
+        assert all(r == {"country": "Japan", "city": "Osaka"} for r in results)
+        assert geoip_cache_stats()["lookups"]["coalesced"] == coalesced + 19
+
+
+class TestBatchHttpGeoIPProvider:
+    @pytest.mark.asyncio
+    async def test_concurrent_lookups_share_one_post(self, geoip_stub):
+        geoip_stub.responses.update({
+            "1.1.1.1": {"status": "success", "country": "Australia", "city": "Sydney"},
+            "2.2.2.2": {"status": "success", "country": "France", "city": "Paris"},
+        })
+        provider = BatchHttpGeoIPProvider(window_ms=20)
+        set_geoip_provider(provider)
+
+        results = await asyncio.gather(*(lookup_geoip(ip) for ip in ("1.1.1.1", "2.2.2.2", "3.3.3.3")))
+
+        assert results == [
+            {"country": "Australia", "city": "Sydney"},
+            {"country": "France", "city": "Paris"},
+            {"country": None, "city": None},
+        ]
+        assert len(geoip_stub.requests) == 1
+        request = geoip_stub.requests[0]
+        assert request.method == "POST"
+        assert request.url.path == "/batch"
+        assert json.loads(request.content) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+        assert provider.stats()["batches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_click_batch_resolves_its_ips_in_one_post(self, geoip_stub):
+        ips = [f"5.5.5.{i}" for i in range(20)]
+        geoip_stub.responses.update(
+            {ip: {"status": "success", "country": "France", "city": "Paris"} for ip in ips}
+        )
+        set_geoip_provider(BatchHttpGeoIPProvider(window_ms=20))
+        async with TestingSessionLocal() as db:
+            user = User(email="batch@example.com", hashed_password="x", display_name="Batch")
+            db.add(user)
+            await db.flush()
+            link = Link(slug="batch", target_url="https://example.com", user_id=user.id)
+            db.add(link)
+            await db.flush()
+            await record_clicks_batch(db, [ClickEvent(link.id, ip, None, None) for ip in ips])
+            stats = await get_click_stats(db, link.id)
+
+        assert len(geoip_stub.requests) == 1
+        assert stats["top_countries"] == [{"name": "France", "count": 20}]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_is_sent_without_waiting(self, geoip_stub):
+        provider = BatchHttpGeoIPProvider(window_ms=60_000, max_batch=2)
+        set_geoip_provider(provider)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(lookup_geoip("1.1.1.1"), lookup_geoip("2.2.2.2")), timeout=1
+        )
+        assert results == [{"country": None, "city": None}] * 2
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_fails_every_caller(self, geoip_stub):
+        def _rate_limited(request):
+            return httpx.Response(429)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_rate_limited)))
+        provider = BatchHttpGeoIPProvider(window_ms=5)
+        set_geoip_provider(provider)
+
+        results = await asyncio.gather(
+            provider.lookup("1.1.1.1"), provider.lookup("2.2.2.2"), return_exceptions=True
+        )
+        assert all(isinstance(r, httpx.HTTPStatusError) for r in results)
+        # lookup_geoip turns the failure into empty geo data
+        assert await lookup_geoip("4.4.4.4") == {"country": None, "city": None}
+
+    @pytest.mark.asyncio
+    async def test_requests_are_rate_limited(self, geoip_stub, monkeypatch):
+        sleeps = []
+
+        async def _fake_sleep(delay):
+            sleeps.append(delay)
+
+        monkeypatch.setattr("src.app.services.ratelimit.asyncio.sleep", _fake_sleep)
+        provider = BatchHttpGeoIPProvider(
+            window_ms=0, rate_limiter=TokenBucket(rate=1, capacity=1)
+        )
+        set_geoip_provider(provider)
+
+        await lookup_geoip("1.1.1.1")
+        await lookup_geoip("2.2.2.2")
+
+        assert len(geoip_stub.requests) == 2
+        assert len(sleeps) == 1
+        assert 0 < sleeps[0] <= 1
+        assert provider.rate_limiter.waits == 1
+
+
+class TestGeoIPCircuitBreaker:
+    @pytest.mark.asyncio
+    async def test_open_circuit_skips_provider(self, client, geoip_stub):
+        calls = []
+
+        def _timeout(request):
+            calls.append(request)
+            raise httpx.ReadTimeout("slow", request=request)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_timeout)))
+        threshold = geoip_breaker.failure_threshold
+        for i in range(threshold + 3):
+            assert await lookup_geoip(f"10.1.0.{i}") == {"country": None, "city": None}
+
+        assert len(calls) == threshold
+        assert geoip_breaker.state == "open"
+        assert geoip_breaker.rejected == 3
+
+        health = (await client.get("/health")).json()
+        assert health["geoip"] == "open"
+        metrics = (await client.get("/health/metrics")).json()
+        assert metrics["geoip_breaker"]["transitions"] == {"closed->open": 1}
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_counts_once(self, geoip_stub):
+        def _unavailable(request):
+            return httpx.Response(503)
+
+        set_geoip_client(create_geoip_client(transport=httpx.MockTransport(_unavailable)))
+        set_geoip_provider(BatchHttpGeoIPProvider(window_ms=5))
+        threshold = geoip_breaker.failure_threshold
+        ips = [f"10.2.0.{i}" for i in range(threshold * 2)]
+
+        results = await asyncio.gather(*(lookup_geoip(ip) for ip in ips))
+
+        assert results == [{"country": None, "city": None}] * len(ips)
+        assert geoip_breaker.consecutive_failures == 1
+        assert geoip_breaker.state == "closed"
@@ -9,6 +9,7 @@ async def test_health_check(client):
     assert data["status"] == "healthy"
     assert data["service"] == "LinkDrip"
     assert data["version"] == "0.1.0"
+    assert data["geoip"] == "closed"
 
 
 @pytest.mark.asyncio
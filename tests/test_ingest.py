@@ -0,0 +1,162 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services import ingest
+from src.app.services.clicks import ClickEvent
+from src.app.services.ingest import ClickQueue, click_queue
+from tests.conftest import TestingSessionLocal
+
+
+async def _create_link(slug="queued") -> int:
+    async with TestingSessionLocal() as db:
+        user = User(
+            email=f"{slug}@example.com",
+            hashed_password="not-a-real-hash",
+            display_name="Queue User",
+        )
+        db.add(user)
+        await db.flush()
+        link = Link(slug=slug, target_url="https://example.com/queued", user_id=user.id)
+        db.add(link)
+        await db.commit()
+        return link.id
+
+
+async def _click_totals(link_id: int) -> tuple[int, int]:
+    async with TestingSessionLocal() as db:
+        rows = await db.execute(select(func.count(Click.id)).where(Click.link_id == link_id))
+        link = await db.get(Link, link_id)
+        return rows.scalar(), link.click_count
+
+
+def _event(link_id: int, ip: str = "127.0.0.1") -> ClickEvent:
+    return ClickEvent(
+        link_id, ip, "https://twitter.com", "Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0",
+        datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+class TestClickQueue:
+    @pytest.mark.asyncio
+    async def test_stop_drains_queue(self):
+        link_id = await _create_link()
+        queue = ClickQueue(maxsize=100, session_factory=TestingSessionLocal)
+        await queue.start()
+        for _ in range(5):
+            assert await queue.put(_event(link_id))
+        await queue.stop()
+
+        assert not queue.running
+        assert queue.persisted == 5
+        assert await _click_totals(link_id) == (5, 5)
+
+    @pytest.mark.asyncio
+    async def test_drop_policy(self):
+        link_id = await _create_link()
+        queue = ClickQueue(maxsize=1, overflow="drop", session_factory=TestingSessionLocal)
+        await queue.start()
+        # No await point between the puts, so the consumer can't make room
+        assert await queue.put(_event(link_id))
+        assert not await queue.put(_event(link_id))
+        await queue.stop()
+
+        assert queue.dropped == 1
+        assert await _click_totals(link_id) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_spill_policy_replays_on_stop(self, tmp_path):
+        link_id = await _create_link()
+        spill_path = tmp_path / "spill.jsonl"
+        queue = ClickQueue(
+            maxsize=1, overflow="spill", spill_path=str(spill_path),
+            session_factory=TestingSessionLocal,
+        )
+        await queue.start()
+        for _ in range(3):
+            assert await queue.put(_event(link_id))
+        assert queue.spilled == 2
+        await queue.stop()
+
+        assert not spill_path.exists()
+        assert await _click_totals(link_id) == (3, 3)
+
+    @pytest.mark.asyncio
+    async def test_spilling_does_not_block_the_loop(self, tmp_path, monkeypatch):
+        link_id = await _create_link()
+
+        def slow_open(*args, **kwargs):
+            time.sleep(0.2)  # a slow disk
+            return open(*args, **kwargs)
+
+        monkeypatch.setattr(ingest, "open", slow_open, raising=False)
+        spill_path = tmp_path / "spill.jsonl"
+        queue = ClickQueue(
+            maxsize=1, overflow="spill", spill_path=str(spill_path),
+            session_factory=TestingSessionLocal,
+        )
+        await queue.start()
+        started = time.perf_counter()
+        for _ in range(5):
+            assert await queue.put(_event(link_id))
+        # Other tasks keep running while the spill is written
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - started < 0.15
+        assert queue.spilled == 4
+        await queue.stop()
+
+        assert not spill_path.exists()
+        assert await _click_totals(link_id) == (5, 5)
+
+    @pytest.mark.asyncio
+    async def test_block_policy_waits_for_room(self):
+        link_id = await _create_link()
+        queue = ClickQueue(maxsize=1, overflow="block", session_factory=TestingSessionLocal)
+        await queue.start()
+        await asyncio.gather(*(queue.put(_event(link_id)) for _ in range(4)))
+        await queue.stop()
+
+        assert queue.dropped == 0
+        assert await _click_totals(link_id) == (4, 4)
+
+    @pytest.mark.asyncio
+    async def test_events_are_written_in_batches(self):
+        link_id = await _create_link()
+        queue = ClickQueue(
+            maxsize=100, batch_size=4, flush_interval_ms=1000,
+            session_factory=TestingSessionLocal,
+        )
+        await queue.start()
+        for _ in range(10):
+            await queue.put(_event(link_id))
+        await queue.stop()
+
+        assert queue.persisted == 10
+        assert queue.batches == 3
+        assert await _click_totals(link_id) == (10, 10)
+
+    def test_rejects_unknown_policy(self):
+        with pytest.raises(ValueError):
+            ClickQueue(maxsize=1, overflow="explode")
+
+
+class TestQueuedRedirect:
+    @pytest.mark.asyncio
+    async def test_redirect_enqueues_click(self, client, monkeypatch):
+        link_id = await _create_link("queued-redirect")
+        monkeypatch.setattr(click_queue, "_session_factory", TestingSessionLocal)
+        await click_queue.start()
+        try:
+            response = await client.get("/queued-redirect", follow_redirects=False)
+            assert response.status_code == 302
+            assert click_queue.enqueued >= 1
+        finally:
+            await click_queue.stop()
+
+        assert await _click_totals(link_id) == (1, 1)
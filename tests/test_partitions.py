@@ -0,0 +1,221 @@
+import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from src.app.config import settings
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount
+from src.app.models.user import User
+from src.app.services import partitions
+from src.app.services.clicks import (
+    ClickEvent,
+    get_all_clicks_for_export,
+    get_click_stats,
+    record_clicks_batch,
+)
+from src.app.services.links import delete_link
+from src.app.services.rollups import rebuild_rollups
+from tests.conftest import TestingSessionLocal
+
+CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Mobile Safari/604.1"
+
+STAT_KEYS = ["total_clicks", "top_countries", "top_browsers", "top_os", "devices",
+             "top_referrers", "daily_clicks"]
+
+
+@pytest.fixture(autouse=True)
+async def drop_partitions():
+    yield
+    async with TestingSessionLocal() as db:
+        conn = await db.connection()
+        for month in await partitions.partition_months(db, cached=False):
+            await conn.run_sync(partitions.partition_table(month).drop)
+        await db.commit()
+    partitions.clear_partition_cache()
+
+
+def _months_ago(days: int) -> int:
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    then = today - datetime.timedelta(days=days)
+    return (today.year - then.year) * 12 + today.month - then.month
+
+
+async def _create_link_with_clicks() -> tuple[int, int]:
+    """A link with clicks now, 45 days ago (last month or the one before) and
+    100 days ago (at least three months back)."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    async with TestingSessionLocal() as db:
+        user = User(email="parts@example.com", hashed_password="x", display_name="Parts")
+        db.add(user)
+        await db.flush()
+        link = Link(slug="parts", target_url="https://example.com", user_id=user.id)
+        db.add(link)
+        await db.flush()
+        await record_clicks_batch(db, [
+            ClickEvent(link.id, "5.5.5.5", "https://twitter.com", CHROME, now),
+            ClickEvent(link.id, "6.6.6.6", None, IPHONE, now - datetime.timedelta(days=45)),
+            ClickEvent(link.id, "7.7.7.7", "https://twitter.com", CHROME,
+                       now - datetime.timedelta(days=100)),
+            ClickEvent(link.id, "8.8.8.8", None, CHROME, now - datetime.timedelta(days=100)),
+        ])
+        await db.commit()
+        return link.id, user.id
+
+
+async def _stats(link_id: int, strategy: str, monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "analytics_strategy", strategy)
+    async with TestingSessionLocal() as db:
+        stats = await get_click_stats(db, link_id)
+    return {key: stats[key] for key in STAT_KEYS}
+
+
+async def _live_clicks() -> int:
+    async with TestingSessionLocal() as db:
+        return (await db.execute(select(func.count(Click.id)))).scalar()
+
+
+class TestPartitions:
+    @pytest.mark.asyncio
+    async def test_closed_months_move_to_partitions(self):
+        await _create_link_with_clicks()
+        moved = await partitions.archive_closed_months(TestingSessionLocal, batch_size=1)
+        assert moved == 3
+        assert await _live_clicks() == 1
+        async with TestingSessionLocal() as db:
+            months = await partitions.partition_months(db)
+        assert len(months) == 2
+        current = partitions.month_start(datetime.datetime.now(datetime.timezone.utc).date())
+        assert all(month < current for month in months)
+        # A second run has nothing left to move
+        assert await partitions.archive_closed_months(TestingSessionLocal, batch_size=10) == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("strategy", ["raw", "single_pass", "rollup"])
+    async def test_stats_unchanged_by_archiving(self, strategy, monkeypatch):
+        link_id, _ = await _create_link_with_clicks()
+        before = await _stats(link_id, strategy, monkeypatch)
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=2)
+        assert await _stats(link_id, strategy, monkeypatch) == before
+        assert before["total_clicks"] == 4
+
+    @pytest.mark.asyncio
+    async def test_recent_clicks_and_export_span_partitions(self):
+        link_id, _ = await _create_link_with_clicks()
+        async with TestingSessionLocal() as db:
+            before = [
+                (click.id, click.browser, click.referrer)
+                for click in await get_all_clicks_for_export(db, link_id)
+            ]
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+
+        async with TestingSessionLocal() as db:
+            exported = await get_all_clicks_for_export(db, link_id)
+            recent = (await get_click_stats(db, link_id))["recent_clicks"]
+        # Archived clicks still resolve their dimensions
+        assert [(click.id, click.browser, click.referrer) for click in exported] == before
+        assert [click.id for click in recent] == [click_id for click_id, _, _ in before]
+        assert all(browser for _, browser, _ in before)
+
+    @pytest.mark.asyncio
+    async def test_windowed_reads_skip_older_partitions(self):
+        await _create_link_with_clicks()
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+        async with TestingSessionLocal() as db:
+            all_tables = await partitions.click_tables(db)
+            window_tables = await partitions.click_tables(db, since)
+        assert len(all_tables) == 3
+        assert window_tables[0] is Click.__table__
+        # Only partitions for months the 30-day window reaches are read
+        oldest_in_window = partitions.month_start(since.date())
+        assert [t.name for t in window_tables[1:]] == [
+            t.name for t in all_tables[1:] if t.name >= f"clicks_{oldest_in_window:%Y%m}"
+        ]
+        assert len(window_tables) < len(all_tables)
+
+    @pytest.mark.asyncio
+    async def test_retention_drops_expired_partitions_but_keeps_rollups(self, monkeypatch):
+        link_id, _ = await _create_link_with_clicks()
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+        assert _months_ago(45) <= 2 < _months_ago(100)
+
+        dropped = await partitions.drop_expired_partitions(TestingSessionLocal, 2)
+        assert len(dropped) == 1
+        async with TestingSessionLocal() as db:
+            exported = await get_all_clicks_for_export(db, link_id)
+        assert len(exported) == 2
+
+        # Rollups still count the dropped month, and a rebuild leaves it alone
+        # whatever CLICK_RETENTION_MONTHS says
+        await rebuild_rollups(TestingSessionLocal, [link_id])
+        async with TestingSessionLocal() as db:
+            total = (await db.execute(
+                select(func.sum(DailyClickCount.count))
+                .where(DailyClickCount.link_id == link_id)
+            )).scalar()
+        assert total == 4
+        # Raw analytics take the dropped month from the rollups
+        for strategy in ("raw", "single_pass"):
+            assert (await _stats(link_id, strategy, monkeypatch))["total_clicks"] == 4
+
+    @pytest.mark.asyncio
+    async def test_retention_off_keeps_everything(self):
+        await _create_link_with_clicks()
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+        assert await partitions.drop_expired_partitions(TestingSessionLocal, 0) == []
+
+    @pytest.mark.asyncio
+    async def test_delete_link_removes_archived_clicks(self):
+        link_id, user_id = await _create_link_with_clicks()
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+        async with TestingSessionLocal() as db:
+            assert await delete_link(db, link_id, user_id)
+        async with TestingSessionLocal() as db:
+            for table in await partitions.click_tables(db):
+                count = (await db.execute(select(func.count()).select_from(table))).scalar()
+                assert count == 0, table.name
+
+    @pytest.mark.asyncio
+    async def test_new_clicks_never_reuse_archived_ids(self):
+        link_id, _ = await _create_link_with_clicks()
+        # Archive everything, leaving clicks empty
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        await partitions.archive_closed_months(
+            TestingSessionLocal, batch_size=10, today=partitions.add_months(today, 1)
+        )
+        assert await _live_clicks() == 0
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, [
+                ClickEvent(link_id, "9.9.9.9", "https://b.com", CHROME,
+                           datetime.datetime.now(datetime.timezone.utc)),
+            ])
+            await db.commit()
+
+        async with TestingSessionLocal() as db:
+            exported = await get_all_clicks_for_export(db, link_id)
+        assert len({click.id for click in exported}) == len(exported) == 5
+        assert {click.referrer for click in exported} == {
+            "https://b.com", "https://twitter.com", None
+        }
+
+    @pytest.mark.asyncio
+    async def test_partition_list_is_cached(self):
+        await _create_link_with_clicks()
+        async with TestingSessionLocal() as db:
+            assert await partitions.partition_months(db) == []
+        # Archiving in this process shows at once
+        await partitions.archive_closed_months(TestingSessionLocal, batch_size=10)
+        async with TestingSessionLocal() as db:
+            months = await partitions.partition_months(db)
+            assert len(months) == 2
+
+            # A partition made by another process goes unseen until the cache expires
+            elsewhere = datetime.date(2020, 1, 1)
+            conn = await db.connection()
+            await conn.run_sync(partitions.partition_table(elsewhere).create)
+            await db.commit()
+            assert await partitions.partition_months(db) == months
+            assert await partitions.partition_months(db, cached=False) == [elsewhere, *months]
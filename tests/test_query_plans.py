@@ -0,0 +1,195 @@
+"""EXPLAIN QUERY PLAN checks for the hot read paths.
+
+Each test captures the SELECTs (and UPDATEs) a service function actually
+issues and asks
+SQLite how it would run them, so a dropped index or a query rewrite that
+falls back to a full scan or a sort shows up here.
+"""
+import contextlib
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from src.app.config import settings
+from src.app.models.click import Click
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services import rollups
+from src.app.services.clicks import (
+    ClickEvent,
+    _daily_clicks,
+    _recent_clicks,
+    _total_clicks,
+    get_all_clicks_for_export,
+    get_click_stats,
+    record_clicks_batch,
+)
+from src.app.services.enrichment import backfill_geo, enrich_missing_geo
+from src.app.services.links import get_user_links
+from tests.conftest import TEST_DATABASE_URL, TestingSessionLocal, engine
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith("sqlite"), reason="plans are read with SQLite's EXPLAIN"
+)
+
+CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+
+
+async def _create_link() -> tuple[int, int]:
+    async with TestingSessionLocal() as db:
+        user = User(email="plans@example.com", hashed_password="x", display_name="Plans")
+        db.add(user)
+        await db.flush()
+        link = Link(slug="plans", target_url="https://example.com", user_id=user.id)
+        db.add(link)
+        await db.flush()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        await record_clicks_batch(db, [
+            ClickEvent(link.id, "5.5.5.5", "https://twitter.com", CHROME, now),
+            ClickEvent(link.id, "6.6.6.6", None, CHROME, now - datetime.timedelta(days=1)),
+        ])
+        await db.commit()
+        return link.id, user.id
+
+
+@contextlib.contextmanager
+def _captured_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Catalog reads (listing click partitions) and the raw horizon lookup
+        # aren't part of the query under test
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")) and not any(
+            table in statement for table in ("sqlite_master", "raw_click_horizon")
+        ):
+            # An executemany runs one plan; its first parameter set stands in
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def _plans(db, query) -> list[list[str]]:
+    """Run ``query(db)`` and return the query plan of each SELECT or UPDATE it issued."""
+    with _captured_statements() as statements:
+        await query(db)
+    conn = await db.connection()
+    plans = []
+    for statement, parameters in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plans.append([row[3] for row in result.all()])
+    assert plans, "no statement captured"
+    return plans
+
+
+def _assert_no_full_scan(plan: list[str]) -> None:
+    scans = [step for step in plan if step.startswith("SCAN ") and "subquery" not in step]
+    assert not any(
+        step.split()[1] in ("clicks", "links", "daily_click_counts", "daily_dimension_counts")
+        for step in scans
+    ), plan
+
+
+class TestQueryPlans:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("query", [_recent_clicks, get_all_clicks_for_export])
+    async def test_time_ordered_clicks_read_index_in_order(self, query):
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            (plan,) = await _plans(db, lambda db: query(db, link_id))
+        assert "SEARCH clicks USING INDEX ix_clicks_link_id_clicked_at (link_id=?)" in plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    @pytest.mark.asyncio
+    async def test_raw_total_uses_covering_index(self):
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            (plan,) = await _plans(db, lambda db: _total_clicks(db, link_id, False))
+        assert plan == [
+            "SEARCH clicks USING COVERING INDEX ix_clicks_link_id_clicked_at (link_id=?)"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_raw_daily_series_seeks_window(self):
+        link_id, _ = await _create_link()
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=30)
+        async with TestingSessionLocal() as db:
+            (plan,) = await _plans(db, lambda db: _daily_clicks(db, link_id, since, False))
+        assert (
+            "SEARCH clicks USING COVERING INDEX ix_clicks_link_id_clicked_at "
+            "(link_id=? AND clicked_at>?)"
+        ) in plan
+        # Grouping by day holds one row per day of the window; the output
+        # must not need a separate sort on top of it
+        assert not any("FOR ORDER BY" in step for step in plan), plan
+
+    @pytest.mark.asyncio
+    async def test_rollup_reads_use_primary_key(self):
+        link_id, _ = await _create_link()
+        since = datetime.date.today() - datetime.timedelta(days=30)
+        async with TestingSessionLocal() as db:
+            plans = await _plans(db, lambda db: rollups.total_clicks(db, link_id))
+            plans += await _plans(db, lambda db: rollups.daily_clicks(db, link_id, since))
+        for plan in plans:
+            # The composite primary key is SQLite's automatic index on the table
+            assert any(
+                step.startswith("SEARCH daily_click_counts USING INDEX sqlite_autoindex")
+                for step in plan
+            ), plan
+            assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("search", [None, "plan"])
+    async def test_dashboard_links_read_user_index_in_order(self, search):
+        _, user_id = await _create_link()
+        async with TestingSessionLocal() as db:
+            (plan,) = await _plans(db, lambda db: get_user_links(db, user_id, search=search))
+        assert "SEARCH links USING INDEX ix_links_user_id_created_at (user_id=?)" in plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("strategy", ["raw", "rollup", "single_pass"])
+    async def test_analytics_never_full_scans(self, strategy, monkeypatch):
+        monkeypatch.setattr(settings, "analytics_strategy", strategy)
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            plans = await _plans(db, lambda db: get_click_stats(db, link_id))
+        for plan in plans:
+            _assert_no_full_scan(plan)
+
+    @pytest.mark.asyncio
+    async def test_geo_enrichment_seeks_clicks_missing_geo(self, monkeypatch):
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            db.add_all(Click(link_id=link_id, ip_address=f"7.7.7.{i}") for i in range(3))
+            await db.commit()
+
+        async def resolved(ips):
+            return {ip: {"country": "France", "city": "Paris"} for ip in ips}
+
+        monkeypatch.setattr("src.app.services.enrichment.resolve_ips", resolved)
+        async with TestingSessionLocal() as db:
+            plans = await _plans(
+                db,
+                lambda db: backfill_geo(db, {"7.7.7.0": {"country": "France", "city": "Paris"}}),
+            )
+            plans += await _plans(db, lambda db: enrich_missing_geo(lambda: _reuse(db)))
+        # The pending count and the UPDATE of the one IP, then the IP walks
+        plans = [plan for plan in plans if any(" clicks " in f"{step} " for step in plan)]
+        assert len(plans) >= 3
+        for plan in plans:
+            assert any("INDEX ix_clicks_ip_address_missing_geo" in step for step in plan), plan
+            _assert_no_full_scan(plan)
+        # The IP walk reads the index in order rather than sorting the IPs
+        walks = [plan for plan in plans if "(ip_address>?)" in plan[0]]
+        assert walks and not any("TEMP B-TREE" in step for plan in walks for step in plan)
+
+
+@contextlib.asynccontextmanager
+async def _reuse(db):
+    """Hand ``enrich_missing_geo`` the session whose statements are being captured."""
+    yield db
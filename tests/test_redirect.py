@@ -1,4 +1,17 @@
 import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+
+from src.app.main import app
+from src.app.middleware import RedirectFastPath
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services import links as links_service
+from src.app.services import slug_filter as slug_filter_service
+from src.app.services.links import slug_cache
+from src.app.services.slug_filter import BloomFilter, slug_filter
+from src.app.services.slug_index import SlugIndex, SlugIndexWriter, write_slug_index
+from tests.conftest import TestingSessionLocal, engine
 
 
 class TestRedirect:
@@ -164,3 +177,298 @@ class TestRedirect:
         """Internal paths like favicon.ico should not resolve as slugs."""
         response = await client.get("/favicon.ico")
         assert response.status_code == 404
+
+
+class TestSlugCache:
+    async def _setup_link(self, client, slug, target_url="https://example.com/cached"):
+        response = await client.post(
+            "/register",
+            data={
+                "email": f"{slug}@example.com",
+                "password": "TestPass1",
+                "display_name": "Cache User",
+            },
+            follow_redirects=False,
+        )
+        token = response.cookies.get("access_token")
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": target_url, "custom_slug": slug},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        return token
+
+    @pytest.mark.asyncio
+    async def test_hot_slug_skips_database(self, client):
+        await self._setup_link(client, "hot-slug")
+        await client.head("/hot-slug", follow_redirects=False)
+
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            if "FROM links" in statement:
+                statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            response = await client.head("/hot-slug", follow_redirects=False)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _count)
+
+        assert response.status_code == 302
+        assert response.headers["location"] == "https://example.com/cached"
+        assert statements == []
+        assert slug_cache.hits >= 1
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_cache(self, client):
+        token = await self._setup_link(client, "gone-soon")
+        response = await client.head("/gone-soon", follow_redirects=False)
+        assert response.status_code == 302
+        assert "gone-soon" in slug_cache
+
+        await client.post(
+            "/dashboard/links/1/delete",
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        assert "gone-soon" not in slug_cache
+        response = await client.head("/gone-soon", follow_redirects=False)
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_cache_counters_exposed(self, client):
+        await self._setup_link(client, "metric-slug")
+        await client.head("/metric-slug", follow_redirects=False)
+        await client.head("/metric-slug", follow_redirects=False)
+
+        response = await client.get("/health/metrics")
+        assert response.status_code == 200
+        stats = response.json()["slug_cache"]
+        assert stats["hits"] >= 1
+        assert stats["misses"] >= 1
+        assert stats["size"] == 1
+
+
+class TestRedirectFastPath:
+    @pytest.fixture
+    async def fast_client(self):
+        fast_app = RedirectFastPath(app, session_factory=TestingSessionLocal)
+        transport = ASGITransport(app=fast_app)
+        async with AsyncClient(transport=transport, base_url="http://test") as ac:
+            yield ac
+
+    async def _setup_link(self, client, slug, target_url="https://example.com/fast"):
+        response = await client.post(
+            "/register",
+            data={
+                "email": f"{slug}@example.com",
+                "password": "TestPass1",
+                "display_name": "Fast User",
+            },
+            follow_redirects=False,
+        )
+        token = response.cookies.get("access_token")
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": target_url, "custom_slug": slug},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        return token
+
+    @pytest.mark.asyncio
+    async def test_fast_path_redirects_and_records_click(self, fast_client):
+        token = await self._setup_link(fast_client, "fast-slug")
+        response = await fast_client.get(
+            "/fast-slug",
+            follow_redirects=False,
+            headers={"user-agent": "Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0"},
+        )
+        assert response.status_code == 302
+        assert response.headers["location"] == "https://example.com/fast"
+
+        analytics = await fast_client.get(
+            "/dashboard/links/1/analytics",
+            cookies={"access_token": token},
+        )
+        assert "Firefox" in analytics.text
+
+    @pytest.mark.asyncio
+    async def test_fast_path_head_does_not_record_click(self, fast_client):
+        await self._setup_link(fast_client, "fast-head")
+        response = await fast_client.head("/fast-head", follow_redirects=False)
+        assert response.status_code == 302
+
+        async with TestingSessionLocal() as db:
+            link = await db.get(Link, 1)
+            assert link.click_count == 0
+
+    @pytest.mark.asyncio
+    async def test_fast_path_passes_through_other_routes(self, fast_client):
+        response = await fast_client.get("/health")
+        assert response.status_code == 200
+        assert response.json()["status"] == "healthy"
+
+        response = await fast_client.get("/unknown-fast-slug")
+        assert response.status_code == 404
+        assert "Go to Homepage" in response.text
+
+        response = await fast_client.get("/favicon.ico")
+        assert response.status_code == 404
+
+
+@pytest.fixture
+async def shared_index(tmp_path, monkeypatch):
+    """A shared slug index as this worker sees it, and the writer other workers publish with."""
+    path = str(tmp_path / "slugs.idx")
+    index = SlugIndex(path, check_interval=0)
+    writer = SlugIndexWriter(path, delay_ms=0, session_factory=TestingSessionLocal)
+    monkeypatch.setattr(links_service, "slug_index", index)
+    monkeypatch.setattr(slug_filter_service, "slug_index", index)
+    await writer.rebuild()
+    index.open()
+    yield writer
+    index.close()
+
+
+async def _create_link_elsewhere(slug: str) -> None:
+    """Insert a link as another worker would, bypassing this worker's filter."""
+    async with TestingSessionLocal() as db:
+        user = User(email=f"{slug}@example.com", hashed_password="x", display_name="Elsewhere")
+        db.add(user)
+        await db.flush()
+        db.add(Link(slug=slug, target_url=f"https://example.com/{slug}", user_id=user.id))
+        await db.commit()
+
+
+class TestSlugFilter:
+    async def _register(self, client, email="filter@example.com"):
+        response = await client.post(
+            "/register",
+            data={"email": email, "password": "TestPass1", "display_name": "Filter User"},
+            follow_redirects=False,
+        )
+        return response.cookies.get("access_token")
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        slugs = [f"slug-{i}" for i in range(1000)]
+        for slug in slugs:
+            bloom.add(slug)
+        assert all(slug in bloom for slug in slugs)
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        assert false_positives < 300
+
+    @pytest.mark.asyncio
+    async def test_definite_miss_skips_database(self, client, shared_index):
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            response = await client.get("/wp-login-php")
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _count)
+
+        assert response.status_code == 404
+        assert "Link not found" in response.text
+        assert statements == []
+        assert slug_filter.stats()["definite_misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_created_links_are_added_to_filter(self, client, shared_index):
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+        token = await self._register(client)
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": "https://example.com/new", "custom_slug": "brand-new"},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": "https://example.com/generated"},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+
+        response = await client.get("/brand-new", follow_redirects=False)
+        assert response.status_code == 302
+        async with TestingSessionLocal() as db:
+            generated = await db.get(Link, 2)
+        response = await client.get(f"/{generated.slug}", follow_redirects=False)
+        assert response.status_code == 302
+
+    @pytest.mark.asyncio
+    async def test_load_includes_existing_slugs(self, client):
+        token = await self._register(client, email="preload@example.com")
+        await client.post(
+            "/dashboard/links",
+            data={"target_url": "https://example.com/pre", "custom_slug": "pre-existing"},
+            cookies={"access_token": token},
+            follow_redirects=False,
+        )
+        slug_cache.clear()
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+
+        assert slug_filter.might_exist("pre-existing")
+        response = await client.get("/pre-existing", follow_redirects=False)
+        assert response.status_code == 302
+
+    @pytest.mark.asyncio
+    async def test_links_from_other_workers_redirect_before_refresh(self, client):
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+        await _create_link_elsewhere("elsewhere")
+
+        # Without a shared index nothing says the filter is stale, so misses
+        # are never trusted
+        response = await client.get("/elsewhere", follow_redirects=False)
+        assert response.status_code == 302
+        response = await client.get("/nowhere", follow_redirects=False)
+        assert response.status_code == 404
+        assert slug_filter.stats()["definite_misses"] == 0
+
+    @pytest.mark.asyncio
+    async def test_new_index_generation_makes_filter_fall_through(self, client, shared_index):
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+        assert slug_filter.stats()["current"]
+
+        # Another worker publishes a new generation, then gets a link in
+        # before its next one
+        await shared_index.rebuild()
+        await _create_link_elsewhere("elsewhere")
+        response = await client.get("/elsewhere", follow_redirects=False)
+        assert response.status_code == 302
+        assert not slug_filter.stats()["current"]
+        assert slug_filter.stats()["definite_misses"] == 0
+
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+        response = await client.get("/nowhere", follow_redirects=False)
+        assert response.status_code == 404
+        assert slug_filter.stats()["definite_misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_republished_generation_makes_filter_fall_through(
+        self, client, shared_index
+    ):
+        async with TestingSessionLocal() as db:
+            await slug_filter.load(db)
+
+        # Another worker's index arrives under the generation already mapped
+        await _create_link_elsewhere("elsewhere")
+        write_slug_index(shared_index.path, [], generation=1)
+        response = await client.get("/elsewhere", follow_redirects=False)
+        assert response.status_code == 302
+        assert not slug_filter.stats()["current"]
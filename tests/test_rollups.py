@@ -0,0 +1,164 @@
+import datetime
+
+import pytest
+from sqlalchemy import delete, event, select
+
+from src.app.config import settings
+from src.app.models.link import Link
+from src.app.models.rollup import DailyClickCount, DailyDimensionCount
+from src.app.models.user import User
+from src.app.services.clicks import (
+    ClickEvent,
+    get_click_stats,
+    record_click_event,
+    record_clicks_batch,
+)
+from src.app.services.enrichment import GeoEnricher
+from src.app.services.links import delete_link
+from src.app.services.rollups import rebuild_rollups
+from tests.conftest import TestingSessionLocal, engine
+
+CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0"
+IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0) Mobile Safari/604.1"
+PARIS = {"status": "success", "country": "France", "city": "Paris"}
+TOKYO = {"status": "success", "country": "Japan", "city": "Tokyo"}
+
+STAT_KEYS = ["total_clicks", "top_countries", "top_browsers", "top_os", "devices",
+             "top_referrers", "daily_clicks"]
+
+
+async def _create_link(slug="rollup") -> tuple[int, int]:
+    async with TestingSessionLocal() as db:
+        user = User(email=f"{slug}@example.com", hashed_password="x", display_name="Rollup")
+        db.add(user)
+        await db.flush()
+        link = Link(slug=slug, target_url="https://example.com", user_id=user.id)
+        db.add(link)
+        await db.commit()
+        return link.id, user.id
+
+
+def _events(link_id: int) -> list[ClickEvent]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    yesterday = now - datetime.timedelta(days=1)
+    return [
+        ClickEvent(link_id, "5.5.5.5", "https://twitter.com", CHROME, now),
+        ClickEvent(link_id, "5.5.5.5", None, IPHONE, now),
+        ClickEvent(link_id, "6.6.6.6", "https://twitter.com", CHROME, yesterday),
+        ClickEvent(link_id, "7.7.7.7", "https://news.ycombinator.com", None, yesterday),
+    ]
+
+
+async def _stats(link_id: int, strategy: str, monkeypatch) -> dict:
+    monkeypatch.setattr(settings, "analytics_strategy", strategy)
+    async with TestingSessionLocal() as db:
+        stats = await get_click_stats(db, link_id)
+    return {key: stats[key] for key in STAT_KEYS}
+
+
+async def _rollup_rows(link_id: int) -> tuple[list, list]:
+    async with TestingSessionLocal() as db:
+        daily = await db.execute(
+            select(DailyClickCount.day, DailyClickCount.count)
+            .where(DailyClickCount.link_id == link_id)
+            .order_by(DailyClickCount.day)
+        )
+        dimensions = await db.execute(
+            select(
+                DailyDimensionCount.dimension,
+                DailyDimensionCount.value_id,
+                DailyDimensionCount.day,
+                DailyDimensionCount.count,
+            )
+            .where(DailyDimensionCount.link_id == link_id)
+            .order_by(
+                DailyDimensionCount.dimension,
+                DailyDimensionCount.value_id,
+                DailyDimensionCount.day,
+            )
+        )
+        return daily.all(), dimensions.all()
+
+
+class TestRollupMaintenance:
+    @pytest.mark.asyncio
+    async def test_rollup_stats_match_raw_clicks(self, geoip_stub, monkeypatch):
+        geoip_stub.responses.update({"5.5.5.5": PARIS, "6.6.6.6": TOKYO})
+        link_id, _ = await _create_link()
+        events = _events(link_id)
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, events[:3])
+            await record_click_event(db, events[3])
+
+        rolled_up = await _stats(link_id, "rollup", monkeypatch)
+        assert rolled_up == await _stats(link_id, "raw", monkeypatch)
+        assert rolled_up["total_clicks"] == 4
+        assert {c["name"]: c["count"] for c in rolled_up["top_countries"]} == {
+            "France": 2, "Japan": 1,
+        }
+        assert rolled_up["top_referrers"][0] == {"name": "https://twitter.com", "count": 2}
+        assert [d["count"] for d in rolled_up["daily_clicks"]] == [2, 2]
+
+    @pytest.mark.asyncio
+    async def test_rollup_stats_do_not_scan_clicks(self, monkeypatch):
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, _events(link_id))
+
+        statements = []
+
+        def _capture(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        monkeypatch.setattr(settings, "analytics_strategy", "rollup")
+        event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+        try:
+            async with TestingSessionLocal() as db:
+                await get_click_stats(db, link_id)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+
+        # Only the recent-clicks listing still reads raw rows
+        assert len([s for s in statements if "FROM clicks" in s]) == 1
+
+    @pytest.mark.asyncio
+    async def test_deferred_geo_counted_when_enriched(self, geoip_stub, monkeypatch):
+        geoip_stub.responses.update({"5.5.5.5": PARIS, "6.6.6.6": TOKYO})
+        enricher = GeoEnricher(maxsize=100, session_factory=TestingSessionLocal)
+        monkeypatch.setattr("src.app.services.clicks.geo_enricher", enricher)
+        await enricher.start()
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, _events(link_id))
+        await enricher.stop()
+
+        stats = await _stats(link_id, "rollup", monkeypatch)
+        assert {c["name"]: c["count"] for c in stats["top_countries"]} == {
+            "France": 2, "Japan": 1,
+        }
+        assert stats == await _stats(link_id, "raw", monkeypatch)
+
+    @pytest.mark.asyncio
+    async def test_rebuild_regenerates_rollups(self, geoip_stub):
+        geoip_stub.responses.update({"5.5.5.5": PARIS})
+        link_id, _ = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, _events(link_id))
+        expected = await _rollup_rows(link_id)
+
+        async with TestingSessionLocal() as db:
+            await db.execute(delete(DailyClickCount))
+            await db.execute(delete(DailyDimensionCount))
+            await db.commit()
+        assert await rebuild_rollups(TestingSessionLocal) == 1
+
+        assert await _rollup_rows(link_id) == expected
+
+    @pytest.mark.asyncio
+    async def test_deleting_link_removes_rollups(self):
+        link_id, user_id = await _create_link()
+        async with TestingSessionLocal() as db:
+            await record_clicks_batch(db, _events(link_id))
+            assert await delete_link(db, link_id, user_id)
+
+        assert await _rollup_rows(link_id) == ([], [])
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def _fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": 42}
+
+        results = await asyncio.gather(*(flight.do("k", _fetch) for _ in range(10)))
+        assert calls == 1
+        assert all(r == {"value": 42} for r in results)
+        assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 9}
+
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self):
+        flight = SingleFlight()
+
+        async def _echo(value):
+            await asyncio.sleep(0)
+            return value
+
+        a, b = await asyncio.gather(flight.do("a", lambda: _echo(1)), flight.do("b", lambda: _echo(2)))
+        assert (a, b) == (1, 2)
+        assert flight.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_reaches_every_caller(self):
+        flight = SingleFlight()
+
+        async def _fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flight.do("k", _fail), flight.do("k", _fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def _slow():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", _slow))
+        second = asyncio.create_task(flight.do("k", _slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == "done"
+
+    @pytest.mark.asyncio
+    async def test_finished_calls_are_not_remembered(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def _fetch():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("k", _fetch) == 1
+        assert await flight.do("k", _fetch) == 2
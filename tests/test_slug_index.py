@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from src.app.models.link import Link
+from src.app.models.user import User
+from src.app.services import links as links_service
+from src.app.services.links import ResolvedLink, resolve_slug
+from src.app.services.slug_index import (
+    SlugIndex,
+    SlugIndexWriter,
+    read_generation,
+    write_slug_index,
+)
+from tests.conftest import TestingSessionLocal, engine
+
+
+class TestSlugIndexFile:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "slugs.idx")
+        rows = [(i, f"slug-{i}", f"https://example.com/{i}") for i in range(1, 2001)]
+        write_slug_index(path, rows, generation=1)
+
+        index = SlugIndex(path)
+        index.open()
+        assert index.count == 2000
+        assert index.generation == 1
+        assert all(index.lookup(slug) == (link_id, url) for link_id, slug, url in rows)
+        assert index.lookup("missing") is None
+        index.close()
+
+    def test_unicode_target_and_empty_index(self, tmp_path):
+        path = str(tmp_path / "slugs.idx")
+        write_slug_index(path, [], generation=1)
+        index = SlugIndex(path, check_interval=0)
+        index.open()
+        assert index.lookup("anything") is None
+
+        write_slug_index(path, [(7, "caf", "https://example.com/café")], generation=2)
+        assert index.refresh()
+        assert index.lookup("caf") == (7, "https://example.com/café")
+        index.close()
+
+    def test_swap_is_picked_up_with_new_generation(self, tmp_path):
+        path = str(tmp_path / "slugs.idx")
+        write_slug_index(path, [(1, "old", "https://example.com/old")], generation=1)
+        index = SlugIndex(path, check_interval=0)
+        index.open()
+
+        write_slug_index(path, [(2, "new", "https://example.com/new")], generation=2)
+        assert read_generation(path) == 2
+        assert index.refresh()
+        assert index.generation == 2
+        assert index.lookup("old") is None
+        assert index.lookup("new") == (2, "https://example.com/new")
+        assert not index.refresh()
+        index.close()
+
+    def test_closed_index_ignores_file(self, tmp_path):
+        path = str(tmp_path / "slugs.idx")
+        write_slug_index(path, [(1, "a", "https://example.com/a")], generation=1)
+        index = SlugIndex(path, check_interval=0)
+        assert not index.refresh()
+        assert index.lookup("a") is None
+
+
+class TestSharedIndexResolution:
+    async def _create_link(self, db, slug):
+        user = User(email=f"{slug}@example.com", hashed_password="x", display_name="Index")
+        db.add(user)
+        await db.flush()
+        link = Link(slug=slug, target_url=f"https://example.com/{slug}", user_id=user.id)
+        db.add(link)
+        await db.commit()
+        return link
+
+    @pytest.mark.asyncio
+    async def test_resolve_from_index_and_rebuild_on_change(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "slugs.idx")
+        index = SlugIndex(path, check_interval=0)
+        writer = SlugIndexWriter(path, delay_ms=0, session_factory=TestingSessionLocal)
+        monkeypatch.setattr(links_service, "slug_index", index)
+        monkeypatch.setattr(links_service, "slug_index_writer", writer)
+
+        async with TestingSessionLocal() as db:
+            await self._create_link(db, "indexed")
+        assert await writer.rebuild() == 1
+        index.open()
+        writer.enabled = True
+
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        async with TestingSessionLocal() as db:
+            event.listen(engine.sync_engine, "before_cursor_execute", _count)
+            try:
+                resolved = await resolve_slug(db, "indexed")
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", _count)
+        assert resolved == ResolvedLink(1, "https://example.com/indexed")
+        assert statements == []
+
+        # Links newer than the snapshot fall back to the database, and
+        # creating one through the service publishes a new generation
+        async with TestingSessionLocal() as db:
+            user = await db.get(User, 1)
+            await links_service.create_link(
+                db, user.id, "https://example.com/fresh", custom_slug="fresh"
+            )
+            assert await resolve_slug(db, "fresh") == ResolvedLink(2, "https://example.com/fresh")
+        await writer.flush()
+        assert read_generation(path) == 2
+        assert index.refresh()
+        assert index.lookup("fresh") == (2, "https://example.com/fresh")
+        index.close()
+
+    @pytest.mark.asyncio
+    async def test_overlapping_rebuilds_publish_distinct_generations(self, tmp_path):
+        path = str(tmp_path / "slugs.idx")
+        # Two workers' writers rebuilding the same file at once
+        writers = [
+            SlugIndexWriter(path, delay_ms=0, session_factory=TestingSessionLocal)
+            for _ in range(2)
+        ]
+        generations = await asyncio.gather(*(writer.rebuild() for writer in writers))
+        assert sorted(generations) == [1, 2]
+        assert read_generation(path) == 2
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from src.app.services.versioned_cache import VersionedCache
+
+
+class _Computer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return {"call": self.calls}
+
+
+class TestVersionedCache:
+    @pytest.mark.asyncio
+    async def test_same_version_served_from_cache(self):
+        cache = VersionedCache(maxsize=10, max_age=60)
+        compute = _Computer()
+        assert await cache.get(1, 5, compute) == {"call": 1}
+        assert await cache.get(1, 5, compute) == {"call": 1}
+        assert compute.calls == 1
+        assert cache.stats()["fresh"] == 1
+
+    @pytest.mark.asyncio
+    async def test_new_version_recomputes(self):
+        cache = VersionedCache(maxsize=10, max_age=60)
+        compute = _Computer()
+        await cache.get(1, 5, compute)
+        assert await cache.get(1, 6, compute) == {"call": 2}
+        assert await cache.get(1, 6, compute) == {"call": 2}
+
+    @pytest.mark.asyncio
+    async def test_entries_expire_after_max_age(self):
+        cache = VersionedCache(maxsize=10, max_age=0.01)
+        compute = _Computer()
+        await cache.get(1, 5, compute)
+        await asyncio.sleep(0.02)
+        assert await cache.get(1, 5, compute) == {"call": 2}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_compute_once(self):
+        cache = VersionedCache(maxsize=10, max_age=60)
+        compute = _Computer(delay=0.01)
+        results = await asyncio.gather(*(cache.get(1, 5, compute) for _ in range(5)))
+        assert compute.calls == 1
+        assert results == [{"call": 1}] * 5
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_while_revalidating(self):
+        cache = VersionedCache(maxsize=10, max_age=60, stale_while_revalidate=True)
+        compute = _Computer(delay=0.01)
+        await cache.get(1, 5, compute)
+
+        # Both readers get the stale value at once; one refresh runs behind them
+        assert await cache.get(1, 6, compute) == {"call": 1}
+        assert await cache.get(1, 6, compute) == {"call": 1}
+        assert cache.stats()["refreshing"] == 1
+        await cache.close()
+
+        assert compute.calls == 2
+        assert await cache.get(1, 6, compute) == {"call": 2}
+        assert cache.stats()["stale"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_stale_entry(self):
+        cache = VersionedCache(maxsize=10, max_age=60, stale_while_revalidate=True)
+        compute = _Computer()
+        await cache.get(1, 5, compute)
+        compute.fail = True
+        assert await cache.get(1, 6, compute) == {"call": 1}
+        await cache.close()
+        await asyncio.sleep(0)
+
+        assert cache.stats()["refresh_errors"] == 1
+        assert await cache.get(1, 6, compute) == {"call": 1}
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_first_lookup_waits_even_with_stale_while_revalidate(self):
+        cache = VersionedCache(maxsize=10, max_age=60, stale_while_revalidate=True)
+        compute = _Computer()
+        compute.fail = True
+        with pytest.raises(RuntimeError):
+            await cache.get(1, 5, compute)
+
+    @pytest.mark.asyncio
+    async def test_zero_size_disables_caching(self):
+        cache = VersionedCache(maxsize=0, max_age=60)
+        compute = _Computer()
+        await cache.get(1, 5, compute)
+        await cache.get(1, 5, compute)
+        assert compute.calls == 2